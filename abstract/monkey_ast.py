@@ -1,6 +1,17 @@
 from interface import implements, Interface
 from typing import List
 from lexer.monkey_lexer import Token
+from lexer.source_map import SourceMap
+from .printer import to_string
+
+
+def push_list(push, nodes):
+    """ Push nodes, separated by commas, for abstract.printer """
+    if nodes:
+        for index in range(len(nodes) - 1, 0, -1):
+            push(nodes[index])
+            push(", ")
+        push(nodes[0])
 
 
 class Node(Interface):
@@ -9,14 +20,27 @@ class Node(Interface):
 
 
 class Statement(implements(Node)):
+    # offset of the statement's token in the source, see lexer.source_map
+    _offset = -1
+    # names of the attributes holding child nodes (or lists of them)
+    _fields = ()
+
     def token_literal(self) -> str:
         pass
 
     def statement_node(self):
         pass
 
+    def __str__(self):
+        return to_string(self)
+
 
 class Expression(implements(Node)):
+    # offset of the expression's token in the source, see lexer.source_map
+    _offset = -1
+    # names of the attributes holding child nodes (or lists of them)
+    _fields = ()
+
     def token_literal(self) -> str:
         pass
 
@@ -24,10 +48,12 @@ class Expression(implements(Node)):
         pass
 
     def __str__(self):
-        pass
+        return to_string(self)
 
 
 class PrefixExpression(Expression):
+    _fields = ("_right",)
+
     def __init__(self, token: Token, operator: str, right: Expression = None):
         self._token = token
         self._op = operator
@@ -39,11 +65,23 @@ class PrefixExpression(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        return f"({self._op}{self._right})"
+    def write_to(self, push, out):
+        out("(")
+        out(self._op)
+        push(")")
+        push(self._right)
 
 
 class InfixExpression(Expression):
+    _fields = ("_left", "_right")
+    # inline cache of evaluator.peval: the operand classes last seen here, the
+    # operation they resolved to, and how often that was still the right one
+    _cached_left = None
+    _cached_right = None
+    _cached_operation = None
+    _hits = 0
+    _misses = 0
+
     def __init__(self, token: Token, operator: str, left: Expression = None, right: Expression = None):
         self._token = token
         self._op = operator
@@ -56,8 +94,12 @@ class InfixExpression(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        return f"({self._left} {self._op} {self._right})"
+    def write_to(self, push, out):
+        out("(")
+        push(")")
+        push(self._right)
+        push(f" {self._op} ")
+        push(self._left)
 
 
 class Identifier(Expression):
@@ -72,6 +114,9 @@ class Identifier(Expression):
     represent the name in a variable binding and later reuse it to represent an
     Identifier as part of the complete expression.
     """
+    # where the variable lives, filled in by evaluator.resolver
+    _kind = None
+    _slot = -1
 
     def __init__(self, token: Token, value: Expression):
         self._token = token  # TokenTypes.IDENT token
@@ -83,8 +128,8 @@ class Identifier(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        return f"{self._value}"
+    def write_to(self, push, out):
+        out(f"{self._value}")
 
 
 class BooleanLiteral(Expression):
@@ -98,8 +143,8 @@ class BooleanLiteral(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        return f"{self._token.literal}"
+    def write_to(self, push, out):
+        out(self._token.literal)
 
 
 class IntegerLiteral(Expression):
@@ -113,11 +158,13 @@ class IntegerLiteral(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        return f"{str(self._value)}"
+    def write_to(self, push, out):
+        out(str(self._value))
 
 
 class LetStatement(Statement):
+    _fields = ("_name", "_value")
+
     def __init__(self, token: Token, name: Identifier = None, value: Expression = None):
         self._token = token  # TokenTypes.LET token
         self._name = name
@@ -129,15 +176,18 @@ class LetStatement(Statement):
     def statement_node(self):
         pass
 
-    def __str__(self):
-        repr = f"{self.token_literal()} {self._name} = "
+    def write_to(self, push, out):
+        out(f"{self.token_literal()} ")
         if self._value:
-            repr = repr + f"{str(self._value)};"
-
-        return repr
+            push(";")
+            push(self._value)
+        push(" = ")
+        push(self._name)
 
 
 class ReturnStatement(Statement):
+    _fields = ("_value",)
+
     def __init__(self, token: Token, value: Expression = None):
         self._token = token  # TokenTypes.RETURN
         self._value = value
@@ -148,15 +198,17 @@ class ReturnStatement(Statement):
     def statement_node(self):
         pass
 
-    def __str__(self):
-        repr = f"{self.token_literal()}"
+    def write_to(self, push, out):
+        out(self.token_literal())
         if self._value:
-            repr = f"{repr} {self._value};"
-
-        return repr
+            out(" ")
+            push(";")
+            push(self._value)
 
 
 class ExpressionStatement(Statement):
+    _fields = ("_expression",)
+
     def __init__(self, token: Token, expression: Expression = None):
         self._token = token  # The first token of the expression
         self._expression = expression
@@ -167,15 +219,15 @@ class ExpressionStatement(Statement):
     def statement_node(self):
         pass
 
-    def __str__(self):
+    def write_to(self, push, out):
         if self._expression:
-            repr = f"{self._expression}"
-            return repr
-
-        return ""
+            push(self._expression)
 
 
 class BlockStatement:
+    _offset = -1
+    _fields = ("_statements",)
+
     def __init__(self, token: Token, statements: List[Statement] = None):
         self._token = token  # The '{' token
         self._statements = statements
@@ -186,15 +238,17 @@ class BlockStatement:
     def statement_node(self):
         pass
 
+    def write_to(self, push, out):
+        for statement in reversed(self._statements):
+            push(statement)
+
     def __str__(self):
-        data = ""
-        for item in self._statements:
-            data = data + f"{item}"
-            data = data + ""
-        return data
+        return to_string(self)
 
 
 class IfExpression(Expression):
+    _fields = ("_condition", "_consequence", "_alternative")
+
     def __init__(self, token: Token,  # 'If' token
                  condition: Expression = None,
                  consequence: List[BlockStatement] = None,
@@ -210,16 +264,30 @@ class IfExpression(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        data = f"{self._token.literal} {str(self._condition)} " + "{ " + str(self._consequence) + " }"
-
+    def write_to(self, push, out):
+        out(f"{self._token.literal} ")
         if self._alternative:
-            data = data + " else " + "{ " + str(self._alternative) + " }"
-
-        return data
+            push(" }")
+            push(self._alternative)
+            push(" else { ")
+        push(" }")
+        push(self._consequence)
+        push(" { ")
+        push(self._condition)
 
 
 class FunctionLiteral(Expression):
+    _fields = ("_parameters", "_block")
+    # filled in by evaluator.resolver: slots needed by the environment of a
+    # call, which of them are cells, and where the free variables come from
+    _scope_size = 0
+    _cells = ()
+    _free = ()
+    # environment.FramePool peval runs calls of this function in
+    _frames = None
+    # the literal as written, when this is the copy evaluator.folding made of it
+    _unfolded = None
+
     def __init__(self, token: Token, parameters: List[Identifier] = None,
                  block: BlockStatement = None):
         self._token = token  # The 'fn' token
@@ -232,15 +300,26 @@ class FunctionLiteral(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        data = f"{self._token.literal}" + "( " + ", ".join(self._parameters) + " )" + str(self._block)
-        return data
+    def write_to(self, push, out):
+        out(f"{self._token.literal}(")
+        push(" }")
+        push(self._block)
+        push(") { ")
+        push_list(push, self._parameters)
 
 
 class CallExpression(Expression):
+    _fields = ("_ident_or_func_literal", "_args")
+    # inline cache of evaluator.peval: the function literal last called here,
+    # its FramePool, and how often the next call was to the same one
+    _cached_callee = None
+    _cached_frames = None
+    _hits = 0
+    _misses = 0
+
     def __init__(self, token: Token,
                  ident_or_func_literal: Expression = None, args: List[Expression] = None):
-        self._token = token,  # The '(' token
+        self._token = token  # The '(' token
         self._ident_or_func_literal = ident_or_func_literal
         self._args = args
 
@@ -250,14 +329,24 @@ class CallExpression(Expression):
     def expression_node(self):
         pass
 
-    def __str__(self):
-        data = f"{str(self._ident_or_func_literal)}" + "(" + ", ".join(str(item) for item in self._args) + ")"
-        return data
+    def write_to(self, push, out):
+        push(")")
+        push_list(push, self._args)
+        push("(")
+        push(self._ident_or_func_literal)
 
 
 class Program:
+    _fields = ("_statements",)
+
     def __init__(self):
         self._statements: List = []
+        self._offset = 0
+        self._source_map: SourceMap = None
+        # what the parser found wrong with the source, Parser.reparse only reuses clean programs
+        self._errors: List[str] = []
+        # the global evaluator.resolver.Scope, once resolved
+        self._scope = None
 
     def token_literal(self):
         if len(self._statements) > 0:
@@ -265,10 +354,19 @@ class Program:
         else:
             return ""
 
+    def write_to(self, push, out):
+        for statement in reversed(self._statements):
+            push(statement)
+
     def __str__(self):
-        data = ""
-        for item in self._statements:
-            data = data + f"{str(item)}"
-            data = data + ""
+        return to_string(self)
+
 
-        return data
+def iter_children(node):
+    """ The child nodes of node, in source order """
+    for name in node._fields:
+        value = getattr(node, name)
+        if isinstance(value, list):
+            yield from (item for item in value if item is not None)
+        elif value is not None:
+            yield value
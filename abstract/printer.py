@@ -0,0 +1,39 @@
+"""
+Printing an AST back as text, without recursing.
+
+    write(program, sys.stdout)
+    text = to_string(program)       # what str(program) is
+
+write() keeps a stack of what is left to print, strings and nodes. It
+pops them one at a time, writing a string and asking a node to write
+itself with its write_to(push, out) method, which writes what comes
+first with out() and pushes the rest, children included, with push() (so
+in reverse order). Nesting is then limited by memory only, and every
+string is written to the stream once, so printing a program takes time in
+proportion to its text.
+
+A missing child (a parse error leaves them) prints as None.
+"""
+import io
+from typing import TextIO
+
+
+def write(node, stream: TextIO):
+    """ Write the text of node to stream """
+    out = stream.write
+    stack = [node]
+    pop, push = stack.pop, stack.append
+    while stack:
+        item = pop()
+        if item.__class__ is str:
+            out(item)
+        elif item is None:
+            out("None")
+        else:
+            item.write_to(push, out)
+
+
+def to_string(node) -> str:
+    stream = io.StringIO()
+    write(node, stream)
+    return stream.getvalue()
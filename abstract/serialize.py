@@ -0,0 +1,259 @@
+"""
+A compact binary form of a parsed Program, for caching it on disk.
+
+The tree is written as a flat list of records in postorder, every node
+after its children:
+
+    (tag, token, offset)                      most nodes
+    (tag, token, offset, data)                data: an identifier's name, a literal's value, an operator
+    (tag, token, offset, length)              length: of the list of child nodes (statements, arguments, ...)
+    None                                      a missing child
+
+token is an index into a table of the distinct tokens, which are values,
+so a program has only one Token for every `let` or `+` it contains once it
+is read back. The table and the records are marshalled and compressed, or
+for dumps_json(), written as JSON:
+
+    {"format": 1, "tokens": [[type, literal], ...], "records": [...]}
+
+Reading the records back is a single loop with a stack of the nodes made so
+far, each record taking its children off the top, so neither direction
+recurses and nesting is not limited by the recursion limit (or marshal's).
+
+Only what the parser produces is kept. What evaluator.resolver and the
+engines write onto the nodes is not, a loaded program is resolved again.
+"""
+import json
+import marshal
+import zlib
+from typing import Dict, List, Tuple
+
+from lexer.monkey_lexer import Token
+from .monkey_ast import Program, ExpressionStatement, LetStatement, ReturnStatement, BlockStatement, Identifier, \
+    IntegerLiteral, BooleanLiteral, PrefixExpression, InfixExpression, IfExpression, FunctionLiteral, CallExpression
+
+# Changes with the layout of the records, or of the nodes they are read into
+FORMAT = 1
+MAGIC = b"MKAST" + bytes([FORMAT])
+
+# the position of a class in here is its tag
+node_classes = [Program, ExpressionStatement, LetStatement, ReturnStatement, BlockStatement, Identifier,
+                IntegerLiteral, BooleanLiteral, PrefixExpression, InfixExpression, IfExpression, FunctionLiteral,
+                CallExpression]
+tags = {cls: tag for tag, cls in enumerate(node_classes)}
+
+# class -> attribute holding its data
+data_fields = {
+    Identifier: "_value",
+    IntegerLiteral: "_value",
+    BooleanLiteral: "_value",
+    PrefixExpression: "_op",
+    InfixExpression: "_op",
+}
+
+# class -> its field holding a list of nodes
+list_fields = {
+    Program: "_statements",
+    BlockStatement: "_statements",
+    FunctionLiteral: "_parameters",
+    CallExpression: "_args",
+}
+
+
+class SerializeError(ValueError):
+    pass
+
+
+def flatten(program: Program) -> Tuple[List[Tuple[str, str]], List]:
+    """ The token table and the records of program """
+    tokens: List[Tuple[str, str]] = []
+    token_indexes: Dict[Tuple[str, str], int] = {}
+
+    # Visiting every node before its children, the last child first, gives
+    # the postorder the other way round.
+    records = []
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            records.append(None)
+            continue
+        cls = node.__class__
+
+        token = getattr(node, "_token", None)
+        if token is None:
+            index = -1
+        else:
+            key = (token.type, token.literal)
+            index = token_indexes.get(key)
+            if index is None:
+                index = token_indexes[key] = len(tokens)
+                tokens.append(key)
+        item = (tags[cls], index, node._offset)
+        if cls in data_fields:
+            item += (getattr(node, data_fields[cls]),)
+
+        list_field = list_fields.get(cls)
+        if list_field is not None:
+            children = getattr(node, list_field)
+            item += (-1 if children is None else len(children),)
+        records.append(item)
+
+        for name in node._fields:
+            if name == list_field:
+                stack.extend(getattr(node, name) or ())
+            else:
+                stack.append(getattr(node, name))
+    records.reverse()
+    return tokens, records
+
+
+def dumps(program: Program) -> bytes:
+    return MAGIC + zlib.compress(marshal.dumps(flatten(program)), 1)
+
+
+def dumps_json(program: Program) -> str:
+    tokens, records = flatten(program)
+    return json.dumps({"format": FORMAT, "tokens": tokens, "records": records}, separators=(",", ":"))
+
+
+def new(cls, token: Token, offset: int):
+    node = cls.__new__(cls)
+    node._token = token
+    node._offset = offset
+    return node
+
+
+def take(nodes: List, length: int):
+    """ The last length nodes, in order, or None for a length of -1 """
+    if length <= 0:
+        return [] if length == 0 else None
+    children = nodes[-length:]
+    del nodes[-length:]
+    return children
+
+
+# Readers, one for each tag: they make the node of a record out of it and the nodes on top of the stack
+
+def read_program(item, token, nodes):
+    node = Program()
+    node._statements = take(nodes, item[3])
+    return node
+
+
+def read_expression_statement(item, token, nodes):
+    node = new(ExpressionStatement, token, item[2])
+    node._expression = nodes.pop()
+    return node
+
+
+def read_let_statement(item, token, nodes):
+    node = new(LetStatement, token, item[2])
+    node._value = nodes.pop()
+    node._name = nodes.pop()
+    return node
+
+
+def read_return_statement(item, token, nodes):
+    node = new(ReturnStatement, token, item[2])
+    node._value = nodes.pop()
+    return node
+
+
+def read_block_statement(item, token, nodes):
+    node = new(BlockStatement, token, item[2])
+    node._statements = take(nodes, item[3])
+    return node
+
+
+def read_literal(item, token, nodes):
+    node = new(node_classes[item[0]], token, item[2])
+    node._value = item[3]
+    return node
+
+
+def read_prefix_expression(item, token, nodes):
+    node = new(PrefixExpression, token, item[2])
+    node._op = item[3]
+    node._right = nodes.pop()
+    return node
+
+
+def read_infix_expression(item, token, nodes):
+    node = new(InfixExpression, token, item[2])
+    node._op = item[3]
+    node._right = nodes.pop()
+    node._left = nodes.pop()
+    return node
+
+
+def read_if_expression(item, token, nodes):
+    node = new(IfExpression, token, item[2])
+    node._alternative = nodes.pop()
+    node._consequence = nodes.pop()
+    node._condition = nodes.pop()
+    return node
+
+
+def read_function_literal(item, token, nodes):
+    node = new(FunctionLiteral, token, item[2])
+    node._block = nodes.pop()
+    node._parameters = take(nodes, item[3])
+    return node
+
+
+def read_call_expression(item, token, nodes):
+    node = new(CallExpression, token, item[2])
+    node._args = take(nodes, item[3])
+    node._ident_or_func_literal = nodes.pop()
+    return node
+
+
+readers = [read_program, read_expression_statement, read_let_statement, read_return_statement,
+           read_block_statement, read_literal, read_literal, read_literal, read_prefix_expression,
+           read_infix_expression, read_if_expression, read_function_literal, read_call_expression]
+
+
+def loads(data: bytes) -> Program:
+    """ The Program dumps() was given. It has no source map, the caller knows the source """
+    if not data.startswith(MAGIC):
+        raise SerializeError("not a serialized program, or one of another format")
+    try:
+        tokens, records = marshal.loads(zlib.decompress(data[len(MAGIC):]))
+        tokens = [Token(type, literal) for type, literal in tokens]
+    except (zlib.error, EOFError, ValueError, TypeError) as error:
+        raise SerializeError(f"corrupt serialized program: {error}") from None
+    return build(tokens, records)
+
+
+def loads_json(text: str) -> Program:
+    """ The Program dumps_json() was given, without a source map like loads() """
+    try:
+        data = json.loads(text)
+        if data["format"] != FORMAT:
+            raise SerializeError(f"serialized program of format {data['format']}, not {FORMAT}")
+        tokens = [Token(type, literal) for type, literal in data["tokens"]]
+        records = data["records"]
+    except (ValueError, TypeError, KeyError) as error:
+        raise SerializeError(f"corrupt serialized program: {error!r}") from None
+    return build(tokens, records)
+
+
+def build(tokens: List[Token], records: List) -> Program:
+    """ The Program made out of records, see the top of the module """
+    nodes: List = []
+    push = nodes.append
+    try:
+        for item in records:
+            if item is None:
+                push(None)
+            else:
+                index = item[1]
+                push(readers[item[0]](item, tokens[index] if index >= 0 else None, nodes))
+        (program,) = nodes
+    except (IndexError, TypeError, ValueError) as error:
+        raise SerializeError(f"corrupt serialized program: {error!r}") from None
+
+    if program.__class__ is not Program:
+        raise SerializeError("corrupt serialized program: it is not a Program")
+    return program
@@ -0,0 +1,33 @@
+"""
+What evaluating in slices costs, Interpreter.run against running straight
+through, by how many steps there are between handing the event loop back.
+
+    python -m benchmarks.bench_async [--n N]
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import best_of, report
+from monkey import Interpreter
+
+PROGRAM = "let sum = fn(n, total) { if (n == 0) { total } else { sum(n - 1, total + n) } }; sum(n, 0);"
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--n", type=int, default=20000)
+    args = args.parse_args()
+
+    interpreter = Interpreter("stack")
+    prepared = interpreter.prepare(PROGRAM)
+    calls = args.n + 1
+
+    seconds = best_of(lambda: prepared(n=args.n))
+    report("straight through", calls, seconds, "calls")
+    for steps_per_yield in [100, 1000, 10000]:
+        seconds = best_of(lambda: asyncio.run(interpreter.run(prepared, steps_per_yield=steps_per_yield, n=args.n)))
+        report(f"run, yielding every {steps_per_yield} steps", calls, seconds, "calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Throughput of run-many for lots of small independent programs.
+
+    python -m benchmarks.bench_batch [--programs N] [--workers W ...] [--chunksize C]
+
+Every program is a little fib, different enough from the others that none
+of them parse the same. One worker runs them in this process, more run
+them in a pool of worker processes, starting the pool included.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import report
+from monkey.runner import run_many
+
+PROGRAM = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib({n}) + {i};"
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--programs", type=int, default=2000)
+    args.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    args.add_argument("--chunksize", type=int, default=32)
+    args.add_argument("--engine", default="vm")
+    args = args.parse_args()
+
+    programs = [PROGRAM.replace("{n}", str(10 + i % 5)).replace("{i}", str(i)) for i in range(args.programs)]
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = list(run_many(programs, files=False, engine=args.engine, workers=workers,
+                                chunksize=args.chunksize))
+        seconds = time.perf_counter() - start
+        assert all(result.ok for result in results)
+        report(f"{workers} worker(s), chunks of {args.chunksize}", len(programs), seconds, "programs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Function call heavy programs on every engine.
+
+    python -m benchmarks.bench_calls [--fib N] [--ackermann M N] [--repeat R]
+
+fib is the classic doubly recursive one, so it measures calls and integer
+arithmetic and little else. ackermann nests calls much deeper for the number
+of calls made. Each program is parsed and compiled once, only running it is
+timed, and the rate reported is Monkey calls per second.
+"""
+import argparse
+import sys
+
+from benchmarks.common import best_of, report
+from benchmarks.bench_eval import engines
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+FIB = """
+let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+fib({n});
+"""
+
+ACKERMANN = """
+let ackermann = fn(m, n) {
+    if (m == 0) { n + 1 } else {
+        if (n == 0) { ackermann(m - 1, 1) } else { ackermann(m - 1, ackermann(m, n - 1)) }
+    }
+};
+ackermann({m}, {n});
+"""
+
+
+def fib_calls(n: int) -> int:
+    return 1 if n < 2 else 1 + fib_calls(n - 1) + fib_calls(n - 2)
+
+
+def ackermann_calls(m: int, n: int) -> int:
+    calls, stack = 0, [m]
+    while stack:
+        m = stack.pop()
+        calls += 1
+        if m == 0:
+            n += 1
+        elif n == 0:
+            stack.append(m - 1)
+            n = 1
+        else:
+            stack.extend([m - 1, m])
+            n -= 1
+    return calls
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--fib", type=int, default=25)
+    args.add_argument("--ackermann", type=int, nargs=2, default=[3, 5], metavar=("M", "N"))
+    args.add_argument("--repeat", type=int, default=3)
+    args = args.parse_args()
+    # the tree walking engines recurse in Python for every Monkey call
+    sys.setrecursionlimit(100000)
+
+    m, n = args.ackermann
+    cases = {
+        f"fib({args.fib})": (FIB.replace("{n}", str(args.fib)), fib_calls(args.fib)),
+        f"ackermann({m}, {n})": (ACKERMANN.replace("{m}", str(m)).replace("{n}", str(n)), ackermann_calls(m, n)),
+    }
+    for name, (source, calls) in cases.items():
+        program = Parser.new(Lexer(source)).parse()
+        for engine, run in engines(program).items():
+            report(f"{name} ({engine})", calls, best_of(run, args.repeat), "calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare the execution engines on the same programs.
+
+    python -m benchmarks.bench_eval [--copies N]
+
+Programs are parsed (and compiled, for the engines that compile) once up
+front; only running them is timed.
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from compiler import compile
+from evaluator import eval, compile as compile_closures
+from evaluator import stack_eval
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+from vm import VM
+
+PROGRAMS = {
+    "arithmetic": "(5 + 10 * 2 + 15 / 3) * 2 + -10 * (3 - 1) / 2 + 100 * 100 - 99;",
+    "branches": "if (1 < 2) { if (3 > 4) { 1 } else { if (!false) { 2 } else { 3 } } } else { 4 };",
+    "variables": "let a = 1; let b = a + 2; let c = a * b - a; c * c;",
+}
+
+
+def engines(program):
+    """ name -> function running program once """
+    run_closures = compile_closures(program)
+    bytecode = compile(program)
+    return {
+        "eval": lambda: eval(program),
+        "stack": lambda: stack_eval.eval(program),
+        "closures": run_closures,
+        "vm": lambda: VM(bytecode).run(),
+    }
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--copies", type=int, default=2000, help="statements per program")
+    args = args.parse_args()
+
+    for name, statement in PROGRAMS.items():
+        program = Parser.new(Lexer(statement * args.copies)).parse()
+        for engine, run in engines(program).items():
+            report(f"{name} ({engine})", args.copies, best_of(run), "statements")
+
+
+if __name__ == "__main__":
+    main()
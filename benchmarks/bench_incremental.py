@@ -0,0 +1,77 @@
+"""
+Single character edits on a large file: Parser.reparse against parsing the
+whole edited source again, 5k statements by default.
+
+    python -m benchmarks.bench_incremental [--statements N] [--edits N]
+
+"replace a digit" leaves the length of the source alone, so the statements
+after the edit are reused as they are. "insert and delete a space" moves
+them along, every node below them has its offset shifted.
+"""
+import argparse
+import random
+
+from benchmarks.common import best_of, report
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+STATEMENTS = [
+    "let a = (5 + 10 * 2 + 15 / 3) * 2 + -10;",
+    "if (a < b) { a } else { add(a, -b) };",
+    "let add = fn(x, y) { return x + y; };",
+    "add(a, 2 * b)",
+]
+
+
+def edits(source: str, count: int):
+    """ (offset, removed, inserted) edits typing into source, each leaving it as it was found """
+    rng = random.Random(1)
+    digits = [offset for offset, char in enumerate(source) if char.isdigit()]
+    # spaces go next to spaces, splitting a token would make a program with errors, parsed again in full
+    spaces = [offset for offset, char in enumerate(source) if char == " "]
+    replacing, spacing = [], []
+    for _ in range(count // 2):
+        offset = rng.choice(digits)
+        replacing += [(offset, 1, "7"), (offset, 1, source[offset])]
+        offset = rng.choice(spaces)
+        spacing += [(offset, 0, " "), (offset, 1, "")]
+    return replacing, spacing
+
+
+def reparse(program, edits):
+    parser = Parser.new(Lexer(""))
+    for offset, removed, inserted in edits:
+        program = parser.reparse(program, offset, removed, inserted)
+    return program
+
+
+def parse_again(source, edits):
+    for offset, removed, inserted in edits:
+        source = source[:offset] + inserted + source[offset + removed:]
+        Parser.new(Lexer(source)).parse()
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--statements", type=int, default=5000)
+    args.add_argument("--edits", type=int, default=100)
+    args = args.parse_args()
+
+    source = "\n".join(STATEMENTS[index % len(STATEMENTS)] for index in range(args.statements))
+    replacing, spacing = edits(source, args.edits)
+    print(f"{args.statements:,} statements, {len(source):,} characters")
+
+    expected = str(Parser.new(Lexer(source)).parse())
+    for name, batch in [("replace a digit", replacing), ("insert and delete a space", spacing)]:
+        program = reparse(Parser.new(Lexer(source)).parse(), batch)
+        assert str(program) == expected and program._source_map.text == source
+
+        full = best_of(lambda: parse_again(source, batch[:5]), repeat=3)
+        report(f"{name}: parse again", 5, full, "edits")
+        programs = [Parser.new(Lexer(source)).parse() for _ in range(3)]
+        incremental = best_of(lambda: reparse(programs.pop(), batch), repeat=3)
+        report(f"{name}: reparse", len(batch), incremental, "edits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Monomorphic against polymorphic sites in the tree walking evaluators.
+
+    python -m benchmarks.bench_inline_cache [--n N] [--repeat R]
+
+Both programs make the same number of calls and comparisons. In the first
+every comparison sees integers, in the second the one == site alternates
+between integers and booleans, so its inline cache misses every time.
+The hit and miss counts of the sites are printed after the timings.
+"""
+import argparse
+import sys
+
+from benchmarks.common import best_of, report
+from evaluator import eval, stack_eval
+from evaluator.inline_cache import report as report_sites, reset
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+MONOMORPHIC = """
+let same = fn(a, b) { a == b };
+let loop = fn(n) { if (n == 0) { 0 } else { if (same(n, n)) { loop(n - 1) } else { loop(n - 1) } } };
+loop({n});
+"""
+
+POLYMORPHIC = """
+let same = fn(a, b) { a == b };
+let loop = fn(n) { if (n == 0) { 0 } else { if (same(n, n) == same(true, true)) { loop(n - 1) } else { 0 } } };
+loop({n});
+"""
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--n", type=int, default=2000)
+    args.add_argument("--repeat", type=int, default=5)
+    args = args.parse_args()
+    # the tree walking engines recurse in Python for every Monkey call
+    sys.setrecursionlimit(100000)
+
+    programs = {}
+    for name, source in [("monomorphic", MONOMORPHIC), ("polymorphic", POLYMORPHIC)]:
+        program = programs[name] = Parser.new(Lexer(source.replace("{n}", str(args.n)), filename=name)).parse()
+        for engine, run in [("eval", eval), ("stack", stack_eval.eval)]:
+            report(f"{name} ({engine})", args.n, best_of(lambda: run(program), args.repeat), "iterations")
+
+    for program in programs.values():
+        reset(program)
+        eval(program)
+        print()
+        report_sites(program)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Lexer throughput in tokens per second.
+
+    python -m benchmarks.bench_lexer [--lines N]
+
+Besides both lexer engines this times raw Token construction, and compares
+it against the frozen pydantic dataclass Token used to be when pydantic is
+installed.
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from lexer import engines
+from lexer.monkey_lexer import Token, TokenTypes
+
+try:
+    from pydantic.dataclasses import dataclass as pydantic_dataclass
+except ImportError:
+    pydantic_dataclass = None
+
+PROGRAM = """let add = fn(x, y) { x + y; };
+let result = add(10, 20) * 3 != 4;
+if (result < 100) { return true; } else { return false; }
+"""
+
+
+def count_tokens(engine, source):
+    lexer = engine(source)
+    count = 0
+    while lexer.next_token().type != TokenTypes.EOF:
+        count += 1
+    return count
+
+
+def construct(token_class, count):
+    for _ in range(count):
+        token_class(TokenTypes.IDENT, "foobar")
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--lines", type=int, default=20000)
+    args = args.parse_args()
+
+    source = PROGRAM * (args.lines // 3)
+    for name, engine in engines.items():
+        tokens = count_tokens(engine, source)
+        report(f"lex ({name})", tokens, best_of(lambda: count_tokens(engine, source), repeat=3), "tokens")
+
+    count = 200000
+    report("Token()", count, best_of(lambda: construct(Token, count)), "tokens")
+    if pydantic_dataclass is not None:
+        legacy = pydantic_dataclass(frozen=True)(type("Token", (), {"__annotations__": {"type": str, "literal": str}}))
+        report("pydantic Token()", count, best_of(lambda: construct(legacy, count)), "tokens")
+
+
+if __name__ == "__main__":
+    main()
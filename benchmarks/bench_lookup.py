@@ -0,0 +1,82 @@
+"""
+Variable lookups at increasing function nesting depths.
+
+    python -m benchmarks.bench_lookup [--number N] [--names N]
+
+Compares reading a variable declared `depth` functions out the way the
+evaluator does it, through the Cell the resolver made the innermost closure
+capture (see evaluator.environment), with looking the name up in a chain of
+dicts, one per scope, which is what the evaluator would have to do without
+the resolver. Every scope holds `--names` variables, so the dicts are not
+trivially small.
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from evaluator.environment import Cell, Environment
+
+DEPTHS = [0, 1, 4, 16, 64]
+
+
+class DictEnvironment:
+    """ The name based alternative: a dict per scope, searched innermost out """
+
+    def __init__(self, outer=None):
+        self.store = {}
+        self.outer = outer
+
+    def get(self, name):
+        env = self
+        while env is not None:
+            if name in env.store:
+                return env.store[name]
+            env = env.outer
+        return None
+
+
+def dict_chain(depth: int, names: int) -> DictEnvironment:
+    """ depth + 1 scopes, the variable we look for being in the outermost """
+    env = None
+    for level in range(depth + 1):
+        env = DictEnvironment(env)
+        prefix = "name" if level == 0 else f"local{level}_"
+        for index in range(names):
+            env.store[f"{prefix}{index}"] = index
+    return env
+
+
+def resolved_frame(depth: int, names: int) -> Environment:
+    """ The innermost call's Environment. At depth 0 the variable is one of its locals, else a free variable """
+    env = Environment(names)
+    env.slots[:] = range(names)
+    if depth:
+        env.free = (Cell(names - 1),)
+    return env
+
+
+def lookups(get, number: int):
+    for _ in range(number):
+        get()
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--number", type=int, default=100000)
+    args.add_argument("--names", type=int, default=16, help="variables per scope")
+    args = args.parse_args()
+
+    name = f"name{args.names - 1}"
+    for depth in DEPTHS:
+        frame, dicts = resolved_frame(depth, args.names), dict_chain(depth, args.names)
+        if depth:
+            resolved = lambda: frame.free[0].value
+        else:
+            resolved = lambda: frame.slots[args.names - 1]
+        report(f"depth {depth:>2} (resolved)", args.number,
+               best_of(lambda: lookups(resolved, args.number)), "lookups")
+        report(f"depth {depth:>2} (dicts)", args.number,
+               best_of(lambda: lookups(lambda: dicts.get(name), args.number)), "lookups")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Evaluations per second of peval.eval, one node type at a time.
+
+    python -m benchmarks.bench_nodes [--number N]
+
+Each case parses a tiny program and then times eval on just the node of
+interest. The children of that node are evaluated too, so the numbers are
+for the whole little subtree, but those stay as small as possible (literals).
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from evaluator.peval import eval
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+
+def expression(source):
+    return Parser.new(Lexer(source)).parse()._statements[0]._expression
+
+
+def statement(source):
+    return Parser.new(Lexer(source)).parse()._statements[0]
+
+
+CASES = {
+    "IntegerLiteral": lambda: expression("5;"),
+    "BooleanLiteral": lambda: expression("true;"),
+    "PrefixExpression (-)": lambda: expression("-5;"),
+    "PrefixExpression (!)": lambda: expression("!true;"),
+    "InfixExpression (+)": lambda: expression("5 + 5;"),
+    "InfixExpression (/)": lambda: expression("5 / 5;"),
+    "InfixExpression (<)": lambda: expression("5 < 6;"),
+    "InfixExpression (!=)": lambda: expression("5 != 6;"),
+    "InfixExpression (== Boolean)": lambda: expression("true == false;"),
+    "IfExpression": lambda: expression("if (true) { 1 } else { 2 };"),
+    "BlockStatement": lambda: expression("if (true) { 1; 2; 3 };")._consequence,
+    "ExpressionStatement": lambda: statement("5;"),
+    "Program": lambda: Parser.new(Lexer("5;")).parse(),
+}
+
+
+def evaluate(node, number):
+    for _ in range(number):
+        eval(node)
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--number", type=int, default=100000)
+    args = args.parse_args()
+
+    for name, make_node in CASES.items():
+        node = make_node()
+        report(name, args.number, best_of(lambda: evaluate(node, args.number), repeat=3), "evals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Parser throughput, and what trace_helper.TraceCalls costs per expression.
+Then what making a parser costs, alone and for many tiny programs.
+
+    python -m benchmarks.bench_parser [--statements N] [--programs N]
+
+"traced (disabled)" is how Parser used to be shipped: every recursive
+expression parse wrapped in TraceCalls with debug switched off.
+"per instance" is how parsers used to be made: every one registering its
+eighteen parse functions, as bound methods, in dictionaries of its own.
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+from trace_helper import TraceCalls
+
+STATEMENT = "(5 + 10 * 2 + 15 / 3) * 2 + -10 < -(a - b) == !c;\n"
+TINY_PROGRAMS = ["1 + 2;", "let x = 5;", "add(x, 2 * y);", "if (a < b) { a } else { b };", "fn(x) { x * x }(3);"]
+
+
+class DisabledTracingParser(Parser):
+    trace = TraceCalls(debug=False)
+
+    parse_expression_statement = trace(Parser.parse_expression_statement)
+    parse_grouped_expression = trace(Parser.parse_grouped_expression)
+    parse_prefix_expression = trace(Parser.parse_prefix_expression)
+    parse_infix_expression = trace(Parser.parse_infix_expression)
+    parseExpression = trace(Parser.parseExpression)
+
+
+class PerInstanceParser(Parser):
+    """ Does the registering Parser.new used to do for every parser, then parses as Parser does """
+
+    def setup(self):
+        super().setup()
+        self.bound_prefix_parsers = {}
+        self.bound_infix_parsers = {}
+        for token, func in self.prefix_parsers.items():
+            self.bound_prefix_parsers[token] = func.__get__(self)
+        for token, func in self.infix_parsers.items():
+            self.bound_infix_parsers[token] = func.__get__(self)
+
+
+def parse(parser_class, buffer):
+    parser_class.new(buffer.cursor()).parse()
+
+
+def count_traced_calls(buffer):
+    """ How many calls the TraceCalls wrappers see while parsing buffer """
+    calls = 0
+
+    def counting(fn):
+        def wrapper(*args):
+            nonlocal calls
+            calls += 1
+            return fn(*args)
+        return wrapper
+
+    counting_parser = type("CountingParser", (Parser,), {
+        name: counting(getattr(Parser, name)) for name in
+        ["parse_expression_statement", "parse_grouped_expression", "parse_prefix_expression",
+         "parse_infix_expression", "parseExpression"]
+    })
+    parse(counting_parser, buffer)
+    return calls
+
+
+def construct(parser_class, count):
+    lexer = Lexer("1;")
+    for _ in range(count):
+        parser_class.new(lexer)
+
+
+def parse_tiny(parser_class, programs):
+    for source in programs:
+        parser_class.new(Lexer(source)).parse()
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--statements", type=int, default=5000)
+    args.add_argument("--programs", type=int, default=20000)
+    args = args.parse_args()
+
+    buffer = Lexer(STATEMENT * args.statements).tokenize_all()
+    expressions = count_traced_calls(buffer)
+    timings = {}
+    for name, parser_class in [("plain", Parser), ("traced (disabled)", DisabledTracingParser)]:
+        timings[name] = best_of(lambda: parse(parser_class, buffer))
+        report(f"parse ({name})", expressions, timings[name], "expressions")
+
+    overhead = (timings["traced (disabled)"] - timings["plain"]) / expressions
+    print(f"TraceCalls overhead per expression: {overhead * 1e9:.0f} ns")
+
+    programs = (TINY_PROGRAMS * (args.programs // len(TINY_PROGRAMS) + 1))[:args.programs]
+    for name, parser_class in [("class tables", Parser), ("per instance", PerInstanceParser)]:
+        seconds = best_of(lambda: construct(parser_class, args.programs))
+        report(f"Parser.new ({name})", args.programs, seconds, "parsers")
+        seconds = best_of(lambda: parse_tiny(parser_class, programs))
+        report(f"tiny programs ({name})", args.programs, seconds, "programs")
+
+
+if __name__ == "__main__":
+    main()
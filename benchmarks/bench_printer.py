@@ -0,0 +1,78 @@
+"""
+Printing and serializing a large program: 100k statements by default.
+
+    python -m benchmarks.bench_printer [--statements N]
+
+"recursive" is how the nodes used to print, every __str__ building its
+string out of the strings of its children. str() now goes through
+abstract.printer, which writes every piece once to a StringIO.
+"""
+import argparse
+import io
+
+from abstract import monkey_ast as ast
+from abstract.printer import write
+from abstract.serialize import dumps, loads, dumps_json, loads_json
+from benchmarks.common import best_of, report
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+STATEMENTS = [
+    "let a = (5 + 10 * 2 + 15 / 3) * 2 + -10;",
+    "if (a < b) { a } else { add(a, -b) };",
+    "return !(a == b);",
+]
+
+
+def recursive(node) -> str:
+    """ str(node) the way the nodes used to make it """
+    cls = node.__class__
+    if cls is ast.Program or cls is ast.BlockStatement:
+        data = ""
+        for item in node._statements:
+            data = data + f"{recursive(item)}"
+        return data
+    if cls is ast.ExpressionStatement:
+        return recursive(node._expression) if node._expression else ""
+    if cls is ast.LetStatement:
+        return f"let {recursive(node._name)} = {recursive(node._value)};"
+    if cls is ast.ReturnStatement:
+        return f"return {recursive(node._value)};"
+    if cls is ast.PrefixExpression:
+        return f"({node._op}{recursive(node._right)})"
+    if cls is ast.InfixExpression:
+        return f"({recursive(node._left)} {node._op} {recursive(node._right)})"
+    if cls is ast.IfExpression:
+        data = f"if {recursive(node._condition)} " + "{ " + recursive(node._consequence) + " }"
+        if node._alternative:
+            data = data + " else " + "{ " + recursive(node._alternative) + " }"
+        return data
+    if cls is ast.CallExpression:
+        return f"{recursive(node._ident_or_func_literal)}(" + ", ".join(recursive(arg) for arg in node._args) + ")"
+    return f"{node._value}" if cls is not ast.BooleanLiteral else node._token.literal
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--statements", type=int, default=100000)
+    args = args.parse_args()
+
+    source = "\n".join(STATEMENTS[index % len(STATEMENTS)] for index in range(args.statements))
+    program = Parser.new(Lexer(source)).parse()
+    count = args.statements
+
+    assert recursive(program) == str(program)
+    report("recursive", count, best_of(lambda: recursive(program), repeat=3), "statements")
+    report("str (printer)", count, best_of(lambda: str(program), repeat=3), "statements")
+    report("write to a stream", count, best_of(lambda: write(program, io.StringIO()), repeat=3), "statements")
+
+    binary, text = dumps(program), dumps_json(program)
+    print(f"source {len(source):,} bytes, binary {len(binary):,} bytes, json {len(text):,} bytes")
+    report("dumps (binary)", count, best_of(lambda: dumps(program), repeat=3), "statements")
+    report("loads (binary)", count, best_of(lambda: loads(binary), repeat=3), "statements")
+    report("dumps_json", count, best_of(lambda: dumps_json(program), repeat=3), "statements")
+    report("loads_json", count, best_of(lambda: loads_json(text), repeat=3), "statements")
+
+
+if __name__ == "__main__":
+    main()
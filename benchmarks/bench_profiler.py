@@ -0,0 +1,34 @@
+"""
+What the profiler costs: peval on its own, profiled, and again once the
+profiler has been stopped, which should be where it started.
+
+    python -m benchmarks.bench_profiler [--n N]
+"""
+import argparse
+
+from benchmarks.bench_calls import fib_calls
+from benchmarks.common import best_of, report
+from evaluator import peval
+from evaluator.profiler import Profiler
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+FIB = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib({n});"
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--n", type=int, default=18)
+    args = args.parse_args()
+
+    program = Parser.new(Lexer(FIB.replace("{n}", str(args.n)))).parse()
+    calls = fib_calls(args.n)
+
+    report("eval", calls, best_of(lambda: peval.eval(program)), "calls")
+    with Profiler():
+        report("eval, profiled", calls, best_of(lambda: peval.eval(program)), "calls")
+    report("eval, profiler stopped", calls, best_of(lambda: peval.eval(program)), "calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Deep recursion on every engine, at Python's default recursion limit.
+
+    python -m benchmarks.bench_recursion [--depth N] [--repeat R]
+
+countdown recurses in tail position, sum does not (it adds after the call
+returns). Engines which recurse in Python for every Monkey call give up with
+a RecursionError long before either gets deep, which is reported instead of
+a rate.
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from benchmarks.bench_eval import engines
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+COUNTDOWN = """
+let countdown = fn(n) { if (n == 0) { 0 } else { countdown(n - 1) } };
+countdown({n});
+"""
+
+SUM = """
+let sum = fn(n) { if (n == 0) { 0 } else { n + sum(n - 1) } };
+sum({n});
+"""
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--depth", type=int, default=10000)
+    args.add_argument("--repeat", type=int, default=3)
+    args = args.parse_args()
+
+    for name, source in [("countdown", COUNTDOWN), ("sum", SUM)]:
+        program = Parser.new(Lexer(source.replace("{n}", str(args.depth)))).parse()
+        for engine, run in engines(program).items():
+            label = f"{name}({args.depth}) ({engine})"
+            try:
+                report(label, args.depth + 1, best_of(run, args.repeat), "calls")
+            except RecursionError:
+                print(f"{label:<40} {'RecursionError':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+The cost of return statements on every engine.
+
+    python -m benchmarks.bench_return [--n N] [--repeat R]
+
+Each program comes twice, once leaving its functions with return statements
+and once as straight-line code which gets to the same values with if/else,
+so the difference between the two rates is what return costs. search exits
+a recursive loop early, fib returns from every single call.
+"""
+import argparse
+import sys
+
+from benchmarks.common import best_of, report
+from benchmarks.bench_calls import fib_calls
+from benchmarks.bench_eval import engines
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+SEARCH = """
+let search = fn(n, target) {
+    if (n == target) { return n; }
+    if (n > 1000000) { return 0 - 1; }
+    search(n + 1, target)
+};
+let repeat = fn(times) { if (times == 0) { 0 } else { search(0, {n}) + repeat(times - 1) } };
+repeat(200);
+"""
+
+SEARCH_STRAIGHT = """
+let search = fn(n, target) {
+    if (n == target) { n } else { if (n > 1000000) { 0 - 1 } else { search(n + 1, target) } }
+};
+let repeat = fn(times) { if (times == 0) { 0 } else { search(0, {n}) + repeat(times - 1) } };
+repeat(200);
+"""
+
+FIB = """
+let fib = fn(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); };
+fib({n});
+"""
+
+FIB_STRAIGHT = """
+let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+fib({n});
+"""
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--n", type=int, default=20)
+    args.add_argument("--repeat", type=int, default=3)
+    args = args.parse_args()
+    # the tree walking engines recurse in Python for every Monkey call
+    sys.setrecursionlimit(100000)
+
+    search_calls = 200 * (args.n + 2) + 1
+    cases = [
+        ("search (return)", SEARCH, search_calls),
+        ("search (straight)", SEARCH_STRAIGHT, search_calls),
+        ("fib (return)", FIB, fib_calls(args.n)),
+        ("fib (straight)", FIB_STRAIGHT, fib_calls(args.n)),
+    ]
+    for name, source, calls in cases:
+        program = Parser.new(Lexer(source.replace("{n}", str(args.n)))).parse()
+        for engine, run in engines(program).items():
+            report(f"{name} ({engine})", calls, best_of(run, args.repeat), "calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+What the accounting of a sandbox costs: the same programs on the
+explicit-stack evaluator with and without Limits, limits high enough that
+nothing is stopped.
+
+    python -m benchmarks.bench_sandbox [--scale X]
+"""
+import argparse
+
+from benchmarks.common import best_of, report
+from evaluator import stack_eval
+from evaluator.stack_eval import Limits
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+PROGRAMS = {
+    # calls, small integers
+    "fib": ("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib({n});", 18),
+    # arithmetic on integers past the shared ones
+    "sum": ("let sum = fn(n, total) { if (n == 0) { total } else { sum(n - 1, total + n * 1000) } }; sum({n}, 0);",
+            20000),
+    # closures
+    "adders": ("let make = fn(n) { fn(x) { x + n } };"
+               "let loop = fn(n, total) { if (n == 0) { total } else { loop(n - 1, make(n)(total)) } }; loop({n}, 0);",
+               10000),
+}
+
+LIMITS = Limits(steps=10 ** 9, memory=10 ** 12, depth=10 ** 6)
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--scale", type=float, default=1.0, help="multiplies the n of every program but fib, whose time grows exponentially with it")
+    args = args.parse_args()
+
+    for name, (source, n) in PROGRAMS.items():
+        n = int(n * args.scale) if name != "fib" else n
+        program = Parser.new(Lexer(source.replace("{n}", str(n)))).parse()
+        evaluation = stack_eval.Evaluation(program)
+        evaluation.run()
+        steps = evaluation.steps
+
+        plain = best_of(lambda: stack_eval.eval(program), repeat=15)
+        sandboxed = best_of(lambda: stack_eval.eval(program, limits=LIMITS), repeat=15)
+        report(f"{name} (plain)", steps, plain, "steps")
+        report(f"{name} (sandboxed)", steps, sandboxed, "steps")
+        print(f"{name}: sandbox overhead {(sandboxed / plain - 1) * 100:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
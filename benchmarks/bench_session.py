@@ -0,0 +1,73 @@
+"""
+A repl line run against a large library, 2k functions by default.
+
+    python -m benchmarks.bench_session [--functions N]
+
+"library and line" is what the repl used to take: every line a program of
+its own, so using the library meant running all of it with the line.
+"session" runs the line alone, in a Session the library was loaded into
+once, and "session, line seen before" reuses the line's prepared program.
+Loading the library is timed with the ProgramCache cold and warm.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import best_of, report
+from monkey import Interpreter
+from monkey.cache import ProgramCache
+
+
+def name(index: int) -> str:
+    """ The name of the index-th function of the library, identifiers being letters only """
+    letters = ""
+    while True:
+        letters = chr(ord("a") + index % 26) + letters
+        index = index // 26
+        if not index:
+            return "func" + letters
+
+
+def library(functions: int) -> str:
+    return "\n".join(f"let {name(index)} = fn(x) {{ if (x < {index}) {{ x * 2 }} else {{ x + {index} }} }};"
+                     for index in range(functions))
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--functions", type=int, default=2000)
+    args.add_argument("--engine", default="eval")
+    args = args.parse_args()
+
+    source = library(args.functions)
+    line = f"{name(0)}(3) + {name(args.functions - 1)}(4)"
+    interpreter = Interpreter(args.engine)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.mk")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(source)
+
+        cache = ProgramCache(os.path.join(directory, "cache"))
+        cold = best_of(lambda: (cache.clear(), interpreter.session().load(path, cache)), repeat=3)
+        report("load, cache cold", 1, cold, "loads")
+        warm = best_of(lambda: interpreter.session().load(path, cache), repeat=3)
+        report("load, cache warm", 1, warm, "loads")
+
+        session = interpreter.session()
+        session.load(path, cache)
+        expected = interpreter.exec(source + "\n" + line)
+        assert str(session.exec(line)) == str(expected), (session.exec(line), expected)
+
+        count = 10
+        report("library and line", count, best_of(lambda: [interpreter.exec(source + "\n" + line)
+                                                          for _ in range(count)], repeat=3), "lines")
+        count = 10000
+        lines = [f"{line} + {index}" for index in range(count)]
+        report("session", count, best_of(lambda: [session.exec(text) for text in lines], repeat=1), "lines")
+        report("session, line seen before", count, best_of(lambda: [session.exec(line) for _ in range(count)]),
+               "lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Getting a script ready to run, with and without the program cache.
+
+    python -m benchmarks.bench_startup [--functions N] [--repeat R] [--process]
+
+The script is N functions long. parse is lexing and parsing it, miss is the
+cache doing that and writing the entry, hit is reading the entry back. With
+--process the whole of `python repl.py script` is timed as well, once with
+an empty cache every run and once with a warm one.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import best_of, report
+from lexer.monkey_lexer import Lexer
+from monkey.cache import ProgramCache
+from parser import Parser
+
+FUNCTION = """
+let f{i} = fn(a, b) {
+    if (a < b) { return a * 2 + b; }
+    let c = a - b;
+    if (c == 0) { f{i}(a + 1, b) } else { fn(x) { x + c }(a / 2) }
+};
+"""
+
+
+def name(i: int) -> str:
+    # identifiers are letters only
+    return "".join(chr(ord("a") + int(digit)) for digit in str(i))
+
+
+def script(functions: int) -> str:
+    return "".join(FUNCTION.replace("{i}", name(i)) for i in range(functions)) + "fa(1, 2);\n"
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--functions", type=int, default=500)
+    args.add_argument("--repeat", type=int, default=5)
+    args.add_argument("--process", action="store_true")
+    args = args.parse_args()
+
+    source = script(args.functions)
+    lines = source.count("\n")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ProgramCache(os.path.join(directory, "cache"))
+
+        def miss():
+            cache.clear()
+            cache.parse(source)
+
+        report("parse", lines, best_of(lambda: Parser.new(Lexer(source)).parse(), args.repeat), "lines")
+        report("cache miss", lines, best_of(miss, args.repeat), "lines")
+        report("cache hit", lines, best_of(lambda: cache.parse(source), args.repeat), "lines")
+        print(f"{'cache entry':<40} {cache.size():>14,} bytes   (source {len(source.encode()):,} bytes)")
+
+        if args.process:
+            path = os.path.join(directory, "script.mk")
+            with open(path, "w") as file:
+                file.write(source)
+            repl = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "repl.py")
+            env = dict(os.environ, MONKEY_CACHE_DIR=cache.directory)
+
+            def run():
+                subprocess.run([sys.executable, repl, "--engine", "vm", path], env=env, check=True,
+                               stdout=subprocess.DEVNULL)
+
+            def cold():
+                cache.clear()
+                run()
+
+            report("process, empty cache", 1, best_of(cold, args.repeat), "runs")
+            report("process, warm cache", 1, best_of(run, args.repeat), "runs")
+
+
+if __name__ == "__main__":
+    main()
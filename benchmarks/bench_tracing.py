@@ -0,0 +1,44 @@
+"""
+What tracing a parse costs: TracingParser writing BEGIN/END lines as it
+goes against a Tracer recording events, and rendering them afterwards.
+
+    python -m benchmarks.bench_tracing [--statements N]
+"""
+import argparse
+import io
+
+from benchmarks.bench_parser import STATEMENT
+from benchmarks.common import best_of, report
+from lexer.monkey_lexer import Lexer
+from parser import Parser, TracingParser
+from tracing import Tracer
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--statements", type=int, default=500)
+    args = args.parse_args()
+
+    buffer = Lexer(STATEMENT * args.statements).tokenize_all()
+    statements = args.statements
+
+    report("untraced", statements, best_of(lambda: Parser.from_buffer(buffer).parse()), "statements")
+
+    def trace_calls():
+        TracingParser.trace.stream = io.StringIO()
+        TracingParser.from_buffer(buffer).parse()
+    report("TraceCalls", statements, best_of(trace_calls), "statements")
+
+    tracer = Tracer(capacity=10 ** 6, phases=["parse"])
+
+    def record():
+        tracer.clear()
+        with tracer:
+            Parser.from_buffer(buffer).parse()
+    report("Tracer, recording", statements, best_of(record), "statements")
+    report("Tracer, dumping what was recorded", statements, best_of(lambda: tracer.dump(io.StringIO())),
+           "statements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import time
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """ Run func `repeat` times and return the fastest wall clock time in seconds """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, count: int, seconds: float, unit: str = "ops"):
+    print(f"{name:<40} {count / seconds:>14,.0f} {unit}/s   ({seconds * 1000:.2f} ms)")
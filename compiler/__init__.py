@@ -0,0 +1 @@
+from .compiler import Compiler, Bytecode, CompiledFunction, compile
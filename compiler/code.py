@@ -0,0 +1,109 @@
+"""
+Monkey bytecode.
+
+A compiled program is a flat array of unsigned 32 bit words. Every
+instruction is one opcode word followed by as many operand words as its
+definition asks for:
+
+    CONSTANT 0        push constants[0]
+    CONSTANT 1        push constants[1]
+    ADD               pop two values, push their sum
+    POP               pop the value of the expression statement
+
+Jump operands are absolute word offsets into the same array, and variable
+operands are the slots evaluator.resolver gave the variables. A function
+body is compiled into instructions of its own, which CALL switches to.
+"""
+from array import array
+from typing import Dict, List, NamedTuple
+
+
+class Opcodes:
+    CONSTANT = 1
+    POP = 2
+
+    ADD = 3
+    SUB = 4
+    MUL = 5
+    DIV = 6
+
+    EQUAL = 7
+    NOT_EQUAL = 8
+    GREATER_THAN = 9
+    LESS_THAN = 10
+
+    MINUS = 11
+    BANG = 12
+
+    TRUE = 13
+    FALSE = 14
+    NULL = 15
+
+    JUMP_NOT_TRUTHY = 16
+    JUMP = 17
+
+    GET_GLOBAL = 18
+    SET_GLOBAL = 19
+    GET_LOCAL = 20
+    SET_LOCAL = 21
+    GET_CELL = 22
+    SET_CELL = 23
+    GET_FREE = 24
+
+    CLOSURE = 25
+    CALL = 26
+    RETURN_VALUE = 27
+
+
+class Definition(NamedTuple):
+    name: str
+    operands: int
+
+
+definitions: Dict[int, Definition] = {
+    Opcodes.CONSTANT: Definition("CONSTANT", 1),
+    Opcodes.POP: Definition("POP", 0),
+    Opcodes.ADD: Definition("ADD", 0),
+    Opcodes.SUB: Definition("SUB", 0),
+    Opcodes.MUL: Definition("MUL", 0),
+    Opcodes.DIV: Definition("DIV", 0),
+    Opcodes.EQUAL: Definition("EQUAL", 0),
+    Opcodes.NOT_EQUAL: Definition("NOT_EQUAL", 0),
+    Opcodes.GREATER_THAN: Definition("GREATER_THAN", 0),
+    Opcodes.LESS_THAN: Definition("LESS_THAN", 0),
+    Opcodes.MINUS: Definition("MINUS", 0),
+    Opcodes.BANG: Definition("BANG", 0),
+    Opcodes.TRUE: Definition("TRUE", 0),
+    Opcodes.FALSE: Definition("FALSE", 0),
+    Opcodes.NULL: Definition("NULL", 0),
+    Opcodes.JUMP_NOT_TRUTHY: Definition("JUMP_NOT_TRUTHY", 1),
+    Opcodes.JUMP: Definition("JUMP", 1),
+    Opcodes.GET_GLOBAL: Definition("GET_GLOBAL", 1),
+    Opcodes.SET_GLOBAL: Definition("SET_GLOBAL", 1),
+    Opcodes.GET_LOCAL: Definition("GET_LOCAL", 1),
+    Opcodes.SET_LOCAL: Definition("SET_LOCAL", 1),
+    Opcodes.GET_CELL: Definition("GET_CELL", 1),
+    Opcodes.SET_CELL: Definition("SET_CELL", 1),
+    Opcodes.GET_FREE: Definition("GET_FREE", 1),
+    Opcodes.CLOSURE: Definition("CLOSURE", 1),
+    Opcodes.CALL: Definition("CALL", 1),
+    Opcodes.RETURN_VALUE: Definition("RETURN_VALUE", 0),
+}
+
+
+def make(opcode: int, *operands: int) -> List[int]:
+    definition = definitions[opcode]
+    if len(operands) != definition.operands:
+        raise ValueError(f"{definition.name} takes {definition.operands} operands, got {len(operands)}")
+    return [opcode, *operands]
+
+
+def disassemble(instructions: array) -> str:
+    lines = []
+    position = 0
+    while position < len(instructions):
+        definition = definitions[instructions[position]]
+        operands = instructions[position + 1:position + 1 + definition.operands]
+        lines.append(" ".join([f"{position:04d}", definition.name] + [str(operand) for operand in operands]))
+        position += 1 + definition.operands
+    return "\n".join(lines)
@@ -0,0 +1,278 @@
+from array import array
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+from abstract import monkey_ast as ast
+from evaluator.folding import fold_constants
+from evaluator.object import Object, make_integer
+from evaluator.resolver import LOCAL, GLOBAL, CELL, FREE, Scope, resolve
+from lexer.monkey_lexer import TokenTypes
+from lexer.source_map import SourceMap
+from .code import Opcodes, make
+
+infix_opcodes = {
+    TokenTypes.PLUS: Opcodes.ADD,
+    TokenTypes.MINUS: Opcodes.SUB,
+    TokenTypes.ASTERISK: Opcodes.MUL,
+    TokenTypes.SLASH: Opcodes.DIV,
+    TokenTypes.EQ: Opcodes.EQUAL,
+    TokenTypes.NOT_EQ: Opcodes.NOT_EQUAL,
+    TokenTypes.GT: Opcodes.GREATER_THAN,
+    TokenTypes.LT: Opcodes.LESS_THAN,
+}
+
+prefix_opcodes = {
+    TokenTypes.MINUS: Opcodes.MINUS,
+    TokenTypes.BANG: Opcodes.BANG,
+}
+
+# operand value used for jumps until we know where they go
+PLACEHOLDER = 0xFFFFFFFF
+
+
+get_opcodes = {
+    LOCAL: Opcodes.GET_LOCAL,
+    GLOBAL: Opcodes.GET_GLOBAL,
+    CELL: Opcodes.GET_CELL,
+    FREE: Opcodes.GET_FREE,
+}
+
+set_opcodes = {
+    LOCAL: Opcodes.SET_LOCAL,
+    GLOBAL: Opcodes.SET_GLOBAL,
+    CELL: Opcodes.SET_CELL,
+}
+
+
+@dataclass
+class Bytecode:
+    instructions: array
+    constants: List[Object]
+    # source offset of every instruction which can fail at runtime
+    positions: Dict[int, int] = field(default_factory=dict)
+    source_map: SourceMap = None
+    # name of every global slot
+    global_names: List[str] = field(default_factory=list)
+    # name of the variable every GET_* instruction reads, for errors about unbound ones
+    names: Dict[int, str] = field(default_factory=dict)
+
+
+@dataclass
+class CompiledFunction:
+    """
+    The body of a function literal, kept in the constants of the program.
+    CLOSURE turns it into an evaluator.object.Function, and CALL runs it with
+    the arguments and then the rest of its locals on top of the stack.
+    """
+    literal: ast.FunctionLiteral
+    instructions: array
+    positions: Dict[int, int]
+    names: Dict[int, str]
+    num_locals: int
+    num_parameters: int
+    # locals holding a Cell, and where the cells of a closure come from (see evaluator.resolver)
+    cells: Tuple[int, ...] = ()
+    free: Tuple[Tuple[int, int], ...] = ()
+    # constants of the program the function is part of, which is not always the one calling it
+    constants: List[Object] = None
+
+    @cached_property
+    def ops(self) -> List[int]:
+        """ The instructions as a list, which the VM indexes a little quicker than the array """
+        return self.instructions.tolist()
+
+
+class Compiler:
+    """
+    Lowers an AST to Bytecode for vm.VM.
+
+    Every expression leaves exactly one value on the stack, and every
+    statement leaves none, so an expression statement is its expression
+    followed by POP. The VM remembers the last value popped, which is how the
+    program ends up with the value of its last statement.
+
+    Constant subexpressions are folded (see evaluator.folding) before a
+    program is lowered, unless fold is turned off.
+    """
+
+    def __init__(self, fold: bool = True):
+        self.fold = fold
+        self.instructions = array("I")
+        self.constants: List[Object] = []
+        self.positions: Dict[int, int] = {}
+        self.names: Dict[int, str] = {}
+        self.source_map: SourceMap = None
+        self.scope: Scope = None
+        self._integer_constants: Dict[int, int] = {}
+        self._last_position = -1
+
+    def bytecode(self) -> Bytecode:
+        global_names = []
+        if self.scope is not None:
+            global_names = sorted(self.scope.slots, key=self.scope.slots.get)
+        return Bytecode(self.instructions, self.constants, self.positions, self.source_map, global_names,
+                        self.names)
+
+    def emit(self, opcode: int, *operands: int) -> int:
+        position = len(self.instructions)
+        self.instructions.extend(make(opcode, *operands))
+        self._last_position = position
+        return position
+
+    def emit_failable(self, node, opcode: int, *operands: int) -> int:
+        """ emit an instruction which can produce a runtime error for node """
+        position = self.emit(opcode, *operands)
+        self.positions[position] = node._offset
+        return position
+
+    def change_operand(self, position: int, operand: int):
+        self.instructions[position + 1] = operand
+
+    def add_integer(self, value: int) -> int:
+        index = self._integer_constants.get(value)
+        if index is None:
+            index = self._integer_constants[value] = len(self.constants)
+            self.constants.append(make_integer(value))
+        return index
+
+    def compile(self, node):
+        handler = handlers.get(type(node))
+        if handler is None:
+            # Nodes without a compiler yet evaluate to null, as they do in peval
+            self.emit(Opcodes.NULL)
+        else:
+            handler(self, node)
+
+    def compile_program(self, node: ast.Program):
+        self.source_map = node._source_map
+        self.scope = node._scope or resolve(node)
+        if self.fold:
+            node = fold_constants(node)
+        for statement in node._statements:
+            self.compile_statement(statement)
+
+        if node._statements and isinstance(node._statements[-1], ast.LetStatement):
+            # a let has no value, so a program ending with one is null
+            self.emit(Opcodes.NULL)
+            self.emit(Opcodes.POP)
+
+    def compile_statement(self, node):
+        if isinstance(node, ast.ExpressionStatement):
+            self.compile(node._expression)
+        elif isinstance(node, ast.LetStatement):
+            # leaves nothing on the stack, so there is nothing to pop
+            self.compile_let(node)
+            return
+        elif isinstance(node, ast.ReturnStatement):
+            # nothing after it runs
+            self.compile_return(node)
+            return
+        else:
+            self.compile(node)
+        self.emit(Opcodes.POP)
+
+    def compile_block(self, node: ast.BlockStatement):
+        """ A block is an expression here: it leaves its last value on the stack """
+        if node is None or not node._statements:
+            self.emit(Opcodes.NULL)
+            return
+
+        for statement in node._statements:
+            self.compile_statement(statement)
+
+        if isinstance(node._statements[-1], ast.LetStatement):
+            self.emit(Opcodes.NULL)
+        elif isinstance(node._statements[-1], ast.ReturnStatement):
+            # control never gets to the end of the block
+            pass
+        else:
+            # the last statement's value is the value of the block
+            del self.instructions[self._last_position:]
+
+    def compile_let(self, node: ast.LetStatement):
+        self.compile(node._value)
+        self.emit(set_opcodes[node._name._kind], node._name._slot)
+
+    def compile_return(self, node: ast.ReturnStatement):
+        """ RETURN_VALUE leaves the function, or ends the program outside of one """
+        if node._value is None:
+            self.emit(Opcodes.NULL)
+        else:
+            self.compile(node._value)
+        self.emit(Opcodes.RETURN_VALUE)
+
+    def compile_identifier(self, node: ast.Identifier):
+        position = self.emit_failable(node, get_opcodes[node._kind], node._slot)
+        self.names[position] = node._value
+
+    def compile_function_literal(self, node: ast.FunctionLiteral):
+        """ The body goes into instructions of its own, the CLOSURE making the function in here """
+        outer = self.instructions, self.positions, self.names, self._last_position
+        self.instructions, self.positions, self.names = array("I"), {}, {}
+
+        self.compile_block(node._block)
+        self.emit(Opcodes.RETURN_VALUE)
+        function = CompiledFunction(node._unfolded or node, self.instructions, self.positions, self.names,
+                                    node._scope_size, len(node._parameters), node._cells, node._free, self.constants)
+
+        self.instructions, self.positions, self.names, self._last_position = outer
+        self.constants.append(function)
+        self.emit(Opcodes.CLOSURE, len(self.constants) - 1)
+
+    def compile_call(self, node: ast.CallExpression):
+        self.compile(node._ident_or_func_literal)
+        for arg in node._args:
+            self.compile(arg)
+        self.emit_failable(node, Opcodes.CALL, len(node._args))
+
+    def compile_integer(self, node: ast.IntegerLiteral):
+        self.emit(Opcodes.CONSTANT, self.add_integer(node._value))
+
+    def compile_boolean(self, node: ast.BooleanLiteral):
+        self.emit(Opcodes.TRUE if node._value else Opcodes.FALSE)
+
+    def compile_prefix(self, node: ast.PrefixExpression):
+        self.compile(node._right)
+        self.emit_failable(node, prefix_opcodes[node._op])
+
+    def compile_infix(self, node: ast.InfixExpression):
+        self.compile(node._left)
+        self.compile(node._right)
+        self.emit_failable(node, infix_opcodes[node._op])
+
+    def compile_if(self, node: ast.IfExpression):
+        self.compile(node._condition)
+        jump_not_truthy = self.emit(Opcodes.JUMP_NOT_TRUTHY, PLACEHOLDER)
+
+        self.compile_block(node._consequence)
+        jump = self.emit(Opcodes.JUMP, PLACEHOLDER)
+
+        self.change_operand(jump_not_truthy, len(self.instructions))
+        if node._alternative:
+            self.compile_block(node._alternative)
+        else:
+            self.emit(Opcodes.NULL)
+        self.change_operand(jump, len(self.instructions))
+
+
+handlers = {
+    ast.Program: Compiler.compile_program,
+    ast.BlockStatement: Compiler.compile_block,
+    ast.IntegerLiteral: Compiler.compile_integer,
+    ast.BooleanLiteral: Compiler.compile_boolean,
+    ast.PrefixExpression: Compiler.compile_prefix,
+    ast.InfixExpression: Compiler.compile_infix,
+    ast.IfExpression: Compiler.compile_if,
+    ast.LetStatement: Compiler.compile_let,
+    ast.ReturnStatement: Compiler.compile_return,
+    ast.Identifier: Compiler.compile_identifier,
+    ast.FunctionLiteral: Compiler.compile_function_literal,
+    ast.CallExpression: Compiler.compile_call,
+}
+
+
+def compile(node, fold: bool = True) -> Bytecode:
+    compiler = Compiler(fold)
+    compiler.compile(node)
+    return compiler.bytecode()
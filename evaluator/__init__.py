@@ -1 +1,2 @@
-from .peval import eval
\ No newline at end of file
+from .peval import eval
+from .closures import compile
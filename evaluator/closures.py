@@ -0,0 +1,344 @@
+"""
+Closure compilation.
+
+peval.eval works out what to do with a node every single time it sees it.
+For code which runs over and over it pays to do that work once: compile()
+walks the tree a single time and turns every node into a small Python
+closure which already knows its operator and holds the closures of its
+children, so running the program is just calling closures.
+
+    run = compile(program)
+    run()    # same result as eval(program)
+
+Every closure takes the Environment to run in. Variables were resolved
+before compiling (see resolver.py), so each identifier gets a closure
+specialised for where its variable lives.
+
+Literals are turned into their objects at compile time, so evaluating one
+simply hands back the prebuilt object, and constant subexpressions are
+folded into literals (see folding.py) before any closure is built. Anything
+off the fast paths (mixed operand types, errors) goes through the same
+functions peval uses, which is what keeps the two backends in agreement.
+"""
+import operator
+from typing import Callable, List
+
+from abstract import monkey_ast as ast
+from lexer.monkey_lexer import TokenTypes
+from .environment import Environment, FramePool
+from .folding import fold_constants
+from .object import Object, Integer, Error, Function, RETURNING, make_integer
+from .peval import singleton_mapper, eval_prefix_expression, eval_infix_expression, locate_error, \
+    capture, check_call, returned
+from .resolver import LOCAL, GLOBAL, CELL, resolve
+
+TRUE = singleton_mapper['TRUE']
+FALSE = singleton_mapper['FALSE']
+NULL = singleton_mapper['NULL']
+
+Compiled = Callable[[Environment], Object]
+
+arithmetic_operators = {
+    TokenTypes.PLUS: operator.add,
+    TokenTypes.MINUS: operator.sub,
+    TokenTypes.ASTERISK: operator.mul,
+}
+
+comparison_operators = {
+    TokenTypes.LT: operator.lt,
+    TokenTypes.GT: operator.gt,
+    TokenTypes.EQ: operator.eq,
+    TokenTypes.NOT_EQ: operator.ne,
+}
+
+
+def constant(value: Object) -> Compiled:
+    def evaluate(env):
+        return value
+    return evaluate
+
+
+def compile_null(node) -> Compiled:
+    return constant(NULL)
+
+
+def compile_integer(node: ast.IntegerLiteral) -> Compiled:
+    return constant(make_integer(node._value))
+
+
+def compile_boolean(node: ast.BooleanLiteral) -> Compiled:
+    return constant(singleton_mapper[node.token_literal().upper()])
+
+
+def compile_statements(statements: List[ast.Statement]) -> Compiled:
+    compiled = [compile(statement) for statement in statements]
+    if not compiled:
+        return constant(NULL)
+    if len(compiled) == 1:
+        return compiled[0]
+
+    def evaluate(env):
+        for statement in compiled:
+            result = statement(env)
+            if isinstance(result, Error):
+                return result
+        return result
+    return evaluate
+
+
+def compile_program(node: ast.Program) -> Compiled:
+    scope = node._scope or resolve(node)
+    node = fold_constants(node)
+    statements = compile_statements(node._statements)
+
+    def evaluate(env: Environment = None):
+        if env is None:
+            env = Environment(scope.size)
+        else:
+            env.ensure(scope.size)
+        return locate_error(returned(statements(env), env), node)
+    return evaluate
+
+
+def compile_expression_statement(node: ast.ExpressionStatement) -> Compiled:
+    return compile(node._expression)
+
+
+def compile_block(node: ast.BlockStatement) -> Compiled:
+    return compile_statements(node._statements)
+
+
+def compile_let(node: ast.LetStatement) -> Compiled:
+    value = compile(node._value)
+    kind, slot = node._name._kind, node._name._slot
+
+    if kind == LOCAL:
+        def evaluate(env):
+            result = value(env)
+            if isinstance(result, Error):
+                return result
+            env.slots[slot] = result
+            return NULL
+    elif kind == GLOBAL:
+        def evaluate(env):
+            result = value(env)
+            if isinstance(result, Error):
+                return result
+            env.globals[slot] = result
+            return NULL
+    else:
+        def evaluate(env):
+            result = value(env)
+            if isinstance(result, Error):
+                return result
+            env.slots[slot].value = result
+            return NULL
+    return evaluate
+
+
+def compile_return(node: ast.ReturnStatement) -> Compiled:
+    value = compile(node._value) if node._value is not None else constant(NULL)
+
+    def evaluate(env):
+        result = value(env)
+        if isinstance(result, Error):
+            return result
+        env.returned = result
+        return RETURNING
+    return evaluate
+
+
+def compile_identifier(node: ast.Identifier) -> Compiled:
+    kind, slot, name, offset = node._kind, node._slot, node._value, node._offset
+
+    if kind == LOCAL:
+        def evaluate(env):
+            value = env.slots[slot]
+            if value is None:
+                return Error(f"identifier not found: {name}", offset)
+            return value
+    elif kind == GLOBAL:
+        def evaluate(env):
+            value = env.globals[slot]
+            if value is None:
+                return Error(f"identifier not found: {name}", offset)
+            return value
+    elif kind == CELL:
+        def evaluate(env):
+            value = env.slots[slot].value
+            if value is None:
+                return Error(f"identifier not found: {name}", offset)
+            return value
+    else:
+        def evaluate(env):
+            value = env.free[slot].value
+            if value is None:
+                return Error(f"identifier not found: {name}", offset)
+            return value
+    return evaluate
+
+
+def compile_function_literal(node: ast.FunctionLiteral) -> Compiled:
+    # a Function's code here is its compiled body and the frames to run it in
+    code = (compile(node._block), FramePool(node._scope_size, node._cells))
+    literal = node._unfolded or node
+
+    if not node._free:
+        def evaluate(env):
+            return Function(literal, code)
+    else:
+        def evaluate(env):
+            return Function(literal, code, capture(node, env))
+    return evaluate
+
+
+def compile_call(node: ast.CallExpression) -> Compiled:
+    callee = compile(node._ident_or_func_literal)
+    compiled_args = [compile(arg) for arg in node._args]
+    offset = node._offset
+
+    def evaluate(env):
+        function = callee(env)
+        if isinstance(function, Error):
+            return function
+        args = []
+        for arg in compiled_args:
+            value = arg(env)
+            if isinstance(value, Error):
+                return value
+            args.append(value)
+
+        if function.__class__ is not Function or len(args) != len(function.literal._parameters):
+            return check_call(function, args, offset)
+        body, pool = function.code
+        frame = pool.acquire(args, function.free, env.globals)
+        result = body(frame)
+        if result is RETURNING:
+            result, frame.returned = frame.returned, None
+        pool.release(frame)
+        return result
+    return evaluate
+
+
+def compile_prefix(node: ast.PrefixExpression) -> Compiled:
+    right = compile(node._right)
+    _op, offset = node._op, node._offset
+
+    if _op == TokenTypes.BANG:
+        def evaluate(env):
+            value = right(env)
+            if value is FALSE or value is NULL:
+                return TRUE
+            if isinstance(value, Error):
+                return value
+            return FALSE
+    elif _op == TokenTypes.MINUS:
+        def evaluate(env):
+            value = right(env)
+            if value.__class__ is Integer:
+                return make_integer(-value.value)
+            if isinstance(value, Error):
+                return value
+            return eval_prefix_expression(_op, value, offset)
+    else:
+        def evaluate(env):
+            value = right(env)
+            if isinstance(value, Error):
+                return value
+            return eval_prefix_expression(_op, value, offset)
+    return evaluate
+
+
+def compile_infix(node: ast.InfixExpression) -> Compiled:
+    left = compile(node._left)
+    right = compile(node._right)
+    _op, offset = node._op, node._offset
+
+    if _op in arithmetic_operators:
+        integer_operator = arithmetic_operators[_op]
+
+        def evaluate(env):
+            left_value = left(env)
+            if isinstance(left_value, Error):
+                return left_value
+            right_value = right(env)
+            if left_value.__class__ is Integer and right_value.__class__ is Integer:
+                return make_integer(integer_operator(left_value.value, right_value.value))
+            if isinstance(right_value, Error):
+                return right_value
+            return eval_infix_expression(_op, left_value, right_value, offset)
+    elif _op in comparison_operators:
+        integer_operator = comparison_operators[_op]
+
+        def evaluate(env):
+            left_value = left(env)
+            if isinstance(left_value, Error):
+                return left_value
+            right_value = right(env)
+            if left_value.__class__ is Integer and right_value.__class__ is Integer:
+                return TRUE if integer_operator(left_value.value, right_value.value) else FALSE
+            if isinstance(right_value, Error):
+                return right_value
+            return eval_infix_expression(_op, left_value, right_value, offset)
+    elif _op == TokenTypes.SLASH:
+        def evaluate(env):
+            left_value = left(env)
+            if isinstance(left_value, Error):
+                return left_value
+            right_value = right(env)
+            if left_value.__class__ is Integer and right_value.__class__ is Integer and right_value.value:
+                return make_integer(left_value.value // right_value.value)
+            if isinstance(right_value, Error):
+                return right_value
+            return eval_infix_expression(_op, left_value, right_value, offset)
+    else:
+        def evaluate(env):
+            left_value = left(env)
+            if isinstance(left_value, Error):
+                return left_value
+            right_value = right(env)
+            if isinstance(right_value, Error):
+                return right_value
+            return eval_infix_expression(_op, left_value, right_value, offset)
+    return evaluate
+
+
+def compile_if(node: ast.IfExpression) -> Compiled:
+    condition = compile(node._condition)
+    consequence = compile(node._consequence)
+    alternative = compile(node._alternative) if node._alternative else constant(NULL)
+
+    def evaluate(env):
+        value = condition(env)
+        if value is FALSE or value is NULL:
+            return alternative(env)
+        if isinstance(value, Error):
+            return value
+        return consequence(env)
+    return evaluate
+
+
+compilers = {
+    ast.Program: compile_program,
+    ast.ExpressionStatement: compile_expression_statement,
+    ast.BlockStatement: compile_block,
+    ast.IntegerLiteral: compile_integer,
+    ast.BooleanLiteral: compile_boolean,
+    ast.PrefixExpression: compile_prefix,
+    ast.InfixExpression: compile_infix,
+    ast.IfExpression: compile_if,
+    ast.LetStatement: compile_let,
+    ast.ReturnStatement: compile_return,
+    ast.Identifier: compile_identifier,
+    ast.FunctionLiteral: compile_function_literal,
+    ast.CallExpression: compile_call,
+}
+
+
+def compile(node) -> Compiled:
+    """
+    Compile node, and everything below it, into a function evaluating it in
+    the Environment it is given. A compiled Program makes its own
+    Environment when called without one.
+    """
+    return compilers.get(type(node), compile_null)(node)
@@ -0,0 +1,82 @@
+"""
+Variable storage.
+
+The resolver (see resolver.py) gives every variable a slot number in the
+function (or program) that declares it, so at runtime a call only needs a
+plain list of values, an Environment, and reading a variable is indexing a
+list:
+
+    LOCAL   env.slots[slot]
+    GLOBAL  env.globals[slot]
+    CELL    env.slots[slot].value      a local some inner function captured
+    FREE    env.free[slot].value       a captured variable of an outer function
+
+Closures are flat: a function value holds the Cells of the variables it
+closes over, never the Environment they came from. Variables which are not
+captured are not boxed at all, and nothing keeps an Environment alive once
+its call returns, which is what lets FramePool hand it to the next call.
+
+A slot (or Cell) holding None has not been bound yet (its let has not run).
+
+A return statement leaves its value in the returned attribute of the
+Environment it ran in for the call it leaves (see object.Returning).
+"""
+from typing import List, Sequence, Tuple
+
+from .object import Object
+
+
+class Cell:
+    """ Box for a captured variable, shared by the function declaring it and the closures using it """
+    __slots__ = ("value",)
+
+    def __init__(self, value: Object = None):
+        self.value = value
+
+
+class Environment:
+    __slots__ = ("slots", "free", "globals", "returned")
+
+    def __init__(self, size: int = 0, globals: List[Object] = None, free: Tuple[Cell, ...] = ()):
+        self.slots: List[Object] = [None] * size
+        # the program's own Environment is the globals
+        self.globals = self.slots if globals is None else globals
+        self.free = free
+        self.returned: Object = None
+
+    def ensure(self, size: int):
+        """ Make room for size slots. Scopes which live on, like the globals of a repl, grow """
+        missing = size - len(self.slots)
+        if missing > 0:
+            self.slots.extend([None] * missing)
+
+
+class FramePool:
+    """
+    Environments for the calls of one function. Calls return in the reverse
+    order they were made, so a list used as a stack of spare Environments is
+    all it takes to recycle them, recursion included.
+    """
+    __slots__ = ("size", "cells", "blank", "frames")
+
+    def __init__(self, size: int, cells: Sequence[int] = ()):
+        self.size = size
+        # slots which hold a Cell instead of a value
+        self.cells = tuple(cells)
+        self.blank = [None] * size
+        self.frames: List[Environment] = []
+
+    def acquire(self, args: List[Object], free: Tuple[Cell, ...], globals: List[Object]) -> Environment:
+        frame = self.frames.pop() if self.frames else Environment(self.size)
+        slots = frame.slots
+        slots[:len(args)] = args
+        for slot in self.cells:
+            slots[slot] = Cell(slots[slot])
+        frame.free = free
+        frame.globals = globals
+        return frame
+
+    def release(self, frame: Environment):
+        frame.slots[:] = self.blank
+        frame.free = ()
+        self.frames.append(frame)
@@ -0,0 +1,84 @@
+"""
+Constant folding.
+
+An operator whose operands are all literals gives the same answer every time
+the program runs, so we may as well work it out once when the program is
+loaded:
+
+    5 * 10 + 2;     becomes     52;
+
+fold_constants replaces such InfixExpression and PrefixExpression subtrees
+with IntegerLiteral / BooleanLiteral nodes. Expressions which would produce
+an error (say 1 / 0) are left alone so that the error still happens, at the
+right place, when the program runs.
+
+The tree folded is left as it was, so the program somebody parsed still
+prints as they wrote it, whatever engine ran it: the nodes above a folded
+expression are copies, with the folded children, and everything else is
+shared. A copied FunctionLiteral keeps the literal as written in
+_unfolded, which is what the engines make the Function values print.
+"""
+import copy
+
+from abstract import monkey_ast as ast
+from lexer.monkey_lexer import Token, TokenTypes, keywords
+from .object import Object, Integer, Boolean, make_integer
+from .peval import native_bool_to_boolean, eval_prefix_expression, eval_infix_expression
+
+
+def literal_value(node) -> Object:
+    if node.__class__ is ast.IntegerLiteral:
+        return make_integer(node._value)
+    if node.__class__ is ast.BooleanLiteral:
+        return native_bool_to_boolean(node._value)
+    return None
+
+
+def make_literal(value: Object, offset: int):
+    if isinstance(value, Integer):
+        literal = ast.IntegerLiteral(Token(TokenTypes.INT, str(value.value)), value.value)
+    elif isinstance(value, Boolean):
+        literal = ast.BooleanLiteral(keywords["true" if value.value else "false"], value.value)
+    else:
+        return None
+    literal._offset = offset
+    return literal
+
+
+def fold_node(node):
+    """ Returns the literal node should be replaced with, or None """
+    if node.__class__ is ast.PrefixExpression:
+        right = literal_value(node._right)
+        if right is not None:
+            return make_literal(eval_prefix_expression(node._op, right, node._offset), node._offset)
+    elif node.__class__ is ast.InfixExpression:
+        left, right = literal_value(node._left), literal_value(node._right)
+        if left is not None and right is not None:
+            return make_literal(eval_infix_expression(node._op, left, right, node._offset), node._offset)
+    return None
+
+
+def fold_constants(node):
+    """
+    node with every constant expression below it folded: node itself if
+    there were none, else a copy of it or the literal replacing it.
+    """
+    folded = {}
+    for name in node._fields:
+        value = getattr(node, name)
+        if isinstance(value, list):
+            items = [item if item is None else fold_constants(item) for item in value]
+            if any(item is not old for item, old in zip(items, value)):
+                folded[name] = items
+        elif value is not None:
+            item = fold_constants(value)
+            if item is not value:
+                folded[name] = item
+
+    if folded:
+        original, node = node, copy.copy(node)
+        for name, value in folded.items():
+            setattr(node, name, value)
+        if node.__class__ is ast.FunctionLiteral:
+            node._unfolded = original._unfolded or original
+    return fold_node(node) or node
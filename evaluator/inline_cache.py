@@ -0,0 +1,75 @@
+"""
+Hit and miss counts of the inline caches.
+
+peval (and the explicit-stack evaluator, which shares its operators) caches
+on every InfixExpression the operation found for the classes of the last
+operands, and on every CallExpression the function last called. A hit skips
+the lookup, a miss does it and replaces what was cached. A site which keeps
+missing is one whose operands (or callees) keep changing, so the counts
+show where the dynamic typing of a program costs it something.
+
+    eval(program)
+    for site in sites(program):
+        print(site)
+"""
+import sys
+from dataclasses import dataclass
+from typing import Iterator, List, TextIO
+
+from abstract import monkey_ast as ast
+from abstract.monkey_ast import iter_children
+
+
+@dataclass
+class Site:
+    node: ast.Expression
+    location: str
+    hits: int
+    misses: int
+
+    @property
+    def kind(self) -> str:
+        return "call" if isinstance(self.node, ast.CallExpression) else self.node._op
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return f"{self.location:<24} {self.kind:<6} {self.hits:>10} {self.misses:>10} {self.hit_rate:>8.1%}"
+
+
+def cache_sites(node) -> Iterator[ast.Expression]:
+    """ Every node below node (and node itself) which has an inline cache, parents before children """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.InfixExpression, ast.CallExpression)):
+            yield node
+        stack.extend(reversed(list(iter_children(node))))
+
+
+def sites(program: ast.Program, include_unused: bool = False) -> List[Site]:
+    """ Counts of every cache site of program, leaving out the ones which never ran unless include_unused """
+    source_map = program._source_map
+    found = []
+    for node in cache_sites(program):
+        if node._hits or node._misses or include_unused:
+            location = source_map.location(node._offset) if source_map is not None else str(node._offset)
+            found.append(Site(node, location, node._hits, node._misses))
+    return found
+
+
+def reset(program: ast.Program):
+    """ Zero the counts of every site of program, what is cached stays """
+    for node in cache_sites(program):
+        node._hits = node._misses = 0
+
+
+def report(program: ast.Program, stream: TextIO = None):
+    """ Print the sites of program, the ones missing most first """
+    stream = stream or sys.stdout
+    print(f"{'location':<24} {'site':<6} {'hits':>10} {'misses':>10} {'hit rate':>8}", file=stream)
+    for site in sorted(sites(program), key=lambda site: site.misses, reverse=True):
+        print(site, file=stream)
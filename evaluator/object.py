@@ -5,9 +5,13 @@ class ObjTypes:
     INTEGER = "Integer"
     BOOLEAN = "Boolean"
     NULL_OBJ = "Null"
+    ERROR = "Error"
+    FUNCTION = "Function"
 
 
 class Object:
+    __slots__ = ()
+
     def __str__(self):
         pass
 
@@ -17,6 +21,7 @@ class Object:
 
 @dataclass
 class Integer(Object):
+    __slots__ = ("value",)
     value: int
 
     def __str__(self):
@@ -28,6 +33,7 @@ class Integer(Object):
 
 @dataclass
 class Boolean(Object):
+    __slots__ = ("value",)
     value: bool
 
     def __str__(self):
@@ -38,8 +44,114 @@ class Boolean(Object):
 
 
 class Null(Object):
+    __slots__ = ()
+
     def type(self) -> str:
         return ObjTypes.NULL_OBJ
 
     def __str__(self):
         return "null"
+
+
+# Like CPython, integers in a small range are created once and shared. Treat
+# Integer objects as immutable, handing out cached ones relies on it.
+small_integers_low = -5
+small_integers_high = 256
+small_integers = []
+
+
+def configure_small_integers(low: int = -5, high: int = 256):
+    """ Cache integers from low to high, both inclusive """
+    global small_integers_low, small_integers_high, small_integers
+    small_integers = [Integer(value) for value in range(low, high + 1)]
+    small_integers_low, small_integers_high = low, high
+
+
+def make_integer(value: int) -> Integer:
+    if small_integers_low <= value <= small_integers_high:
+        return small_integers[value - small_integers_low]
+    return Integer(value)
+
+
+configure_small_integers()
+
+
+class Function(Object):
+    """
+    What a function literal evaluates to. code is whatever the engine runs
+    the body with (the literal itself for peval, compiled closures, bytecode)
+    and free holds the environment.Cell of every variable the function
+    closes over, in the order the resolver numbered them.
+    """
+    __slots__ = ("literal", "code", "free")
+
+    def __init__(self, literal, code, free=()):
+        self.literal = literal
+        self.code = code
+        self.free = free
+
+    def __str__(self):
+        parameters = ", ".join(str(parameter) for parameter in self.literal._parameters)
+        return f"fn({parameters}) {{ {self.literal._block} }}"
+
+    def type(self) -> str:
+        return ObjTypes.FUNCTION
+
+
+@dataclass
+class Error(Object):
+    """
+    Runtime errors are ordinary objects which the evaluator hands back up
+    instead of carrying on. offset is where in the source things went wrong,
+    location is filled in with file:line:col once the error reaches the top.
+    """
+    message: str
+    offset: int = -1
+    location: str = ""
+
+    def __str__(self):
+        if self.location:
+            return f"{self.location}: ERROR: {self.message}"
+        return f"ERROR: {self.message}"
+
+    def type(self) -> str:
+        return ObjTypes.ERROR
+
+
+class Returning(Error):
+    """
+    What a return statement evaluates to, the value returned waits in the
+    returned attribute of the Environment it ran in. Being an Error, it is
+    handed straight back up by everything which already does that with
+    errors, until it reaches the call (or the program) the return leaves,
+    which picks the value up. There is only the one instance, RETURNING, so
+    nothing is allocated for a return and plain statements pay nothing.
+    """
+
+
+RETURNING = Returning("return outside of a call")
+
+
+# resource -> message of the ResourceExhausted error for it, given the limit
+exhausted_messages = {
+    "steps": "step budget of {limit} exceeded",
+    "memory": "memory budget of {limit} bytes exceeded",
+    "depth": "call depth limit of {limit} exceeded",
+    "time": "timed out after {limit} seconds",
+}
+
+
+@dataclass
+class ResourceExhausted(Error):
+    """
+    A program stopped for going over one of its limits. resource is which
+    one ("steps", "memory", "depth" or "time"), used is how much of it the
+    program had used when it was stopped.
+    """
+    resource: str = ""
+    limit: float = 0
+    used: float = 0
+
+    @classmethod
+    def of(cls, resource: str, limit: float, used: float, offset: int = -1) -> "ResourceExhausted":
+        return cls(exhausted_messages[resource].format(limit=limit), offset, "", resource, limit, used)
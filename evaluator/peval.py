@@ -1,8 +1,11 @@
-from typing import List
+from functools import partial
+from typing import Callable, List
 
 from abstract import Node
 from lexer.monkey_lexer import TokenTypes
-from .object import Object, Integer, Boolean, Null
+from .object import Object, Integer, Boolean, Null, Error, Function, RETURNING, make_integer
+from .environment import Environment, FramePool
+from .resolver import LOCAL, GLOBAL, CELL, resolve
 from abstract import monkey_ast as ast
 
 singleton_mapper = {
@@ -12,13 +15,48 @@ singleton_mapper = {
 }
 
 
-def eval_statements(statements: List[ast.Statement]) -> Object:
+def eval_program(program: ast.Program, env: Environment = None) -> Object:
+    """
+    Run program in env, the globals. Without one the program gets fresh
+    globals, sized by the resolver.
+    """
+    scope = program._scope or resolve(program)
+    if env is None:
+        env = Environment(scope.size)
+    else:
+        env.ensure(scope.size)
+    return locate_error(returned(eval_statements(program._statements, env), env), program)
+
+
+def returned(result: Object, env: Environment) -> Object:
+    """ The value of a call (or program) which ran in env and gave back result """
+    if result is RETURNING:
+        result, env.returned = env.returned, None
+    return result
+
+
+def locate_error(result: Object, program: ast.Program) -> Object:
+    """ Fill in file:line:col on an error which made it out of program """
+    if isinstance(result, Error) and program._source_map is not None and not result.location \
+            and result.offset >= 0:
+        result.location = program._source_map.location(result.offset)
+    return result
+
+
+def eval_statements(statements: List[ast.Statement], env: Environment) -> Object:
+    result = singleton_mapper['NULL']
     for statement in statements:
-        result = eval(statement)
+        result = eval(statement, env)
+        if isinstance(result, Error):
+            return result
     return result
 
 
-def eval_bang_operator_expresssion(right):
+def native_bool_to_boolean(value: bool) -> Boolean:
+    return singleton_mapper['TRUE'] if value else singleton_mapper['FALSE']
+
+
+def eval_bang_operator_expresssion(right, offset=-1):
     if right is singleton_mapper['TRUE']:
         return singleton_mapper['FALSE']
     elif right is singleton_mapper['FALSE']:
@@ -29,56 +67,86 @@ def eval_bang_operator_expresssion(right):
         return singleton_mapper['FALSE']
 
 
-def eval_hyphen_operator_expression(right):
-    if not isinstance(right, Integer):
-        return None
-    return Integer(-right.value)
+def eval_hyphen_operator_expression(right, offset=-1):
+    return make_integer(-right.value)
 
 
-def eval_prefix_expression(_op, right) -> Object:
-    if _op == TokenTypes.BANG:
-        return eval_bang_operator_expresssion(right)
-    elif _op == TokenTypes.MINUS:
-        return eval_hyphen_operator_expression(right)
-    else:
-        return singleton_mapper['NULL']
+def eval_integer_division(left, right, offset=-1):
+    if right.value == 0:
+        return Error("division by zero", offset)
+    return make_integer(left.value // right.value)
+
+
+# (operator, operand class) -> function(right, offset)
+prefix_operations = {
+    (TokenTypes.MINUS, Integer): eval_hyphen_operator_expression,
+    (TokenTypes.BANG, Integer): eval_bang_operator_expresssion,
+    (TokenTypes.BANG, Boolean): eval_bang_operator_expresssion,
+    (TokenTypes.BANG, Null): eval_bang_operator_expresssion,
+}
+
+# (operator, left class, right class) -> function(left, right, offset)
+infix_operations = {
+    (TokenTypes.PLUS, Integer, Integer): lambda left, right, offset: make_integer(left.value + right.value),
+    (TokenTypes.MINUS, Integer, Integer): lambda left, right, offset: make_integer(left.value - right.value),
+    (TokenTypes.ASTERISK, Integer, Integer): lambda left, right, offset: make_integer(left.value * right.value),
+    (TokenTypes.SLASH, Integer, Integer): eval_integer_division,
+    (TokenTypes.LT, Integer, Integer): lambda left, right, offset: native_bool_to_boolean(left.value < right.value),
+    (TokenTypes.GT, Integer, Integer): lambda left, right, offset: native_bool_to_boolean(left.value > right.value),
+    (TokenTypes.EQ, Integer, Integer): lambda left, right, offset: native_bool_to_boolean(left.value == right.value),
+    (TokenTypes.NOT_EQ, Integer, Integer): lambda left, right, offset: native_bool_to_boolean(
+        left.value != right.value),
+}
 
 
-def eval_integer_infix_expression(_op, left, right) -> Object:
-    if _op == TokenTypes.PLUS:
-        return Integer(left.value + right.value)
+def eval_prefix_expression(_op, right, offset: int = -1) -> Object:
+    operation = prefix_operations.get((_op, right.__class__))
+    if operation is not None:
+        return operation(right, offset)
+    elif _op == TokenTypes.BANG:
+        return eval_bang_operator_expresssion(right, offset)
     elif _op == TokenTypes.MINUS:
-        return Integer(left.value - right.value)
-    elif _op == TokenTypes.ASTERISK:
-        return Integer(left.value * right.value)
-    elif _op == TokenTypes.SLASH:
-        return Integer(left.value // right.value)
-    elif _op == TokenTypes.LT:
-        mapper_key = "TRUE" if left.value < right.value else "FALSE"
-        return singleton_mapper[mapper_key]
-    elif _op == TokenTypes.GT:
-        mapper_key = "TRUE" if left.value > right.value else "FALSE"
-        return singleton_mapper[mapper_key]
+        return Error(f"unknown operator: -{right.type()}", offset)
+
+    return Error(f"unknown operator: {_op}{right.type()}", offset)
+
+
+def eval_infix_expression(_op, left, right, offset: int = -1) -> Object:
+    operation = infix_operations.get((_op, left.__class__, right.__class__))
+    if operation is not None:
+        return operation(left, right, offset)
     elif _op == TokenTypes.EQ:
-        mapper_key = "TRUE" if left.value == right.value else "FALSE"
-        return singleton_mapper[mapper_key]
+        return native_bool_to_boolean(left is right)
     elif _op == TokenTypes.NOT_EQ:
-        mapper_key = "TRUE" if left.value != right.value else "FALSE"
-        return singleton_mapper[mapper_key]
-    else:
-        return singleton_mapper['NULL']
+        return native_bool_to_boolean(left is not right)
+    elif left.type() != right.type():
+        return Error(f"type mismatch: {left.type()} {_op} {right.type()}", offset)
 
+    return Error(f"unknown operator: {left.type()} {_op} {right.type()}", offset)
 
-def eval_infix_expression(_op, left, right) -> Object:
-    if isinstance(left, Integer) and isinstance(right, Integer):
-        return eval_integer_infix_expression(_op, left, right)
-    elif isinstance(left, Boolean) and isinstance(right, Boolean):
-        if _op == TokenTypes.EQ:
-            return left is right
-        elif _op == TokenTypes.NOT_EQ:
-            return left is not right
 
-    return singleton_mapper['NULL']
+def infix_operation(_op, left_class: type, right_class: type) -> Callable[[Object, Object, int], Object]:
+    """ The function(left, right, offset) applying _op to operands of these classes """
+    operation = infix_operations.get((_op, left_class, right_class))
+    if operation is None:
+        operation = partial(eval_infix_expression, _op)
+    return operation
+
+
+def infix(node: ast.InfixExpression, left: Object, right: Object) -> Object:
+    """
+    eval_infix_expression for node. The operation found for the classes of
+    the operands is cached on node, and as long as the next operands are of
+    the same classes it is used straight away.
+    """
+    left_class, right_class = left.__class__, right.__class__
+    if left_class is node._cached_left and right_class is node._cached_right:
+        node._hits += 1
+        return node._cached_operation(left, right, node._offset)
+    node._misses += 1
+    operation = node._cached_operation = infix_operation(node._op, left_class, right_class)
+    node._cached_left, node._cached_right = left_class, right_class
+    return operation(left, right, node._offset)
 
 
 def is_truthy(condition: Object):
@@ -92,57 +160,203 @@ def is_truthy(condition: Object):
         return True
 
 
-def eval_if_expression(node: ast.IfExpression):
-    condition = eval(node._condition)
+def eval_if_expression(node: ast.IfExpression, env: Environment):
+    condition = eval(node._condition, env)
+    if isinstance(condition, Error):
+        return condition
 
     if is_truthy(condition):
-        return eval(node._consequence)
+        return eval(node._consequence, env)
     elif node._alternative:
-        return eval(node._alternative)
+        return eval(node._alternative, env)
     else:
         return singleton_mapper['NULL']
 
 
-def eval(node: Node) -> Object:
+def eval_integer_literal(node: ast.IntegerLiteral, env: Environment) -> Object:
+    return make_integer(node._value)
+
+
+def eval_boolean_literal(node: ast.BooleanLiteral, env: Environment) -> Object:
+    return native_bool_to_boolean(node._value)
+
+
+def eval_expression_statement(node: ast.ExpressionStatement, env: Environment) -> Object:
+    return eval(node._expression, env)
+
+
+def eval_block_statement(node: ast.BlockStatement, env: Environment) -> Object:
+    return eval_statements(node._statements, env)
+
+
+def eval_let_statement(node: ast.LetStatement, env: Environment) -> Object:
+    value = eval(node._value, env)
+    if isinstance(value, Error):
+        return value
+    name = node._name
+    if name._kind == LOCAL:
+        env.slots[name._slot] = value
+    elif name._kind == GLOBAL:
+        env.globals[name._slot] = value
+    else:
+        env.slots[name._slot].value = value
+    return singleton_mapper['NULL']
+
+
+def eval_return_statement(node: ast.ReturnStatement, env: Environment) -> Object:
+    if node._value is None:
+        value = singleton_mapper['NULL']
+    else:
+        value = eval(node._value, env)
+        if isinstance(value, Error):
+            return value
+    env.returned = value
+    return RETURNING
+
+
+def eval_identifier(node: ast.Identifier, env: Environment) -> Object:
+    kind = node._kind
+    if kind == LOCAL:
+        value = env.slots[node._slot]
+    elif kind == GLOBAL:
+        value = env.globals[node._slot]
+    elif kind == CELL:
+        value = env.slots[node._slot].value
+    else:
+        value = env.free[node._slot].value
+    if value is None:
+        return Error(f"identifier not found: {node._value}", node._offset)
+    return value
+
+
+def capture(node: ast.FunctionLiteral, env: Environment) -> tuple:
+    """ The cells a closure of node made in env takes with it """
+    return tuple(env.slots[slot] if kind == CELL else env.free[slot] for kind, slot in node._free)
+
+
+def eval_function_literal(node: ast.FunctionLiteral, env: Environment) -> Object:
+    return Function(node._unfolded or node, node, capture(node, env) if node._free else ())
+
+
+def check_call(function: Object, args: List[Object], offset: int) -> Error:
+    """ The error calling function with args would be, None if the call is fine """
+    if function.__class__ is not Function:
+        return Error(f"not a function: {function.type()}", offset)
+    expected = len(function.literal._parameters)
+    if len(args) != expected:
+        return Error(f"wrong number of arguments: want={expected}, got={len(args)}", offset)
+    return None
+
+
+def frame_pool(node: ast.FunctionLiteral) -> FramePool:
+    pool = node._frames
+    if pool is None:
+        pool = node._frames = FramePool(node._scope_size, node._cells)
+    return pool
+
+
+def call_frames(node: ast.CallExpression, function: Object, args: List[Object]):
+    """
+    The FramePool to call function in at node, or the Error calling it is.
+    The function literal called is cached on node with its pool, calling the
+    same one again skips the checks: they passed before, and how many
+    arguments a call site passes never changes.
+    """
+    literal = function.code if function.__class__ is Function else None
+    if literal is node._cached_callee and literal is not None:
+        node._hits += 1
+        return node._cached_frames
+    node._misses += 1
+    error = check_call(function, args, node._offset)
+    if error is not None:
+        return error
+    pool = node._cached_frames = frame_pool(literal)
+    node._cached_callee = literal
+    return pool
+
+
+def eval_call(node: ast.CallExpression, env: Environment) -> Object:
+    function = eval(node._ident_or_func_literal, env)
+    if isinstance(function, Error):
+        return function
+    args = []
+    for arg in node._args:
+        value = eval(arg, env)
+        if isinstance(value, Error):
+            return value
+        args.append(value)
+
+    pool = call_frames(node, function, args)
+    if isinstance(pool, Error):
+        return pool
+    frame = pool.acquire(args, function.free, env.globals)
+    result = returned(eval(function.code._block, frame), frame)
+    pool.release(frame)
+    return result
+
+
+def eval_prefix(node: ast.PrefixExpression, env: Environment) -> Object:
+    right = eval(node._right, env)
+    if isinstance(right, Error):
+        return right
+    return eval_prefix_expression(node._op, right, node._offset)
+
+
+def eval_infix(node: ast.InfixExpression, env: Environment) -> Object:
+    left = eval(node._left, env)
+    if isinstance(left, Error):
+        return left
+    right = eval(node._right, env)
+    if isinstance(right, Error):
+        return right
+    return infix(node, left, right)
+
+
+def eval_null(node: Node, env: Environment) -> Object:
+    return singleton_mapper['NULL']
+
+
+# node class -> function evaluating nodes of that class
+evaluators = {
+    ast.IntegerLiteral: eval_integer_literal,
+    ast.BooleanLiteral: eval_boolean_literal,
+    ast.Program: eval_program,
+    ast.ExpressionStatement: eval_expression_statement,
+    ast.PrefixExpression: eval_prefix,
+    ast.InfixExpression: eval_infix,
+    ast.BlockStatement: eval_block_statement,
+    ast.IfExpression: eval_if_expression,
+    ast.LetStatement: eval_let_statement,
+    ast.ReturnStatement: eval_return_statement,
+    ast.Identifier: eval_identifier,
+    ast.FunctionLiteral: eval_function_literal,
+    ast.CallExpression: eval_call,
+}
+
+# The profiler.Profiler or tracing.Tracer which wrapped the evaluators, if one is active. There is
+# never more than one: stopped in the wrong order, two would put each other's wrappers back.
+instrumented_by = None
+
+
+def eval(node: Node, env: Environment = None) -> Object:
     """
     Remember that every node defined in AST module fulfills the Node interface.
     and thus can be passed to eval.
     This allows us to call eval recursively while evaluating on part of ast.
 
     Each AST node needs different form of evaluation and eval is the place where we
-    decide which form of evaluation is needed
+    decide which form of evaluation is needed. That decision is a single lookup
+    of the node's class in the evaluators table, so it costs the same whatever
+    kind of node we are looking at.
 
     As an example, lets say when we pass ast.Program node to eval(), what eval should do is
     then evaluate each of the ast.Program.statements by calling itself with single statement.
     The return value of the outer call is the return value of the last call
+
+    env holds the variables in scope. Only a Program can be evaluated without
+    one, it then makes its own (see resolver.py for how variables are found).
     :param node:
+    :param env:
     :return:
     """
-    if isinstance(node, ast.IntegerLiteral):
-        return Integer(node._value)
-
-    if isinstance(node, ast.BooleanLiteral):
-        return singleton_mapper[node.token_literal().upper()]
-
-    if isinstance(node, ast.Program):
-        return eval_statements(node._statements)
-
-    if isinstance(node, ast.ExpressionStatement):
-        return eval(node._expression)
-
-    if isinstance(node, ast.PrefixExpression):
-        right = eval(node._right)
-        return eval_prefix_expression(node._op, right)
-
-    if isinstance(node, ast.InfixExpression):
-        left = eval(node._left)
-        right = eval(node._right)
-        return eval_infix_expression(node._op, left, right)
-
-    if isinstance(node, ast.BlockStatement):
-        return eval_statements(node._statements)
-
-    if isinstance(node, ast.IfExpression):
-        return eval_if_expression(node)
-
-    return singleton_mapper['NULL']
+    return evaluators.get(node.__class__, eval_null)(node, env)
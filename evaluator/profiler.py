@@ -0,0 +1,194 @@
+"""
+Where evaluation time goes, measured rather than sampled.
+
+    with Profiler() as profiler:
+        eval(program)
+    profiler.report()                       # flat tables
+    profiler.collapsed(open("out.folded", "w"))   # for flamegraph.pl, speedscope, ...
+
+While a Profiler is active, the entries of peval.evaluators are wrapped in
+functions timing every node evaluated, and once it is done the originals
+are put back. Nothing in peval knows about profiling, so when no Profiler
+is active it costs nothing at all. Only peval is profiled, the other
+engines do not evaluate node by node. A Profiler refuses to start while
+another one, or a tracing.Tracer, has the evaluators wrapped: stopped in
+the wrong order they would put each other's wrappers back.
+
+Every node evaluated counts towards the timing of its class, of its
+operator (infix and prefix expressions) and of its source line. Cumulative
+time includes the nodes evaluated below, self time does not, and a node
+class (or operator, or line) evaluated inside itself, as recursion does,
+adds its cumulative time once, for the outermost evaluation.
+
+The collapsed stacks are the Monkey functions being called, by the name
+they were bound to with let, then the class of the node taking the time:
+
+    <program>;fib;fib;InfixExpression 1234
+
+with its self time in microseconds.
+"""
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from abstract import monkey_ast as ast
+from abstract.monkey_ast import iter_children
+from . import peval
+
+ROOT = "<program>"
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    cumulative: int = 0     # nanoseconds, as are own and the rest
+    own: int = 0
+    active: int = 0         # evaluations in progress, recursion makes it more than one
+
+    def __str__(self):
+        return f"{self.count:>10} {self.cumulative / 1e6:>12.3f} {self.own / 1e6:>12.3f}"
+
+
+def function_names(program: ast.Program) -> Dict[ast.BlockStatement, str]:
+    """ The body of every function literal bound with let -> the name it is bound to """
+    names = {}
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.LetStatement) and isinstance(node._value, ast.FunctionLiteral):
+            names[node._value._block] = node._name._value
+        stack.extend(iter_children(node))
+    return names
+
+
+class Profiler:
+    def __init__(self):
+        self.by_class: Dict[str, Timing] = {}
+        self.by_operator: Dict[str, Timing] = {}
+        self.by_line: Dict[str, Timing] = {}
+        # "<program>;f;g", node class -> self time
+        self.stacks: Dict[Tuple[str, str], int] = {}
+        # node -> (its Timings, the frame it starts if it is the body of a function)
+        self.nodes: Dict[ast.Node, Tuple[Tuple[Timing, ...], Optional[str]]] = {}
+        self.originals = None
+
+    def add(self, program: ast.Program):
+        """ Look the nodes of program up in its source map, done by itself for the programs evaluated """
+        source_map = program._source_map
+        names = function_names(program)
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            line = None
+            if source_map is not None and node is not program:
+                line = f"{source_map.filename}:{source_map.position(node._offset)[0]}"
+            frame = names.get(node)
+            if frame is None and node is program:
+                frame = ROOT
+            elif isinstance(node, ast.FunctionLiteral) and node._block not in names:
+                names[node._block] = f"fn@{line}" if line else "fn"
+            self.describe(node, line, frame)
+            stack.extend(iter_children(node))
+
+    def describe(self, node, line: str = None, frame: str = None):
+        timings = [self.by_class.setdefault(node.__class__.__name__, Timing())]
+        if isinstance(node, (ast.InfixExpression, ast.PrefixExpression)):
+            timings.append(self.by_operator.setdefault(node._op, Timing()))
+        if line is not None:
+            timings.append(self.by_line.setdefault(line, Timing()))
+        info = self.nodes[node] = (tuple(timings), frame)
+        return info
+
+    def timed(self, evaluate, frames: List[str], children: List[int]):
+        """
+        evaluate, timed. frames (the functions being called) and children
+        (the time the children of the nodes being evaluated took so far) are
+        stacks shared by all the evaluators.
+        """
+        nodes, describe, stacks = self.nodes, self.describe, self.stacks
+        clock = time.perf_counter_ns
+
+        def timed(node, env):
+            info = nodes.get(node)
+            if info is None:
+                if node.__class__ is ast.Program:
+                    self.add(node)
+                    info = nodes[node]
+                else:
+                    info = describe(node)
+            timings, frame = info
+            for timing in timings:
+                timing.count += 1
+                timing.active += 1
+            if frame is not None:
+                frames.append(frame if frame is ROOT else f"{frames[-1]};{frame}")
+            children.append(0)
+            start = clock()
+            try:
+                return evaluate(node, env)
+            finally:
+                elapsed = clock() - start
+                own = elapsed - children.pop()
+                if children:
+                    children[-1] += elapsed
+                for timing in timings:
+                    timing.active -= 1
+                    timing.own += own
+                    if not timing.active:
+                        timing.cumulative += elapsed
+                key = (frames[-1], node.__class__.__name__)
+                stacks[key] = stacks.get(key, 0) + own
+                if frame is not None:
+                    frames.pop()
+        return timed
+
+    def start(self):
+        if self.originals is not None:
+            raise RuntimeError("the profiler is already running")
+        if peval.instrumented_by is not None:
+            raise RuntimeError(f"a {peval.instrumented_by.__class__.__name__} is already running")
+        peval.instrumented_by = self
+        self.originals = dict(peval.evaluators)
+        frames, children = [ROOT], []
+        for cls, evaluate in self.originals.items():
+            peval.evaluators[cls] = self.timed(evaluate, frames, children)
+
+    def stop(self):
+        if self.originals is not None:
+            peval.evaluators.update(self.originals)
+            self.originals = None
+            peval.instrumented_by = None
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def report(self, stream: TextIO = None, limit: int = 20):
+        """ Print the node classes, operators and lines taking the most self time """
+        stream = stream or sys.stdout
+        for title, timings in [("node", self.by_class), ("operator", self.by_operator), ("line", self.by_line)]:
+            if not timings:
+                continue
+            print(f"{title:<24} {'count':>10} {'cumul. ms':>12} {'self ms':>12}", file=stream)
+            ranked = sorted(timings.items(), key=lambda item: item[1].own, reverse=True)
+            for name, timing in ranked[:limit]:
+                print(f"{name:<24} {timing}", file=stream)
+            print(file=stream)
+
+    def collapsed(self, stream: TextIO = None):
+        """ Write the stacks in the collapsed format of flamegraph.pl, self time in microseconds """
+        stream = stream or sys.stdout
+        for (frames, name), own in sorted(self.stacks.items()):
+            if own >= 1000:
+                stream.write(f"{frames};{name} {own // 1000}\n")
+
+
+def profile(program: ast.Program, env=None) -> Tuple[object, Profiler]:
+    """ Evaluate program with peval, profiled: its result and the Profiler """
+    with Profiler() as profiler:
+        result = peval.eval(program, env)
+    return result, profiler
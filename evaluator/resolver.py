@@ -0,0 +1,173 @@
+"""
+Variable resolution.
+
+Looking a variable up by name means hashing the name in every enclosing
+scope until one of them has it, every time the variable is read. Which
+declaration a name refers to never changes while the program runs though,
+so resolve() works it out once, before the program runs, and writes it on
+the Identifier:
+
+    _kind    where the variable lives: LOCAL, GLOBAL, CELL or FREE
+    _slot    its index there (see environment.py)
+
+Programs and function bodies are scopes, blocks are not (a let inside an if
+is visible after it, as it always has been). Variables of the program are
+globals, variables of a function are locals. A function reading a local of
+an enclosing function captures it: the variable becomes a CELL in the
+function declaring it and a FREE variable of every function between there
+and the use, which is how each closure knows exactly which Cells to take
+with it when it is created.
+
+Names are declared in order, so `x; let x = 1;` still reads x before it is
+bound and gets "identifier not found" when run. A let of a function literal
+declares its name first, so the function can call itself. A function body
+declares every let in it before resolving anything, so a function nested
+in the body can call one declared further down the body; reading the name
+before its let has run finds the slot unbound, as at the top. A name which
+is not declared anywhere yet is given a global slot: it may be a function
+declared further down the program, and if it is not, the slot simply stays
+unbound.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+from abstract import monkey_ast as ast
+from abstract.monkey_ast import iter_children
+
+LOCAL, GLOBAL, CELL, FREE = 0, 1, 2, 3
+
+
+class Scope:
+    def __init__(self, outer: "Scope" = None):
+        self.outer = outer
+        self.slots: Dict[str, int] = {}
+        # name -> index of the free variable, and where in outer each one comes from
+        self.free: Dict[str, int] = {}
+        self.captures: List[Tuple[int, int]] = []
+        # slots which some inner function captured
+        self.cells: Set[int] = set()
+        # identifiers of this scope's own slots, LOCAL or CELL is only known at the end
+        self._locals: List[ast.Identifier] = []
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+    def define(self, name: str) -> int:
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.slots)
+        return slot
+
+    def lookup(self, name: str) -> Optional[Tuple[int, int]]:
+        """ (kind, slot) of the closest declaration of name, None if there isn't one """
+        slot = self.slots.get(name)
+        if slot is not None:
+            return (GLOBAL if self.outer is None else LOCAL), slot
+        index = self.free.get(name)
+        if index is not None:
+            return FREE, index
+        if self.outer is None:
+            return None
+
+        found = self.outer.lookup(name)
+        if found is None or found[0] == GLOBAL:
+            return found
+        kind, slot = found
+        if kind == LOCAL:
+            self.outer.cells.add(slot)
+            kind = CELL
+        index = self.free[name] = len(self.captures)
+        self.captures.append((kind, slot))
+        return FREE, index
+
+    def declare_global(self, name: str) -> Tuple[int, int]:
+        scope = self
+        while scope.outer is not None:
+            scope = scope.outer
+        return GLOBAL, scope.define(name)
+
+    def annotate(self, identifier: ast.Identifier, kind: int, slot: int):
+        identifier._kind, identifier._slot = kind, slot
+        if kind == LOCAL:
+            self._locals.append(identifier)
+
+    def close(self):
+        """ Every use has been seen, settle which locals are cells """
+        for identifier in self._locals:
+            if identifier._slot in self.cells:
+                identifier._kind = CELL
+        self._locals = []
+
+
+def bind(identifier: ast.Identifier, scope: Scope):
+    slot = scope.define(identifier._value)
+    scope.annotate(identifier, GLOBAL if scope.outer is None else LOCAL, slot)
+
+
+def resolve_children(node, scope: Scope):
+    for child in iter_children(node):
+        resolvers.get(child.__class__, resolve_children)(child, scope)
+
+
+def resolve_identifier(node: ast.Identifier, scope: Scope):
+    kind, slot = scope.lookup(node._value) or scope.declare_global(node._value)
+    scope.annotate(node, kind, slot)
+
+
+def resolve_let_statement(node: ast.LetStatement, scope: Scope):
+    if node._name is None:
+        return
+    if isinstance(node._value, ast.FunctionLiteral):
+        bind(node._name, scope)
+        resolve_function_literal(node._value, scope)
+    else:
+        if node._value is not None:
+            resolvers.get(node._value.__class__, resolve_children)(node._value, scope)
+        bind(node._name, scope)
+
+
+def declare_lets(block: ast.BlockStatement, scope: Scope):
+    """ Declare the names let binds anywhere in block, the bodies of the functions in it aside """
+    stack = [block]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.LetStatement) and node._name is not None:
+            scope.define(node._name._value)
+        # children pushed last to first, so names get their slots in source order
+        stack.extend(reversed([child for child in iter_children(node) if not isinstance(child, ast.FunctionLiteral)]))
+
+
+def resolve_function_literal(node: ast.FunctionLiteral, scope: Scope):
+    inner = Scope(scope)
+    for parameter in node._parameters or ():
+        if parameter is not None:
+            bind(parameter, inner)
+    if node._block is not None:
+        declare_lets(node._block, inner)
+        resolve_children(node._block, inner)
+    inner.close()
+
+    node._scope_size = inner.size
+    node._cells = tuple(sorted(inner.cells))
+    node._free = tuple(inner.captures)
+
+
+# node class -> function resolving nodes of that class
+resolvers = {
+    ast.Identifier: resolve_identifier,
+    ast.LetStatement: resolve_let_statement,
+    ast.FunctionLiteral: resolve_function_literal,
+}
+
+
+def resolve(program: ast.Program, scope: Scope = None) -> Scope:
+    """
+    Resolve every variable of program. Passing the Scope returned for an
+    earlier program resolves this one against the same globals, which is
+    what a repl wants.
+    """
+    if scope is None:
+        scope = Scope()
+    resolve_children(program, scope)
+    program._scope = scope
+    return scope
@@ -0,0 +1,407 @@
+"""
+Evaluation on an explicit stack.
+
+peval.eval recurses in Python for every node it evaluates, so every Monkey
+call costs a dozen or so Python frames and recursion runs into the
+interpreter's recursion limit a few dozen Monkey calls deep. Evaluation here
+is a loop over a list of work items instead:
+
+    todo     what is left to do, the last item is done next
+    values   the values of the expressions evaluated so far
+
+Evaluating an infix expression, for instance, pushes "apply the operator"
+and then the two operands, so by the time the operator comes off todo both
+operand values are on top of values. Nothing recurses in Python, however
+deep the Monkey program goes.
+
+A call pushes a RETURN item holding what the caller needs back (its
+Environment, where its values stop) and then the function body. When the
+call is the last thing a function does, RETURN is the item on top of todo
+at the moment of the call. The caller's frame is then recycled right away
+and the item is replaced instead of adding another one, so tail recursion
+runs in constant space. `return f(x)` counts as a tail call as well.
+
+Leaves (literals, identifiers, function literals) are evaluated by the very
+same functions peval uses, and so are the operators, so the two agree.
+
+Given Limits, an Evaluation is a sandbox: it stops the program with a
+ResourceExhausted error once it goes over a number of steps, of calls in
+progress, or of bytes of objects (Integers, Functions) it has made. Steps
+are counted in slices, by run(), and call depth by a counter the loop keeps
+anyway. Only the objects need anything more, the operators and function
+literals of a sandbox go through functions adding up what they make, so
+the accounting costs a few percent, and nothing at all without limits.
+Bytes are approximate and allocated ones, not live ones. The frames of the
+calls in progress are what a program holds on to, and depth bounds them.
+"""
+import sys
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from abstract import monkey_ast as ast
+from .environment import Environment
+from . import object as objects
+from .object import Object, Error, Integer, ResourceExhausted
+from .peval import singleton_mapper, evaluators, eval_null, eval_prefix_expression, infix, call_frames, \
+    locate_error
+from .resolver import LOCAL, GLOBAL, resolve
+
+NULL = singleton_mapper['NULL']
+TRUE = singleton_mapper['TRUE']
+FALSE = singleton_mapper['FALSE']
+
+# A work item is either a node, to be evaluated, or a (kind, argument) tuple
+PREFIX = 1              # PrefixExpression, operand value on values
+INFIX = 2               # InfixExpression, both operand values on values
+INFIX_LEAF = 3          # InfixExpression with a leaf right operand, left operand value on values
+BRANCH = 4              # IfExpression, condition value on values
+DISCARD = 5             # None, drop the value of a statement which is not the last
+BIND = 6                # LetStatement, value on values
+CALL = 7                # CallExpression, function and arguments on values
+RETURN = 8              # (caller Environment, FramePool, frame, height of values at the call)
+RETURN_STATEMENT = 9    # None, return value on values
+
+DISCARD_ITEM = (DISCARD, None)
+RETURN_STATEMENT_ITEM = (RETURN_STATEMENT, None)
+
+# nodes without child expressions, evaluated by peval straight away
+leaves = {cls: evaluators[cls] for cls in [ast.IntegerLiteral, ast.BooleanLiteral, ast.Identifier,
+                                           ast.FunctionLiteral]}
+
+# Called with every node taken off todo while it is set, which is how tracing.Tracer sees what is
+# evaluated. Read once a slice, so it costs nothing while it is None.
+observer: Optional[Callable[[ast.Node], None]] = None
+
+# Approximately what CPython takes for an Integer (plus a byte for every 8
+# bits of its value) and for a Function (plus a pointer for every cell)
+INTEGER_BYTES = 64
+FUNCTION_BYTES = 64
+# steps an Evaluation with Limits takes between checking its memory
+SLICE = 4096
+
+
+@dataclass
+class Limits:
+    """ What a program may use, None for no limit """
+    steps: Optional[int] = None
+    memory: Optional[int] = None    # approximate bytes of the objects it makes
+    depth: Optional[int] = None     # calls in progress
+
+
+class Evaluation:
+    """
+    One evaluation of a program. run() can be told to stop after a number of
+    steps (work items) and be called again to carry on from there, which is
+    what evaluating a bit at a time (async, budgets) is built on.
+    """
+
+    def __init__(self, program: ast.Program, env: Environment = None, limits: Limits = None):
+        scope = program._scope or resolve(program)
+        if env is None:
+            env = Environment(scope.size)
+        else:
+            env.ensure(scope.size)
+        self.program = program
+        self.env = env
+        self.todo = [program]
+        self.values: List[Object] = []
+        self.steps = 0
+        self.result: Object = None
+        self.depth = 0
+        self.limits = limits
+        self.allocated_bytes = lambda: 0
+        self.operate, self.prefix, self.leaves = infix, eval_prefix_expression, leaves
+        self.max_depth = sys.maxsize
+        if limits is not None:
+            if limits.depth is not None:
+                self.max_depth = limits.depth
+            if limits.memory is not None:
+                self.account_objects(limits.memory)
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def finish(self, result: Object):
+        self.result = locate_error(result, self.program)
+        self.todo.clear()
+        self.values.clear()
+
+    def run(self, steps: int = -1) -> bool:
+        """ Carry on for at most steps work items, or to the end. True once there is a result """
+        if self.result is None:
+            if self.limits is None:
+                # counting down from -1 never reaches 0, which is how "no limit" costs nothing extra
+                remaining = self.execute(steps)
+                self.steps += steps - remaining
+            else:
+                self.run_limited(steps)
+        return self.result is not None
+
+    def run_limited(self, steps: int):
+        limits = self.limits
+        while self.result is None and steps != 0:
+            chunk = SLICE if steps < 0 else min(SLICE, steps)
+            if limits.steps is not None:
+                if self.steps >= limits.steps:
+                    self.finish(ResourceExhausted.of("steps", limits.steps, self.steps))
+                    return
+                chunk = min(chunk, limits.steps - self.steps)
+            taken = chunk - self.execute(chunk)
+            self.steps += taken
+            if steps > 0:
+                steps -= taken
+            if limits.memory is not None and self.allocated > limits.memory and self.result is None:
+                self.finish(ResourceExhausted.of("memory", limits.memory, self.allocated))
+
+    def account_objects(self, memory: int):
+        """ Have the operators and function literals add up the bytes of what they make, up to memory """
+        small_low, small_high = objects.small_integers_low, objects.small_integers_high
+        allocated = 0
+
+        def operate(node, left, right):
+            nonlocal allocated
+            value = infix(node, left, right)
+            if value.__class__ is Integer and not small_low <= value.value <= small_high:
+                allocated += INTEGER_BYTES + value.value.bit_length() // 8
+                if allocated > memory:
+                    return ResourceExhausted.of("memory", memory, allocated, node._offset)
+            return value
+
+        def prefix(op, right, offset):
+            nonlocal allocated
+            value = eval_prefix_expression(op, right, offset)
+            if value.__class__ is Integer and not small_low <= value.value <= small_high:
+                allocated += INTEGER_BYTES + value.value.bit_length() // 8
+            return value
+
+        evaluate_function = leaves[ast.FunctionLiteral]
+
+        def function_literal(node, env):
+            nonlocal allocated
+            allocated += FUNCTION_BYTES + 8 * len(node._free)
+            return evaluate_function(node, env)
+
+        self.operate, self.prefix = operate, prefix
+        self.leaves = dict(leaves)
+        self.leaves[ast.FunctionLiteral] = function_literal
+        # the count lives in the closures, where adding to it is cheapest
+        self.allocated_bytes = lambda: allocated
+
+    @property
+    def allocated(self) -> int:
+        """ Approximate bytes of the objects made so far, counted only with a memory limit """
+        return self.allocated_bytes()
+
+    def execute(self, remaining: int) -> int:
+        todo, values, env = self.todo, self.values, self.env
+        push, pop, push_value, pop_value = todo.append, todo.pop, values.append, values.pop
+        leaves, operate, prefix = self.leaves, self.operate, self.prefix
+        depth, max_depth = self.depth, self.max_depth
+        if observer is not None:
+            pop = observed(pop, observer)
+
+        while todo:
+            if remaining == 0:
+                self.env = env
+                self.depth = depth
+                return remaining
+            remaining -= 1
+            item = pop()
+            cls = item.__class__
+
+            if cls is not tuple:
+                # a node to evaluate. Operands which are leaves are evaluated
+                # on the spot, it saves pushing and popping them.
+                if cls is ast.InfixExpression:
+                    left, right = item._left, item._right
+                    if right.__class__ in leaves:
+                        if left.__class__ in leaves:
+                            left = leaves[left.__class__](left, env)
+                            if isinstance(left, Error):
+                                self.finish(left)
+                                return remaining
+                            right = leaves[right.__class__](right, env)
+                            if isinstance(right, Error):
+                                self.finish(right)
+                                return remaining
+                            value = operate(item, left, right)
+                            if isinstance(value, Error):
+                                self.finish(value)
+                                return remaining
+                            push_value(value)
+                            continue
+                        push((INFIX_LEAF, item))
+                        push(left)
+                    else:
+                        push((INFIX, item))
+                        push(right)
+                        push(left)
+                elif cls is ast.ExpressionStatement:
+                    push(item._expression)
+                elif cls is ast.CallExpression:
+                    push((CALL, item))
+                    for arg in reversed(item._args):
+                        push(arg)
+                    push(item._ident_or_func_literal)
+                elif cls is ast.IfExpression:
+                    push((BRANCH, item))
+                    push(item._condition)
+                elif cls is ast.BlockStatement or cls is ast.Program:
+                    statements = item._statements
+                    if not statements:
+                        push_value(NULL)
+                        continue
+                    push(statements[-1])
+                    for statement in reversed(statements[:-1]):
+                        push(DISCARD_ITEM)
+                        push(statement)
+                elif cls is ast.PrefixExpression:
+                    push((PREFIX, item))
+                    push(item._right)
+                elif cls is ast.LetStatement:
+                    push((BIND, item))
+                    push(item._value)
+                elif cls is ast.ReturnStatement:
+                    push(RETURN_STATEMENT_ITEM)
+                    push(item._value)
+                else:
+                    value = leaves.get(cls, eval_null)(item, env)
+                    if isinstance(value, Error):
+                        self.finish(value)
+                        return remaining
+                    push_value(value)
+                continue
+
+            kind, item = item
+
+            if kind == INFIX:
+                right = pop_value()
+                value = operate(item, pop_value(), right)
+                if isinstance(value, Error):
+                    self.finish(value)
+                    return remaining
+                push_value(value)
+
+            elif kind == INFIX_LEAF:
+                right = item._right
+                right = leaves[right.__class__](right, env)
+                if isinstance(right, Error):
+                    self.finish(right)
+                    return remaining
+                value = operate(item, pop_value(), right)
+                if isinstance(value, Error):
+                    self.finish(value)
+                    return remaining
+                push_value(value)
+
+            elif kind == DISCARD:
+                pop_value()
+
+            elif kind == BRANCH:
+                condition = pop_value()
+                if condition is not FALSE and condition is not NULL:
+                    push(item._consequence)
+                elif item._alternative:
+                    push(item._alternative)
+                else:
+                    push_value(NULL)
+
+            elif kind == CALL:
+                count = len(item._args)
+                args = values[len(values) - count:]
+                del values[len(values) - count:]
+                function = pop_value()
+                pool = call_frames(item, function, args)
+                if isinstance(pool, Error):
+                    self.finish(pool)
+                    return remaining
+
+                literal = function.code
+                frame = pool.acquire(args, function.free, env.globals)
+                if todo and todo[-1] is RETURN_STATEMENT_ITEM:
+                    self.unwind(keep_value=False)
+                top = todo[-1] if todo else None
+                if top.__class__ is tuple and top[0] == RETURN:
+                    # a tail call, the frame of the function we are in is not needed any more
+                    caller, old_pool, old_frame, height = top[1]
+                    old_pool.release(old_frame)
+                    todo[-1] = (RETURN, (caller, pool, frame, height))
+                else:
+                    depth += 1
+                    if depth > max_depth:
+                        self.finish(ResourceExhausted.of("depth", max_depth, depth, item._offset))
+                        return remaining
+                    push((RETURN, (env, pool, frame, len(values))))
+                env = frame
+                push(literal._block)
+
+            elif kind == RETURN:
+                caller, pool, frame, height = item
+                pool.release(frame)
+                env = caller
+                depth -= 1
+
+            elif kind == BIND:
+                value = pop_value()
+                name = item._name
+                if name._kind == LOCAL:
+                    env.slots[name._slot] = value
+                elif name._kind == GLOBAL:
+                    env.globals[name._slot] = value
+                else:
+                    env.slots[name._slot].value = value
+                push_value(NULL)
+
+            elif kind == PREFIX:
+                value = prefix(item._op, pop_value(), item._offset)
+                if isinstance(value, Error):
+                    self.finish(value)
+                    return remaining
+                push_value(value)
+
+            elif kind == RETURN_STATEMENT:
+                if not self.unwind(keep_value=True):
+                    # returning from the program itself
+                    self.finish(pop_value())
+                    return remaining
+
+        self.finish(pop_value() if values else NULL)
+        return remaining
+
+    def unwind(self, keep_value: bool) -> bool:
+        """
+        Drop what is left to do in the function a return statement is in,
+        leaving its RETURN item on top of todo and the caller's values on top
+        of values (plus the return value, with keep_value). Nothing changes
+        for a return outside any function, which is what False means.
+        """
+        todo, values = self.todo, self.values
+        index = len(todo) - 1
+        while index >= 0 and (todo[index].__class__ is not tuple or todo[index][0] != RETURN):
+            index -= 1
+        if index < 0:
+            return False
+        del todo[index + 1:]
+        value = values[-1] if keep_value else None
+        del values[todo[index][1][3]:]
+        if keep_value:
+            values.append(value)
+        return True
+
+
+def observed(pop, observer):
+    """ pop, telling observer about the nodes it takes """
+    def observed_pop():
+        item = pop()
+        if item.__class__ is not tuple:
+            observer(item)
+        return item
+    return observed_pop
+
+
+def eval(node: ast.Program, env: Environment = None, limits: Limits = None) -> Object:
+    """ Same as peval.eval(node, env), without recursing in Python, and within limits if there are any """
+    evaluation = Evaluation(node, env, limits)
+    evaluation.run()
+    return evaluation.result
@@ -0,0 +1,11 @@
+from .monkey_lexer import Lexer
+from .scanner import ScannerLexer
+
+engines = {
+    "classic": Lexer,
+    "scanner": ScannerLexer,
+}
+
+
+def new_lexer(input: str, engine: str = "classic"):
+    return engines[engine](input)
@@ -29,18 +29,37 @@ Note:
 
     "error: expected semicolon token. line 42, column 23, program.monkey"
 """
-from pydantic import BaseModel
-from pydantic.dataclasses import dataclass
+import sys
+
+from .source_map import SourceMap
 
 
 class TokenType(str):
     pass
 
 
-@dataclass(frozen=True)
 class Token:
-    type: TokenType
-    literal: str
+    """
+    Lexers hand out a lot of tokens, so this is kept as small as possible:
+    two slots, no validation. Tokens are treated as immutable values which
+    is what allows the fixed ones below to be shared.
+    """
+    __slots__ = ("type", "literal")
+
+    def __init__(self, type: TokenType, literal: str):
+        self.type = type
+        self.literal = literal
+
+    def __eq__(self, other):
+        if not isinstance(other, Token):
+            return NotImplemented
+        return self.type == other.type and self.literal == other.literal
+
+    def __hash__(self):
+        return hash((self.type, self.literal))
+
+    def __repr__(self):
+        return f"Token(type={self.type!r}, literal={self.literal!r})"
 
 
 class TokenTypes:
@@ -82,6 +101,13 @@ class TokenTypes:
     RETURN = "RETURN"
 
 
+# Interned so that comparing token types is mostly an identity check
+for _name, _value in list(vars(TokenTypes).items()):
+    if not _name.startswith("_"):
+        setattr(TokenTypes, _name, sys.intern(_value))
+
+EOF = Token(TokenTypes.EOF, "")
+
 keywords = {
     "let": Token(TokenTypes.LET, "let"),
     "fn": Token(TokenTypes.FUNCTION, "fn"),
@@ -92,56 +118,54 @@ keywords = {
     "return": Token(TokenTypes.RETURN, "return"),
 }
 
+# Operators and delimiters always have the same literal, so there is only
+# ever one token for each of them
+symbols = {
+    literal: Token(literal, literal)
+    for literal in [TokenTypes.EQ, TokenTypes.NOT_EQ, TokenTypes.ASSIGN, TokenTypes.PLUS,
+                    TokenTypes.MINUS, TokenTypes.BANG, TokenTypes.ASTERISK, TokenTypes.SLASH,
+                    TokenTypes.LT, TokenTypes.GT, TokenTypes.LPAREN, TokenTypes.RPAREN,
+                    TokenTypes.LBRACE, TokenTypes.RBRACE, TokenTypes.COMMA, TokenTypes.SEMICOLON]
+}
+
 
 class Lexer:
-    def __init__(self, input: str):
+    def __init__(self, input: str, filename: str = "<input>"):
         self._input = input
         self.position = -1
         self.read_position = self.position + 1
         self.chr = None
+        self.source_map = SourceMap(input, filename)
+        # offset of the first character of the token returned last
+        self.token_offset = 0
+
+    def seek(self, offset: int):
+        """ Carry on lexing from offset, which has to be where a token or whitespace starts """
+        self.position = offset - 1
+        self.read_position = offset
+        self.chr = None
 
     def next_token(self) -> Token:
         self.skipNone()
         self.skip_whitespace()
-        tok: TokenType = None
+        self.token_offset = self.position
+        tok: Token = None
         if self.chr == '=':
             if self.peek_chr() == '=':
                 self.read_chr()
-                tok = Token(TokenTypes.EQ, "==")
+                tok = symbols["=="]
             else:
-                tok = Token(TokenTypes.ASSIGN, self.chr)
-        elif self.chr == '+':
-            tok = Token(TokenTypes.PLUS, self.chr)
-        elif self.chr == '-':
-            tok = Token(TokenTypes.MINUS, self.chr)
-        elif self.chr == '(':
-            tok = Token(TokenTypes.LPAREN, self.chr)
-        elif self.chr == ')':
-            tok = Token(TokenTypes.RPAREN, self.chr)
-        elif self.chr == '{':
-            tok = Token(TokenTypes.LBRACE, self.chr)
-        elif self.chr == '}':
-            tok = Token(TokenTypes.RBRACE, self.chr)
-        elif self.chr == ',':
-            tok = Token(TokenTypes.COMMA, self.chr)
-        elif self.chr == ';':
-            tok = Token(TokenTypes.SEMICOLON, self.chr)
+                tok = symbols["="]
         elif self.chr == '!':
             if self.peek_chr() == '=':
                 self.read_chr()
-                tok = Token(TokenTypes.NOT_EQ, "!=")
+                tok = symbols["!="]
             else:
-                tok = Token(TokenTypes.BANG, self.chr)
-        elif self.chr == '*':
-            tok = Token(TokenTypes.ASTERISK, self.chr)
-        elif self.chr == '/':
-            tok = Token(TokenTypes.SLASH, self.chr)
-        elif self.chr == '<':
-            tok = Token(TokenTypes.LT, self.chr)
-        elif self.chr == '>':
-            tok = Token(TokenTypes.GT, self.chr)
-        elif self.chr == 0:
-            tok = Token(TokenTypes.EOF, "")
+                tok = symbols["!"]
+        elif self.chr in symbols:
+            tok = symbols[self.chr]
+        elif self.chr == "":
+            tok = EOF
         else:
             if self.is_letter(self.chr):
                 identifier = self.read_identifier()
@@ -153,7 +177,7 @@ class Lexer:
                 number = self.read_num()
                 return Token(TokenTypes.INT, number)
             else:
-                return Token(TokenTypes.ILLEGAL, self.chr)
+                tok = Token(TokenTypes.ILLEGAL, self.chr)
         self.read_chr()
         return tok
 
@@ -161,7 +185,7 @@ class Lexer:
         if self.read_position < len(self._input) != 0:
             self.chr = self._input[self.read_position]
         else:
-            self.chr = 0
+            self.chr = ""
         self.position = self.read_position
         self.read_position += 1
 
@@ -169,7 +193,7 @@ class Lexer:
         if self.read_position < len(self._input) != 0:
             chr = self._input[self.read_position]
         else:
-            chr = 0
+            chr = ""
         return chr
 
     def read_identifier(self) -> str:
@@ -207,11 +231,16 @@ class Lexer:
         if self.chr is None:
             self.read_chr()
 
+    def tokenize_all(self):
+        """ Lex the whole input into a columnar token_buffer.TokenBuffer """
+        from .token_buffer import tokenize_all
+        return tokenize_all(self._input, self.source_map.filename)
+
     def __iter__(self):
          return self
 
     def __next__(self):
         tok = self.next_token()
-        if tok == Token(TokenTypes.EOF, ""):
+        if tok.type == TokenTypes.EOF:
             raise StopIteration
         return tok
@@ -0,0 +1,76 @@
+"""
+A second lexing engine for Monkey.
+
+monkey_lexer.Lexer walks the input one character at a time. That is easy to
+follow but every character costs a couple of method calls and a bounds check.
+
+ScannerLexer produces exactly the same tokens, but hands the character level
+work to one compiled "master" regular expression. Each match eats the leading
+whitespace and a complete token, and `lastindex` tells us which alternative of
+the pattern matched:
+
+    [ \\t\\n\\r]* (?: (letters) | (digits) | (operator) | (any other non blank) )
+
+so the Python side only runs once per token instead of once per character.
+"""
+import re
+import sys
+from functools import lru_cache
+
+from .monkey_lexer import EOF, Token, TokenTypes, keywords, symbols
+from .source_map import SourceMap
+
+IDENT, INT, SYMBOL, ILLEGAL = 1, 2, 3, 4
+
+_PATTERN = r"[ \t\n\r]*(?:([A-Za-z_]+)|([{digits}]+)|(==|!=|[-+=!*/<>(){{}},;])|([^ \t\n\r]))"
+
+
+@lru_cache(maxsize=None)
+def master_pattern(ascii_only: bool = True):
+    """
+    Lexer.is_number uses str.isdigit, which is also true for things like
+    superscripts. Building that character class means scanning the whole of
+    unicode, so we only pay for it the first time we see non ascii input.
+    """
+    if ascii_only:
+        digits = "0-9"
+    else:
+        digits = re.escape("".join(c for c in map(chr, range(sys.maxunicode + 1)) if c.isdigit()))
+    return re.compile(_PATTERN.format(digits=digits))
+
+
+class ScannerLexer:
+    def __init__(self, input: str, filename: str = "<input>"):
+        self._input = input
+        self._tokens = self.scan()
+        self.source_map = SourceMap(input, filename)
+        # offset of the first character of the token returned last
+        self.token_offset = 0
+
+    def scan(self):
+        """ Generate every token of the input, EOF excluded. """
+        text = self._input
+        for match in master_pattern(text.isascii()).finditer(text):
+            kind = match.lastindex
+            lexeme = match.group(kind)
+            self.token_offset = match.start(kind)
+            if kind == SYMBOL:
+                yield symbols[lexeme]
+            elif kind == IDENT:
+                yield keywords.get(lexeme) or Token(TokenTypes.IDENT, lexeme)
+            elif kind == INT:
+                yield Token(TokenTypes.INT, lexeme)
+            else:
+                yield Token(TokenTypes.ILLEGAL, lexeme)
+        self.token_offset = len(text)
+
+    def next_token(self) -> Token:
+        return next(self._tokens, EOF)
+
+    def tokenize_all(self):
+        """ Lex the whole input into a columnar token_buffer.TokenBuffer """
+        from .token_buffer import tokenize_all
+        return tokenize_all(self._input, self.source_map.filename)
+
+    def __iter__(self):
+        return self._tokens
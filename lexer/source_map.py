@@ -0,0 +1,37 @@
+"""
+Tokens and AST nodes only remember the offset of their first character in the
+source. Turning that into a line and column needs to know where every line
+starts, which is only worked out the first time somebody asks, so programs
+that never report an error never pay for it.
+"""
+from bisect import bisect_right
+from typing import List, Tuple
+
+
+class SourceMap:
+    def __init__(self, text: str, filename: str = "<input>"):
+        self.text = text
+        self.filename = filename
+        self._line_starts: List[int] = None
+
+    @property
+    def line_starts(self) -> List[int]:
+        if self._line_starts is None:
+            starts = [0]
+            find = self.text.find
+            index = find("\n")
+            while index != -1:
+                starts.append(index + 1)
+                index = find("\n", index + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """ 1 based (line, column) of an offset """
+        offset = max(0, min(offset, len(self.text)))
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def location(self, offset: int) -> str:
+        line, column = self.position(offset)
+        return f"{self.filename}:{line}:{column}"
@@ -0,0 +1,121 @@
+"""
+Columnar token stream.
+
+A list of Token objects costs far more memory than the source it came from.
+When a whole program is lexed up front we keep three parallel arrays instead:
+
+    types   one small integer code per token (see token_types)
+    starts  offset of the first character of the token in the source
+    ends    offset one past the last character of the token
+
+The literal of a token is never stored, it is sliced out of the source the
+moment somebody asks for it. The last row is always the EOF token.
+"""
+from array import array
+
+from .monkey_lexer import EOF, Token, TokenTypes, keywords, symbols
+from .scanner import IDENT, INT, SYMBOL, master_pattern
+from .source_map import SourceMap
+
+token_types = [TokenTypes.EOF, TokenTypes.ILLEGAL, TokenTypes.IDENT, TokenTypes.INT] + \
+              [token.type for token in keywords.values()] + \
+              [token.type for token in symbols.values()]
+
+type_codes = {type: code for code, type in enumerate(token_types)}
+
+# Tokens which always look the same are not materialized more than once
+fixed_tokens = [None] * len(token_types)
+fixed_tokens[type_codes[TokenTypes.EOF]] = EOF
+for _token in list(keywords.values()) + list(symbols.values()):
+    fixed_tokens[type_codes[_token.type]] = _token
+
+_EOF_CODE = type_codes[TokenTypes.EOF]
+_ILLEGAL_CODE = type_codes[TokenTypes.ILLEGAL]
+_IDENT_CODE = type_codes[TokenTypes.IDENT]
+_INT_CODE = type_codes[TokenTypes.INT]
+_keyword_codes = {literal: type_codes[token.type] for literal, token in keywords.items()}
+_symbol_codes = {literal: type_codes[token.type] for literal, token in symbols.items()}
+
+
+class TokenBuffer:
+    def __init__(self, source: str, filename: str = "<input>"):
+        self.source = source
+        self.source_map = SourceMap(source, filename)
+        self.types = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        return (self.token(index) for index in range(len(self.types)))
+
+    def type(self, index: int) -> str:
+        return token_types[self.types[index]]
+
+    def literal(self, index: int) -> str:
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def token(self, index: int) -> Token:
+        code = self.types[index]
+        token = fixed_tokens[code]
+        if token is None:
+            token = Token(token_types[code], self.source[self.starts[index]:self.ends[index]])
+        return token
+
+    def cursor(self):
+        """ A BufferCursor positioned before the first token """
+        return BufferCursor(self)
+
+
+class BufferCursor:
+    """
+    Hands out the tokens of a TokenBuffer one at a time, the same way a lexer
+    does, and keeps returning EOF once the buffer is exhausted. This is what
+    the parser reads from in place of a lexer.
+    """
+
+    def __init__(self, buffer: TokenBuffer):
+        self._buffer = buffer
+        self._index = -1
+        self._last = len(buffer.types) - 1
+        self.source_map = buffer.source_map
+        self.token_offset = 0
+
+    def next_token(self) -> Token:
+        index = self._index
+        if index < self._last:
+            index = self._index = index + 1
+        buffer = self._buffer
+        code = buffer.types[index]
+        self.token_offset = buffer.starts[index]
+        token = fixed_tokens[code]
+        if token is None:
+            token = Token(token_types[code], buffer.source[self.token_offset:buffer.ends[index]])
+        return token
+
+
+def tokenize_all(source: str, filename: str = "<input>") -> TokenBuffer:
+    buffer = TokenBuffer(source, filename)
+    add_type, add_start, add_end = buffer.types.append, buffer.starts.append, buffer.ends.append
+
+    for match in master_pattern(source.isascii()).finditer(source):
+        kind = match.lastindex
+        start, end = match.span(kind)
+        if kind == SYMBOL:
+            code = _symbol_codes[match.group(kind)]
+        elif kind == IDENT:
+            code = _keyword_codes.get(match.group(kind), _IDENT_CODE)
+        elif kind == INT:
+            code = _INT_CODE
+        else:
+            code = _ILLEGAL_CODE
+        add_type(code)
+        add_start(start)
+        add_end(end)
+
+    add_type(_EOF_CODE)
+    add_start(len(source))
+    add_end(len(source))
+    return buffer
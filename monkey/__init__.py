@@ -0,0 +1,5 @@
+"""
+Running Monkey programs, as opposed to the pieces (lexer, parser, the
+engines) they are run with.
+"""
+from .interpreter import Interpreter, Session, Prepared, ParseError, Limits
@@ -0,0 +1,102 @@
+"""
+    python -m monkey run SCRIPT [--engine ENGINE]
+    python -m monkey run-many [SCRIPT ...] [--workers N] [--chunksize N] [--engine ENGINE]
+    python -m monkey profile SCRIPT [--collapsed FILE]
+
+run prints the value of one script. run-many prints the value of every
+script, one line each and in the order they were given, running them in a
+pool of worker processes. Without scripts (or with -) it reads programs
+from standard input instead, one program per line. profile runs a script
+with the tree-walking evaluator and prints where the time went (see
+evaluator.profiler), --collapsed writes the stacks for a flame graph too.
+That is always the eval engine, the one evaluating node by node, and not
+the engine run defaults to, which the report says.
+
+The exit status is 1 if any program did not parse or ended in an error.
+"""
+import argparse
+import sys
+
+from evaluator.folding import fold_constants
+from evaluator.object import Error
+from evaluator.profiler import profile
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+from .cache import ProgramCache, default_directory
+from .runner import DEFAULT_ENGINE, Runner, engines, run_many
+
+
+def run_profiled(path: str, collapsed: str = None) -> int:
+    try:
+        with open(path, encoding="utf-8") as file:
+            source = file.read()
+    except OSError as error:
+        print(f"{path}: {error.strerror}")
+        return 1
+    parser = Parser.new(Lexer(source, filename=path))
+    program = parser.parse()
+    if parser.errors:
+        print("; ".join(parser.errors))
+        return 1
+
+    try:
+        result, profiler = profile(fold_constants(program))
+    except RecursionError:
+        # as in Runner.run_program, eval recurses in Python for every Monkey call
+        print(Error("maximum recursion depth exceeded"))
+        return 1
+    print(result)
+    print()
+    print(f"profiled with the eval engine, run uses {DEFAULT_ENGINE} unless told otherwise")
+    print()
+    profiler.report()
+    if collapsed:
+        with open(collapsed, "w", encoding="utf-8") as file:
+            profiler.collapsed(file)
+    return 1 if isinstance(result, Error) else 0
+
+
+def main(argv=None) -> int:
+    args = argparse.ArgumentParser(prog="python -m monkey", description="Run Monkey programs")
+    commands = args.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a script")
+    run.add_argument("script")
+
+    many = commands.add_parser("run-many", help="run many scripts, or programs read from stdin, in parallel")
+    many.add_argument("scripts", nargs="*", help="the scripts, - or none for one program per line of stdin")
+    many.add_argument("--workers", type=int, default=None, help="worker processes, the number of CPUs by default")
+    many.add_argument("--chunksize", type=int, default=16, help="programs handed to a worker at a time")
+
+    profiler = commands.add_parser("profile", help="run a script with the tree-walking evaluator, profiled")
+    profiler.add_argument("script")
+    profiler.add_argument("--collapsed", metavar="FILE", help="write the collapsed stacks of a flame graph to FILE")
+
+    for command in (run, many):
+        command.add_argument("--engine", choices=engines, default=DEFAULT_ENGINE,
+                             help=f"the engine to run with, {DEFAULT_ENGINE} by default: eval and closures recurse in "
+                                  f"Python, eval running out of stack some 60 Monkey calls deep")
+        command.add_argument("--no-cache", action="store_true", help="parse every script, skipping the cache")
+    args = args.parse_args(argv)
+    if args.command == "profile":
+        return run_profiled(args.script, args.collapsed)
+    cache_directory = None if args.no_cache else default_directory()
+
+    if args.command == "run":
+        result = Runner(args.engine, ProgramCache(cache_directory) if cache_directory else None).run_file(args.script)
+        print(result.output)
+        return 0 if result.ok else 1
+
+    if not args.scripts or args.scripts == ["-"]:
+        inputs, files = (line.rstrip("\n") for line in sys.stdin), False
+    else:
+        inputs, files = args.scripts, True
+    failed = False
+    for result in run_many(inputs, files, args.engine, args.workers, args.chunksize, cache_directory):
+        print(result.output)
+        failed = failed or not result.ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+On disk cache of parsed programs, like __pycache__ is for Python.
+
+Lexing and parsing a script which has not changed since the last run gives
+the very same Program, so the Program is kept in a file named after a hash
+of the source and of the interpreter (see abstract.serialize for the
+format) and read back from there next time, which is a good deal quicker.
+
+    cache = ProgramCache()
+    program, errors = cache.load("script.mk")
+
+An entry is found by its source, so editing a script simply makes it miss.
+The interpreter is part of the hash through the code of the lexer, the
+parser and the AST, so changing how programs are parsed misses as well. A
+file which cannot be read back is removed and counts as a miss. Programs
+with parse errors are not cached, they have to be reported anyway.
+
+The cache lives in $MONKEY_CACHE_DIR, ~/.cache/monkey by default. Every
+hit touches its entry, and once the entries take more than max_bytes the
+ones used longest ago are removed. The directory is only listed to find
+those: a ProgramCache keeps a running total of the bytes in it, counted
+once when it first writes an entry and added to by every entry it writes,
+so filling the cache with N programs does not list it N times. Other
+processes writing to the directory make the total fall behind, until it
+next goes over max_bytes and the listing puts it right.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+from typing import List, Optional, Tuple
+
+import abstract.monkey_ast
+import abstract.serialize
+import lexer.monkey_lexer
+import parser.parser
+from abstract.monkey_ast import Program
+from abstract.serialize import SerializeError, dumps, loads
+from lexer.monkey_lexer import Lexer
+from lexer.source_map import SourceMap
+from parser import Parser
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+SUFFIX = ".mkc"
+
+_version = None
+
+
+def interpreter_version() -> bytes:
+    """ Hash of everything which decides what a source parses to, and of the Python reading the entries """
+    global _version
+    if _version is None:
+        digest = hashlib.sha256(sys.implementation.cache_tag.encode())
+        for module in [lexer.monkey_lexer, parser.parser, abstract.monkey_ast, abstract.serialize]:
+            with open(module.__file__, "rb") as file:
+                digest.update(file.read())
+        _version = digest.digest()
+    return _version
+
+
+def default_directory() -> str:
+    return os.environ.get("MONKEY_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "monkey")
+
+
+class ProgramCache:
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # bytes taken by the entries, None until the first put counts them
+        self.total: Optional[int] = None
+
+    def key(self, source: str) -> str:
+        return hashlib.sha256(interpreter_version() + source.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, source: str, filename: str = "<input>") -> Optional[Program]:
+        """ The cached Program of source, None if there is none """
+        path = self.path(self.key(source))
+        try:
+            with open(path, "rb") as file:
+                program = loads(file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, SerializeError):
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        program._source_map = SourceMap(source, filename)
+        return program
+
+    def put(self, source: str, program: Program):
+        """ Cache program as what source parses to. A cache which cannot be written to is no cache """
+        temporary = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # written next to the entry and renamed, so nobody ever reads half an entry
+            if self.total is None:
+                self.total = self.size()
+            data = dumps(program)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary, self.path(self.key(source)))
+        except OSError:
+            if temporary is not None:
+                self.remove(temporary)
+            return
+        self.total += len(data)
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def parse(self, source: str, filename: str = "<input>") -> Tuple[Program, List[str]]:
+        """ The Program source parses to and the parse errors, from the cache if it is there """
+        program = self.get(source, filename)
+        if program is not None:
+            self.hits += 1
+            return program, []
+        self.misses += 1
+        parser = Parser.new(Lexer(source, filename=filename))
+        program = parser.parse()
+        if not parser.errors:
+            self.put(source, program)
+        return program, parser.errors
+
+    def load(self, path: str) -> Tuple[Program, List[str]]:
+        """ parse() the script in the file at path """
+        with open(path, encoding="utf-8") as file:
+            return self.parse(file.read(), filename=path)
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """ (last used, size, path) of every entry, least recently used first """
+        found = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        found.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        found.sort()
+        return found
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """ Remove the least recently used entries until the rest fit in max_bytes """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+        self.total = total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.remove(path)
+        self.total = 0
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,266 @@
+"""
+Embedding Monkey.
+
+    interpreter = Interpreter(engine="vm")
+    session = interpreter.session()
+    session.exec("let double = fn(x) { x * 2 };")
+    session.exec("double(21)")              # Integer(42)
+
+    area = session.prepare("width * height")
+    session.run(area, width=3, height=4)    # Integer(12)
+    session.load("library.mk")              # a script's globals become the session's
+
+An Interpreter parses with one Parser per thread, set up once and reset
+for every program, and runs programs with one engine, evaluator.stack_eval
+unless told otherwise: it keeps Monkey calls off the Python stack, which,
+at the default recursion limit, eval runs out of some 60 nested calls
+deep and closures a few hundred. A Session is a set
+of global variables which live from one exec() to the next, like the ones
+of the repl. prepare() resolves, folds and compiles a program once, so
+running it again, with other values for its inputs, is only running it.
+
+Programs which do not parse raise ParseError. Runtime errors are what they
+always are, evaluator.object.Error values handed back as the result, and
+so is running out of stack in the engines which recurse in Python, or an
+exception out of an engine, which would be a bug in it.
+
+Nothing here is locked. Threads can share an Interpreter as far as
+parsing goes, it keeps a Parser for each of them, and exec() is fine from
+several threads since every call prepares a program of its own. A
+Prepared program, and so a Session, is not meant to be run by two threads
+at once: running it takes frames from the FramePools of its function
+literals and fills the inline caches of its nodes.
+
+In an asyncio program, run() evaluates a bit at a time, handing the event
+loop back every steps_per_yield steps, so a slow or endless program does
+not stall everything else. It stops programs going over a timeout or a
+budget of steps, or the Limits of a sandbox, with a
+ResourceExhausted error, and cancelling the task awaiting it stops it too:
+
+    result = await interpreter.run(source, timeout=0.5, limits=Limits(steps=10 ** 6, memory=2 ** 20))
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, List, Tuple, Union
+
+from abstract.monkey_ast import Program
+from compiler import compile
+from evaluator import peval, stack_eval
+from evaluator.closures import compile as compile_closures
+from evaluator.environment import Environment
+from evaluator.folding import fold_constants
+from evaluator.object import Object, Error, ResourceExhausted, make_integer
+from evaluator.resolver import Scope, resolve
+from evaluator.stack_eval import Limits
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+from vm import VM
+from .cache import ProgramCache
+from .runner import DEFAULT_ENGINE
+
+TRUE = peval.singleton_mapper['TRUE']
+FALSE = peval.singleton_mapper['FALSE']
+NULL = peval.singleton_mapper['NULL']
+
+Run = Callable[[Environment], Object]
+
+
+class ParseError(Exception):
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def to_object(value) -> Object:
+    """ The Monkey value of a Python value: Objects, ints, bools and None """
+    if isinstance(value, Object):
+        return value
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return TRUE if value else FALSE
+    if isinstance(value, int):
+        return make_integer(value)
+    raise TypeError(f"no Monkey value for {type(value).__name__}")
+
+
+def prepare_vm(program: Program) -> Run:
+    bytecode = compile(program)
+    # the globals of the program are the slots of its Environment
+    return lambda env: VM(bytecode, env.slots).run()
+
+
+# engine -> function turning a resolved, folded program into a function running it in an Environment
+preparers: Dict[str, Callable[[Program], Run]] = {
+    "eval": lambda program: lambda env: peval.eval_program(program, env),
+    "stack": lambda program: lambda env: stack_eval.eval(program, env),
+    "closures": compile_closures,
+    "vm": prepare_vm,
+}
+
+
+class Prepared:
+    """ A program ready to run, in the Session which prepared it or, called, on globals of its own """
+
+    def __init__(self, program: Program, scope: Scope, run: Run):
+        self.program = program
+        self.scope = scope
+        self.run = run
+
+    def __call__(self, **inputs) -> Object:
+        return run_safely(self.run, self.environment(inputs))
+
+    def environment(self, inputs: Dict[str, object]) -> Environment:
+        """ Globals of its own for a run of the program, with inputs set """
+        env = Environment(self.scope.size)
+        for name, value in inputs.items():
+            slot = self.scope.slots.get(name)
+            if slot is None:
+                raise TypeError(f"{name} is not a variable of the program")
+            env.slots[slot] = to_object(value)
+        return env
+
+
+def run_safely(run: Run, env: Environment) -> Object:
+    try:
+        return run(env)
+    except RecursionError:
+        return Error("maximum recursion depth exceeded")
+    except Exception as error:
+        return Error(f"internal error: {error.__class__.__name__}: {error}")
+
+
+class Interpreter:
+    def __init__(self, engine: str = DEFAULT_ENGINE):
+        self.engine = engine
+        self.prepare_program = preparers[engine]
+        self._local = threading.local()
+
+    def parse(self, source: str, filename: str = "<input>") -> Program:
+        lexer = Lexer(source, filename=filename)
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = Parser.new(lexer)
+        else:
+            parser.reset(lexer)
+        program = parser.parse()
+        if parser.errors:
+            raise ParseError(parser.errors)
+        return program
+
+    def prepare(self, source: str, filename: str = "<input>", scope: Scope = None) -> Prepared:
+        """ Parse, resolve (against scope, the globals of a session) and compile source """
+        return self.prepare_parsed(self.parse(source, filename), scope)
+
+    def prepare_parsed(self, program: Program, scope: Scope = None) -> Prepared:
+        """ prepare() a program already parsed, which must have parsed without errors """
+        scope = resolve(program, scope)
+        program = fold_constants(program)
+        return Prepared(program, scope, self.prepare_program(program))
+
+    def exec(self, source: str, filename: str = "<input>", **inputs) -> Object:
+        """ Run source once, on globals of its own """
+        return self.prepare(source, filename)(**inputs)
+
+    async def run(self, program: Union[str, Prepared], timeout: float = None, step_budget: int = None,
+                  steps_per_yield: int = 1000, limits: Limits = None, **inputs) -> Object:
+        """
+        Run program (source, or prepared) on globals of its own without
+        blocking the event loop. Whatever the engine of the interpreter, this
+        runs on evaluator.stack_eval, the one which can stop and carry on.
+        Going over timeout seconds, step_budget steps or limits is a
+        ResourceExhausted result.
+        """
+        if isinstance(program, str):
+            program = self.prepare(program)
+        evaluation = stack_eval.Evaluation(program.program, program.environment(inputs), limits)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            steps = steps_per_yield
+            if step_budget is not None:
+                if evaluation.steps >= step_budget:
+                    return ResourceExhausted.of("steps", step_budget, evaluation.steps)
+                steps = min(steps, step_budget - evaluation.steps)
+            if evaluation.run(steps):
+                return evaluation.result
+            if deadline is not None and loop.time() >= deadline:
+                return ResourceExhausted.of("time", timeout, loop.time() - deadline + timeout)
+            # let the other tasks run, and cancellation get in
+            await asyncio.sleep(0)
+
+    def session(self, max_prepared: int = 256) -> "Session":
+        return Session(self, max_prepared)
+
+
+class Session:
+    """
+    Globals, and the programs prepared against them. A global keeps its
+    slot for as long as the session lives, so a program prepared once can
+    be run again whatever ran in between: prepare() hands back the one it
+    made for the same source and filename, the last max_prepared of them.
+    """
+
+    def __init__(self, interpreter: Interpreter, max_prepared: int = 256):
+        self.interpreter = interpreter
+        self.scope = Scope()
+        self.env = Environment()
+        self.max_prepared = max_prepared
+        # (source, filename) -> its Prepared, least recently used first
+        self.prepared: Dict[Tuple[str, str], Prepared] = {}
+
+    def prepare(self, source: str, filename: str = "<input>") -> Prepared:
+        key = (source, filename)
+        prepared = self.prepared.pop(key, None)
+        if prepared is None:
+            prepared = self.interpreter.prepare(source, filename, self.scope)
+            if len(self.prepared) >= self.max_prepared:
+                del self.prepared[next(iter(self.prepared))]
+        self.prepared[key] = prepared
+        return prepared
+
+    def load(self, path: str, cache: ProgramCache = None) -> Object:
+        """
+        Run the script in the file at path, its globals becoming the
+        session's. Parsing goes through cache when there is one, so a large
+        library loaded again, in this session or the next, is not parsed again.
+        """
+        if cache is None:
+            with open(path, encoding="utf-8") as file:
+                program = self.interpreter.parse(file.read(), path)
+        else:
+            program, errors = cache.load(path)
+            if errors:
+                raise ParseError(errors)
+        return self.run(self.interpreter.prepare_parsed(program, self.scope))
+
+    def run(self, prepared: Prepared, **inputs) -> Object:
+        """ Run a program prepared by this session, setting the variables in inputs first """
+        if prepared.scope is not self.scope:
+            raise ValueError("the program was prepared for another session")
+        for name, value in inputs.items():
+            self.set(name, value)
+        self.env.ensure(self.scope.size)
+        return run_safely(prepared.run, self.env)
+
+    def exec(self, source: str, filename: str = "<input>") -> Object:
+        return self.run(self.prepare(source, filename))
+
+    def set(self, name: str, value):
+        slot = self.scope.define(name)
+        self.env.ensure(self.scope.size)
+        self.env.slots[slot] = to_object(value)
+
+    def get(self, name: str) -> Object:
+        """ The value of a global variable, None if it is not bound """
+        slot = self.scope.slots.get(name)
+        return None if slot is None else self.env.slots[slot]
+
+    def __getitem__(self, name: str) -> Object:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name: str, value):
+        self.set(name, value)
@@ -0,0 +1,122 @@
+"""
+Running many independent programs, the non-interactive side of repl.py.
+
+Every program is parsed (through the ProgramCache when it comes from a
+file), folded and run with one of the engines, and what comes out is a
+Result: the text the repl would have printed and whether it went well.
+
+run_many() spreads the programs over a pool of worker processes. Each
+worker imports and warms up the lexer, parser and engines once, when it
+starts, and then takes the programs chunksize at a time, so a job of
+thousands of small scripts does not pay for starting anything per script.
+Results come back in the order the programs went in, whatever order the
+workers finish them in.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+
+from compiler import compile
+from evaluator import stack_eval
+from evaluator.closures import compile as compile_closures
+from evaluator.folding import fold_constants
+from evaluator.object import Error
+from evaluator.peval import eval
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+from vm import VM
+from .cache import ProgramCache
+
+engines = {
+    "eval": eval,
+    "stack": stack_eval.eval,
+    "closures": lambda program: compile_closures(program)(),
+    "vm": lambda program: VM(compile(program)).run(),
+}
+
+# the explicit-stack evaluator: eval and closures recurse in Python for every Monkey call, and at the
+# default recursion limit eval runs out of stack some 60 calls deep, closures a few hundred
+DEFAULT_ENGINE = "stack"
+
+
+class Result(NamedTuple):
+    ok: bool
+    output: str
+
+
+class Runner:
+    """ Runs programs with one engine, parsing files through cache unless it is None """
+
+    def __init__(self, engine: str = DEFAULT_ENGINE, cache: ProgramCache = None):
+        self.run = engines[engine]
+        self.cache = cache
+
+    def run_program(self, program, errors) -> Result:
+        if errors:
+            return Result(False, "; ".join(errors))
+        try:
+            output = self.run(fold_constants(program))
+        except RecursionError:
+            # one script too deep for the engine must not take the rest of a batch down with it
+            output = Error("maximum recursion depth exceeded")
+        return Result(not isinstance(output, Error), str(output))
+
+    def run_source(self, source: str, filename: str = "<input>") -> Result:
+        try:
+            if self.cache is not None:
+                return self.run_program(*self.cache.parse(source, filename))
+            parser = Parser.new(Lexer(source, filename=filename))
+            program = parser.parse()
+            return self.run_program(program, parser.errors)
+        except Exception as error:
+            # a script breaking the interpreter fails on its own, the rest of a batch carries on
+            return Result(False, f"{filename}: {error.__class__.__name__}: {error}")
+
+    def run_file(self, path: str) -> Result:
+        try:
+            with open(path, encoding="utf-8") as file:
+                source = file.read()
+        except OSError as error:
+            return Result(False, f"{path}: {error.strerror}")
+        except UnicodeDecodeError as error:
+            return Result(False, f"{path}: {error}")
+        return self.run_source(source, path)
+
+
+# The Runner of a worker process, made once by start_worker
+worker: Runner = None
+
+
+def start_worker(engine: str, cache_directory: str = None):
+    global worker
+    worker = Runner(engine, ProgramCache(cache_directory) if cache_directory else None)
+    # the first program parsed and run is slower than the rest, get that over with here
+    worker.run_source("let warm = fn(x) { x + 1 }; warm(1);")
+
+
+def run_file_in_worker(path: str) -> Result:
+    return worker.run_file(path)
+
+
+def run_source_in_worker(source: str) -> Result:
+    return worker.run_source(source)
+
+
+def run_many(inputs: Iterable[str], files: bool = True, engine: str = DEFAULT_ENGINE, workers: int = None,
+             chunksize: int = 16, cache_directory: str = None) -> Iterator[Result]:
+    """
+    The Result of every input, in order. inputs are the paths of scripts,
+    or the programs themselves if not files. workers defaults to the number
+    of CPUs, and 1 runs everything in this process. cache_directory is where
+    the ProgramCache of the workers is, None to parse every file afresh.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        start_worker(engine, cache_directory)
+        yield from map(run_file_in_worker if files else run_source_in_worker, inputs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                             initargs=(engine, cache_directory)) as executor:
+        yield from executor.map(run_file_in_worker if files else run_source_in_worker, inputs,
+                                chunksize=chunksize)
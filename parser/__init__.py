@@ -1 +1 @@
-from .parser import Parser
\ No newline at end of file
+from .parser import Parser, TracingParser
@@ -1,8 +1,11 @@
 from lexer.monkey_lexer import Lexer, Token, TokenTypes, TokenType
+from lexer.token_buffer import TokenBuffer
 from abstract.monkey_ast import Program, LetStatement, Identifier, ReturnStatement, PrefixExpression, InfixExpression, \
     BooleanLiteral, IfExpression, BlockStatement, FunctionLiteral, CallExpression
 from abstract.monkey_ast import Expression, ExpressionStatement, IntegerLiteral
-from typing import Optional, Dict, Callable
+from typing import Optional, Dict, Callable, Iterable
+from bisect import bisect_left
+import os
 from enum import IntEnum
 from trace_helper import TraceCalls
 
@@ -29,58 +32,154 @@ token_to_precedence = {
     TokenTypes.LPAREN: Precedence.CALL
 }
 
+LOWEST = Precedence.LOWEST.value
+
+
+def shift_offsets(nodes: Iterable, delta: int):
+    """
+    Move nodes, and every node below them, delta characters along the
+    source. It walks the fields itself rather than with iter_children, being
+    what an edit early in a large file spends most of its time on.
+    """
+    stack = list(nodes)
+    pop, push, push_all = stack.pop, stack.append, stack.extend
+    while stack:
+        node = pop()
+        if node is None:
+            continue
+        node._offset += delta
+        for name in node._fields:
+            value = getattr(node, name)
+            if value.__class__ is list:
+                push_all(value)
+            elif value is not None:
+                push(value)
+
 
 class Parser:
+    """
+    The parse functions are looked up by token type in tables which belong to
+    the class, not to each parser: register_parse_functions() fills them in
+    once, when the class is made, with the class's own functions. Making a
+    parser only reads its first two tokens, so one can be made for every
+    line of the repl, or every request, for next to nothing.
+    """
+    # token type -> function(parser), and function(parser, left), parsing an expression starting with it
+    prefix_parsers: Dict[TokenType, Callable[["Parser"], Expression]]
+    infix_parsers: Dict[TokenType, Callable[["Parser", Expression], Expression]]
+    # token type -> the value of its Precedence
+    precedences: Dict[TokenType, int]
+
     def __init__(self, lexer: Lexer, cur_token: Token = None,
                  peek_token: Token = None):
         self._lexer = lexer
+        self._read_token = lexer.next_token
         self._cur_token = cur_token
         self._peek_token = peek_token
-        self.prefix_parsers: Dict[Token, Callable[[], Expression]] = {}
-        self.infix_parsers: Dict[Token, Callable[[Expression], Expression]] = {}
+        # source offsets of the current and peek tokens
+        self._cur_offset = 0
+        self._peek_offset = 0
         self.errors = []
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # a subclass gets tables of its own, holding the functions it overrides
+        cls.register_parse_functions()
+
     @classmethod
     def new(cls, lexer: Lexer):
-        parser = Parser(lexer)
-
-        # read two tokens so that current and peek tokens are set
-        parser.next_token()
-        parser.next_token()
-
-        parser.register_prefix(TokenTypes.FUNCTION, parser.parse_function_expression)
-        parser.register_prefix(TokenTypes.IF, parser.parse_if_expression)
-        parser.register_prefix(TokenTypes.LPAREN, parser.parse_grouped_expression)
-        parser.register_prefix(TokenTypes.TRUE, parser.parse_boolean_expression)
-        parser.register_prefix(TokenTypes.FALSE, parser.parse_boolean_expression)
-        parser.register_prefix(TokenTypes.MINUS, parser.parse_prefix_expression)
-        parser.register_prefix(TokenTypes.BANG, parser.parse_prefix_expression)
-        parser.register_prefix(TokenTypes.IDENT, parser.parse_identifier)
-        parser.register_prefix(TokenTypes.INT, parser.parse_integer)
-
-        parser.register_infix(TokenTypes.LPAREN, parser.parse_call_expression)
-        parser.register_infix(TokenTypes.PLUS, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.MINUS, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.LT, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.GT, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.SLASH, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.ASTERISK, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.EQ, parser.parse_infix_expression)
-        parser.register_infix(TokenTypes.NOT_EQ, parser.parse_infix_expression)
+        parser = cls.parser_class()(lexer)
+        parser.setup()
         return parser
 
-    def register_prefix(self, token: TokenTypes, func: Callable[[], Expression]):
-        self.prefix_parsers[token] = func
+    @classmethod
+    def from_buffer(cls, buffer: TokenBuffer):
+        """
+        Parse a program that has already been lexed with Lexer.tokenize_all.
+        Tokens are read straight out of the buffer's columns.
+        """
+        parser = cls.parser_class()(buffer.cursor())
+        parser.setup()
+        return parser
+
+    @classmethod
+    def parser_class(cls):
+        """
+        Tracing is opt in: setting MONKEY_TRACE_PARSER in the environment
+        makes Parser.new hand out a TracingParser.
+        """
+        if cls is Parser and os.environ.get("MONKEY_TRACE_PARSER"):
+            return TracingParser
+        return cls
 
-    def register_infix(self, token: TokenTypes, func: Callable[[Expression], Expression]):
-        self.infix_parsers[token] = func
+    @classmethod
+    def register_parse_functions(cls):
+        """ Build the tables of cls. Subclasses parsing more override this, calling it first """
+        cls.prefix_parsers = {}
+        cls.infix_parsers = {}
+        cls.precedences = {type: precedence.value for type, precedence in token_to_precedence.items()}
+
+        cls.register_prefix(TokenTypes.FUNCTION, cls.parse_function_expression)
+        cls.register_prefix(TokenTypes.IF, cls.parse_if_expression)
+        cls.register_prefix(TokenTypes.LPAREN, cls.parse_grouped_expression)
+        cls.register_prefix(TokenTypes.TRUE, cls.parse_boolean_expression)
+        cls.register_prefix(TokenTypes.FALSE, cls.parse_boolean_expression)
+        cls.register_prefix(TokenTypes.MINUS, cls.parse_prefix_expression)
+        cls.register_prefix(TokenTypes.BANG, cls.parse_prefix_expression)
+        cls.register_prefix(TokenTypes.IDENT, cls.parse_identifier)
+        cls.register_prefix(TokenTypes.INT, cls.parse_integer)
+
+        cls.register_infix(TokenTypes.LPAREN, cls.parse_call_expression)
+        cls.register_infix(TokenTypes.PLUS, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.MINUS, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.LT, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.GT, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.SLASH, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.ASTERISK, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.EQ, cls.parse_infix_expression)
+        cls.register_infix(TokenTypes.NOT_EQ, cls.parse_infix_expression)
+
+    @classmethod
+    def register_prefix(cls, token: TokenType, func: Callable[["Parser"], Expression]):
+        cls.prefix_parsers[token] = func
+
+    @classmethod
+    def register_infix(cls, token: TokenType, func: Callable[["Parser", Expression], Expression]):
+        cls.infix_parsers[token] = func
+
+    def setup(self):
+        """ Load the first two tokens, so that current and peek tokens are set """
+        self.next_token()
+        self.next_token()
+
+    def reset(self, lexer: Lexer):
+        """ Start over on the tokens of lexer """
+        self._lexer = lexer
+        self._read_token = lexer.next_token
+        self._cur_token = self._peek_token = None
+        self._cur_offset = self._peek_offset = 0
+        self.errors = []
+        self.next_token()
+        self.next_token()
 
     def next_token(self):
         self._cur_token = self._peek_token
-        self._peek_token = self._lexer.next_token()
+        self._cur_offset = self._peek_offset
+        self._peek_token = self._read_token()
+        self._peek_offset = self._lexer.token_offset
+
+    def location(self) -> str:
+        """ file:line:col of the current token """
+        return self._lexer.source_map.location(self._cur_offset)
+
+    def peek_error(self, type: TokenType):
+        """ Record that the peek token should have been of type """
+        location = self._lexer.source_map.location(self._peek_offset)
+        self.errors.append(f"{location}: expected next token to be {type}, got {self._peek_token.type} instead")
 
     def parse(self) -> Program:
         program = Program()
+        program._source_map = self._lexer.source_map
 
         while not self.current_token_is(TokenTypes.EOF):
             statement = self.parse_statement()
@@ -89,10 +188,66 @@ class Parser:
 
             self.next_token()
 
+        program._errors = self.errors
         return program
 
+    def reparse(self, program: Program, offset: int, removed: int, inserted: str) -> Program:
+        """
+        The program the source of program is once the removed characters at
+        offset are replaced with inserted. The parser starts over on the
+        edited source, and errors are those of what was parsed again.
+
+        Only the top level statements near the edit are lexed and parsed
+        again, the others are reused as they are (the ones after the edit
+        moved along by what it added or took away, so program should not be
+        used any more). Where a statement ends depends on the token after it,
+        so parsing starts at the statement before the last one starting
+        ahead of the edit, whose first token the edit cannot have changed.
+        It stops at the first statement starting past the edit where an old
+        one started: the source from there on is the same, so would be its
+        statements. A program with errors is parsed again in full.
+        """
+        text = program._source_map.text
+        if offset < 0 or removed < 0 or offset + removed > len(text):
+            raise ValueError(f"cannot remove {removed} characters at {offset} of {len(text)}")
+        lexer = Lexer(text[:offset] + inserted + text[offset + removed:], program._source_map.filename)
+        if program._errors:
+            self.reset(lexer)
+            return self.parse()
+
+        statements = program._statements
+        starts = [statement._offset for statement in statements]
+        kept = max(bisect_left(starts, offset) - 2, 0)
+        lexer.seek(starts[kept] if kept else 0)
+        self.reset(lexer)
+
+        edited = Program()
+        edited._source_map = lexer.source_map
+        edited._statements = statements[:kept]
+        delta = len(inserted) - removed
+        end = offset + len(inserted)
+        reused = len(statements)
+        while not self.current_token_is(TokenTypes.EOF):
+            if self._cur_offset >= end:
+                index = bisect_left(starts, self._cur_offset - delta)
+                if index < len(starts) and starts[index] == self._cur_offset - delta:
+                    reused = index
+                    break
+            statement = self.parse_statement()
+            if statement:
+                edited._statements.append(statement)
+
+            self.next_token()
+
+        if delta:
+            shift_offsets(statements[reused:], delta)
+        edited._statements.extend(statements[reused:])
+        edited._errors = self.errors
+        return edited
+
     def parse_let_statement(self):
         statement = LetStatement(self._cur_token)
+        statement._offset = self._cur_offset
 
         if not self.peek_token_is(TokenTypes.IDENT):
             return None
@@ -111,7 +266,6 @@ class Parser:
 
         if self.peek_token_is(TokenTypes.SEMICOLON):
             self.next_token()
-            self.next_token()  # set the current token correct for next parsing
 
         return statement
 
@@ -130,30 +284,35 @@ class Parser:
             return self.parse_expression_statement()
 
     def parse_boolean_expression(self):
-        return BooleanLiteral(self._cur_token, self.current_token_is(TokenTypes.TRUE))
+        expression = BooleanLiteral(self._cur_token, self.current_token_is(TokenTypes.TRUE))
+        expression._offset = self._cur_offset
+        return expression
 
     def parse_identifier(self):
-        return Identifier(self._cur_token, self._cur_token.literal)
+        expression = Identifier(self._cur_token, self._cur_token.literal)
+        expression._offset = self._cur_offset
+        return expression
 
     def parse_integer(self):
-        return IntegerLiteral(self._cur_token, int(self._cur_token.literal))
+        expression = IntegerLiteral(self._cur_token, int(self._cur_token.literal))
+        expression._offset = self._cur_offset
+        return expression
 
     def parse_return_statement(self):
         statement = ReturnStatement(self._cur_token)
+        statement._offset = self._cur_offset
         self.next_token()
 
         statement._value = self.parseExpression(Precedence.LOWEST)
 
-        # TODO: We're skipping the expressions until we encounter a semicolon
         if self.peek_token_is(TokenTypes.SEMICOLON):
             self.next_token()
-            self.next_token()
 
         return statement
 
-    @TraceCalls()
     def parse_expression_statement(self):
         statement = ExpressionStatement(self._cur_token)
+        statement._offset = self._cur_offset
         statement._expression = self.parseExpression(Precedence.LOWEST.value)
 
         if self.peek_token_is(TokenTypes.SEMICOLON):
@@ -161,7 +320,6 @@ class Parser:
 
         return statement
 
-    @TraceCalls()
     def parse_grouped_expression(self) -> Expression:
         self.next_token()
         exp = self.parseExpression(Precedence.LOWEST.value)
@@ -172,22 +330,21 @@ class Parser:
         self.next_token()
         return exp
 
-    @TraceCalls()
     def parse_prefix_expression(self):
         expression = PrefixExpression(self._cur_token, self._cur_token.literal)
+        expression._offset = self._cur_offset
         self.next_token()
         expression._right = self.parseExpression(Precedence.PREFIX.value)
         return expression
 
-    @TraceCalls()
     def parse_infix_expression(self, left: Expression):
         expression = InfixExpression(self._cur_token, self._cur_token.literal, left=left)
+        expression._offset = self._cur_offset
         precedence = self.curr_precedence()
         self.next_token()
         expression._right = self.parseExpression(precedence)
         return expression
 
-    @TraceCalls()
     def parseExpression(self, precedence):
         """
         Whenever we wish to parse expression, check the token type,
@@ -197,25 +354,27 @@ class Parser:
         """
         prefix_fn = self.prefix_parsers.get(self._cur_token.type, None)
         if prefix_fn:
-            left_exp = prefix_fn()
+            left_exp = prefix_fn(self)
         else:
-            self.errors.append(f"No Prefix Parser not found to for token type : {self._cur_token}")
+            self.errors.append(f"{self.location()}: No Prefix Parser not found to for token type : {self._cur_token}")
             return None
 
+        precedences = self.precedences
         while self._cur_token.type != TokenTypes.SEMICOLON and \
-                precedence < self.peek_precedence():
+                precedence < precedences.get(self._peek_token.type, LOWEST):
 
             infix_fn = self.infix_parsers.get(self._peek_token.type, None)
             if infix_fn is None:
                 return left_exp
 
             self.next_token()
-            left_exp = infix_fn(left_exp)
+            left_exp = infix_fn(self, left_exp)
 
         return left_exp
 
     def parse_if_expression(self):
         ifexp = IfExpression(self._cur_token)
+        ifexp._offset = self._cur_offset
         if not self.peek_token_is(TokenTypes.LPAREN):
             return None
 
@@ -248,6 +407,7 @@ class Parser:
 
     def parse_block_statement(self) -> BlockStatement:
         block = BlockStatement(token=self._cur_token)
+        block._offset = self._cur_offset
         block._statements = []
 
         self.next_token()
@@ -264,6 +424,7 @@ class Parser:
 
     def parse_function_expression(self):
         func_exp = FunctionLiteral(self._cur_token)
+        func_exp._offset = self._cur_offset
 
         if not self.peek_token_is(TokenTypes.LPAREN):
             return None
@@ -282,22 +443,20 @@ class Parser:
     def parse_func_parameters(self):
         parameters = []
         if self.peek_token_is(TokenTypes.RPAREN):
-            self.next_token()
             self.next_token()
             return parameters
 
         self.next_token()
 
-        ident = Identifier(self._cur_token, self._cur_token.literal)
-        parameters.append(ident)
+        parameters.append(self.parse_identifier())
 
         while self.peek_token_is(TokenTypes.COMMA):
             self.next_token()
             self.next_token()
-            ident = Identifier(self._cur_token, self._cur_token.literal)
-            parameters.append(ident)
+            parameters.append(self.parse_identifier())
 
         if not self.peek_token_is(TokenTypes.RPAREN):
+            self.peek_error(TokenTypes.RPAREN)
             return None
 
         self.next_token()
@@ -305,13 +464,13 @@ class Parser:
 
     def parse_call_expression(self, ident_or_func_expression):
         expression = CallExpression(self._cur_token, ident_or_func_expression)
+        expression._offset = self._cur_offset
         expression._args = self.parse_args()
         return expression
 
     def parse_args(self):
         args = []
         if self.peek_token_is(TokenTypes.RPAREN):
-            self.next_token()
             self.next_token()
             return args
 
@@ -326,17 +485,32 @@ class Parser:
             args.append(arg)
 
         if not self.peek_token_is(TokenTypes.RPAREN):
+            self.peek_error(TokenTypes.RPAREN)
             return None
 
         self.next_token()
         return args
 
     def peek_precedence(self) -> int:
-        return token_to_precedence.get(self._peek_token.type, Precedence.LOWEST).value
+        return self.precedences.get(self._peek_token.type, LOWEST)
 
     def curr_precedence(self) -> int:
-        return token_to_precedence.get(self._cur_token.type, Precedence.LOWEST).value
+        return self.precedences.get(self._cur_token.type, LOWEST)
+
 
+Parser.register_parse_functions()
 
 
+class TracingParser(Parser):
+    """
+    Parser which prints a BEGIN/END line for every expression it parses.
+    The wrapping lives here rather than on Parser so that ordinary parsing
+    never goes through trace_helper.TraceCalls.
+    """
+    trace = TraceCalls(debug=True)
 
+    parse_expression_statement = trace(Parser.parse_expression_statement)
+    parse_grouped_expression = trace(Parser.parse_grouped_expression)
+    parse_prefix_expression = trace(Parser.parse_prefix_expression)
+    parse_infix_expression = trace(Parser.parse_infix_expression)
+    parseExpression = trace(Parser.parseExpression)
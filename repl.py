@@ -1,4 +1,5 @@
 import sys
+import argparse
 import getpass
 from lexer import monkey_lexer
 from prompt_toolkit import prompt
@@ -6,8 +7,10 @@ from prompt_toolkit.history import FileHistory
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.completion import WordCompleter
 from pygments.lexers import load_lexer_from_file
-from parser import Parser
-from evaluator.peval import eval
+from evaluator.folding import fold_constants
+from monkey import Interpreter, ParseError
+from monkey.cache import ProgramCache
+from monkey.runner import DEFAULT_ENGINE, engines
 
 MONKEY = """\
             __,__
@@ -23,11 +26,57 @@ MONKEY = """\
            '~---~'
        """
 
+
+def evaluate(session, line: str, cache: ProgramCache) -> str:
+    """
+    What the repl prints for line. Lines run in session, so what one defines
+    the next can use, and ":load FILE" runs a script into it.
+    """
+    try:
+        if line.startswith(":load"):
+            path = line[len(":load"):].strip()
+            if not path:
+                return "usage: :load FILE"
+            return str(session.load(path, cache))
+        if line.startswith(":"):
+            return f"unknown command: {line.split()[0]}"
+        return str(session.exec(line, filename="<stdin>"))
+    except ParseError as error:
+        return str(error)
+    except OSError as error:
+        return f"{error.filename}: {error.strerror}"
+    except Exception as error:
+        # whatever went wrong, the session carries on
+        return f"ERROR: {error.__class__.__name__}: {error}"
+
+
 def main(argv):
+    args = argparse.ArgumentParser(description="The Monkey programming language")
+    args.add_argument("--engine", choices=engines, default=DEFAULT_ENGINE,
+                      help="tree walking evaluator, explicit-stack evaluator, compiled closures or the bytecode vm")
+    args.add_argument("script", nargs="?", help="run this script and print its value instead of prompting")
+    args.add_argument("--load", action="append", default=[], metavar="FILE",
+                      help="run FILE into the session before prompting, as :load FILE does")
+    args = args.parse_args(argv[1:])
+    run = engines[args.engine]
+
+    if args.script:
+        program, errors = ProgramCache().load(args.script)
+        for error in errors:
+            print(error, file=sys.stderr)
+        if errors:
+            return 1
+        print(run(fold_constants(program)))
+        return 0
+
     PROMPT = ">> "
     print(f"Hello {getpass.getuser()}, This is the Monkey programming language!\n")
     print(f"{MONKEY}")
     print(f"Feel free to type in commands")
+    session = Interpreter(args.engine).session()
+    cache = ProgramCache()
+    for path in args.load:
+        print(evaluate(session, f":load {path}", cache))
     suggestions = WordCompleter([item for item in monkey_lexer.keywords], ignore_case=True)
     lexer = load_lexer_from_file("/Users/smital/PycharmProjects/writing-interpreter-in-python/monkey_pyg_lexer.py",
                                  "MonkeyLexer")
@@ -38,12 +87,8 @@ def main(argv):
                       auto_suggest=AutoSuggestFromHistory(),
                       completer=suggestions,
                       multiline=False)
-        lexer = monkey_lexer.Lexer(data)
-        parser = Parser.new(lexer)
-        program = parser.parse()
-        output = eval(program)
-        print(output)
+        print(evaluate(session, data.strip(), cache))
 
 
 if __name__ == '__main__':
-    main(sys.argv)
+    sys.exit(main(sys.argv))
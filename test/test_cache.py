@@ -0,0 +1,117 @@
+import os
+
+from evaluator import eval
+from monkey.cache import ProgramCache, SUFFIX
+
+SOURCE = "let double = fn(x) { x * 2 }; double(21);"
+
+
+def test_second_parse_is_a_hit(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+
+    first, errors = cache.parse(SOURCE, "test.mk")
+    second, _ = cache.parse(SOURCE, "test.mk")
+
+    assert errors == []
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first is not second
+    assert eval(second).value == 42
+
+
+def test_hit_has_a_source_map(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    cache.parse("1;\nx;", "test.mk")
+
+    program, _ = cache.parse("1;\nx;", "other.mk")
+    assert str(eval(program)) == "other.mk:2:1: ERROR: identifier not found: x"
+
+
+def test_changed_source_misses(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    cache.parse(SOURCE)
+    program, _ = cache.parse(SOURCE.replace("21", "5"))
+
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert eval(program).value == 10
+    assert len(cache.entries()) == 2
+
+
+def test_another_interpreter_misses(tmp_path, monkeypatch):
+    cache = ProgramCache(str(tmp_path))
+    cache.parse(SOURCE)
+    monkeypatch.setattr("monkey.cache._version", b"another version")
+    cache.parse(SOURCE)
+
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_parse_errors_are_not_cached(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    _, errors = cache.parse("let x = ;")
+
+    assert len(errors) == 1
+    assert cache.entries() == []
+
+
+def test_broken_entry_is_a_miss_and_removed(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    cache.parse(SOURCE)
+    (_, _, path), = cache.entries()
+    with open(path, "wb") as file:
+        file.write(b"garbage")
+
+    program, _ = cache.parse(SOURCE)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert eval(program).value == 42
+    assert len(cache.entries()) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    sources = [f"{value} + 1;" for value in range(3)]
+    for age, source in enumerate(sources):
+        cache.parse(source)
+        path = cache.path(cache.key(source))
+        os.utime(path, (age, age))
+    size = os.path.getsize(path)
+
+    # using the oldest one makes the second the least recently used
+    cache.parse(sources[0])
+    cache.max_bytes = 3 * size
+    cache.parse("3 + 1;")
+
+    remaining = sorted(os.path.basename(path) for _, _, path in cache.entries())
+    assert len(remaining) == 3
+    assert cache.key(sources[1]) + SUFFIX not in remaining
+
+
+def test_directory_is_listed_only_when_the_cache_may_be_full(tmp_path, monkeypatch):
+    cache = ProgramCache(str(tmp_path))
+    listed = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, "entries", lambda: listed.append(1) or entries())
+
+    for value in range(20):
+        cache.parse(f"{value} * 2;")
+    # once, to count what was there already
+    assert len(listed) == 1
+    assert cache.total == sum(size for _, size, _ in entries())
+
+    cache.max_bytes = cache.total
+    cache.parse("0 * 3;")
+    assert len(listed) == 2
+    assert len(entries()) < 21
+    assert cache.total == sum(size for _, size, _ in entries()) <= cache.max_bytes
+
+
+def test_load_and_clear(tmp_path):
+    script = tmp_path / "script.mk"
+    script.write_text(SOURCE)
+    cache = ProgramCache(str(tmp_path / "cache"))
+
+    program, _ = cache.load(str(script))
+    assert eval(program).value == 42
+    assert cache.size() > 0
+
+    cache.clear()
+    assert cache.entries() == []
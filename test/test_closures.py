@@ -0,0 +1,37 @@
+import pytest
+
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+from evaluator import eval, compile
+from test.test_peval import INTEGER_CASES, BOOLEAN_CASES, BANG_CASES, IF_ELSE_CASES, LET_CASES, FUNCTION_CASES, \
+    RETURN_CASES, ERROR_CASES
+
+PEVAL_CASES = [input_data for input_data, _ in
+               INTEGER_CASES + BOOLEAN_CASES + BANG_CASES + IF_ELSE_CASES + LET_CASES + FUNCTION_CASES + RETURN_CASES +
+               ERROR_CASES]
+
+
+def parse(input_data):
+    return Parser.new(Lexer(input_data, filename="test.mk")).parse()
+
+
+def assert_same_result(actual, expected):
+    assert type(actual) is type(expected)
+    assert str(actual) == str(expected)
+
+
+@pytest.mark.parametrize("input_data", PEVAL_CASES)
+def test_compile_agrees_with_eval(input_data):
+    assert_same_result(compile(parse(input_data))(), eval(parse(input_data)))
+
+
+def test_compiled_program_can_run_repeatedly():
+    run = compile(parse("if (2 * 5 > 9) { 10 - 3 } else { 0 }"))
+
+    assert run().value == 7
+    assert run().value == 7
+
+
+@pytest.mark.parametrize("input_data", ["", "let x = 5;", "(;"])
+def test_compile_handles_unsupported_and_broken_programs(input_data):
+    assert_same_result(compile(parse(input_data))(), eval(parse(input_data)))
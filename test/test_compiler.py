@@ -0,0 +1,71 @@
+import pytest
+
+from compiler import compile
+from compiler.code import Opcodes, make, disassemble
+from lexer.monkey_lexer import Lexer
+from parser import Parser
+
+
+def compiled(input_data, fold=False):
+    return compile(Parser.new(Lexer(input_data)).parse(), fold)
+
+
+def test_make_checks_operand_count():
+    assert make(Opcodes.CONSTANT, 65535) == [Opcodes.CONSTANT, 65535]
+    with pytest.raises(ValueError):
+        make(Opcodes.ADD, 1)
+
+
+@pytest.mark.parametrize("input_data, expected", [
+    ("1 + 2;", "0000 CONSTANT 0\n0002 CONSTANT 1\n0004 ADD\n0005 POP"),
+    ("1; 2", "0000 CONSTANT 0\n0002 POP\n0003 CONSTANT 1\n0005 POP"),
+    ("-1 < 2", "0000 CONSTANT 0\n0002 MINUS\n0003 CONSTANT 1\n0005 LESS_THAN\n0006 POP"),
+    ("!true == false", "0000 TRUE\n0001 BANG\n0002 FALSE\n0003 EQUAL\n0004 POP"),
+    ("if (true) { 10 }; 3333;", "0000 TRUE\n0001 JUMP_NOT_TRUTHY 7\n0003 CONSTANT 0\n0005 JUMP 8\n"
+                                "0007 NULL\n0008 POP\n0009 CONSTANT 1\n0011 POP"),
+    ("if (true) { 10 } else { 20 }", "0000 TRUE\n0001 JUMP_NOT_TRUTHY 7\n0003 CONSTANT 0\n0005 JUMP 9\n"
+                                     "0007 CONSTANT 1\n0009 POP"),
+    ("if (true) { }", "0000 TRUE\n0001 JUMP_NOT_TRUTHY 6\n0003 NULL\n0004 JUMP 7\n0006 NULL\n0007 POP"),
+])
+def test_compiled_instructions(input_data, expected):
+    assert disassemble(compiled(input_data).instructions) == expected
+
+
+def test_constant_expressions_are_folded():
+    bytecode = compiled("5 + 5 * 7 - 5; !(1 < 2)", fold=True)
+
+    assert disassemble(bytecode.instructions) == "0000 CONSTANT 0\n0002 POP\n0003 FALSE\n0004 POP"
+    assert [constant.value for constant in bytecode.constants] == [35]
+
+
+def test_integer_constants_are_shared():
+    bytecode = compiled("5 + 5 * 7 - 5")
+
+    assert [constant.value for constant in bytecode.constants] == [5, 7]
+
+
+def test_failable_instructions_remember_their_source_offset():
+    bytecode = compiled("1 +\n  -true")
+
+    assert bytecode.positions == {3: 6, 4: 2}
+
+
+def test_function_bodies_are_compiled_into_constants():
+    bytecode = compiled("let f = fn(a) { fn() { a } }; f(1)")
+    inner, outer = bytecode.constants[:2]
+
+    assert disassemble(bytecode.instructions) == ("0000 CLOSURE 1\n0002 SET_GLOBAL 0\n0004 GET_GLOBAL 0\n"
+                                                  "0006 CONSTANT 2\n0008 CALL 1\n0010 POP")
+    assert disassemble(outer.instructions) == "0000 CLOSURE 0\n0002 RETURN_VALUE"
+    assert disassemble(inner.instructions) == "0000 GET_FREE 0\n0002 RETURN_VALUE"
+    assert (outer.num_locals, outer.num_parameters, outer.cells) == (1, 1, (0,))
+
+
+def test_return_statements_compile_to_return_value():
+    bytecode = compiled("let f = fn(a) { if (a) { return 1; } 2 }; return f(true);")
+    function = bytecode.constants[2]
+
+    assert disassemble(function.instructions) == ("0000 GET_LOCAL 0\n0002 JUMP_NOT_TRUTHY 9\n0004 CONSTANT 0\n"
+                                                  "0006 RETURN_VALUE\n0007 JUMP 10\n0009 NULL\n0010 POP\n"
+                                                  "0011 CONSTANT 1\n0013 RETURN_VALUE")
+    assert disassemble(bytecode.instructions).endswith("0007 CALL 1\n0009 RETURN_VALUE")
@@ -0,0 +1,77 @@
+import pytest
+
+from abstract import monkey_ast as ast
+from evaluator import eval
+from evaluator.folding import fold_constants
+from evaluator.object import Error, make_integer, configure_small_integers
+from test.test_closures import PEVAL_CASES, parse, assert_same_result
+
+
+@pytest.mark.parametrize("input_data, expected", [
+    ("5 * 10 + 2", "52"),
+    ("-(3 - 4)", "1"),
+    ("!true", "false"),
+    ("1 < 2 == true", "true"),
+    ("if (1 > 2) { 10 } else { 2 * 3 }", "if false { 10 } else { 6 }"),
+])
+def test_fold_constants(input_data, expected):
+    assert str(fold_constants(parse(input_data))) == expected
+
+
+def test_folded_literal_keeps_offset():
+    program = fold_constants(parse("1;\n  2 * 3"))
+    literal = program._statements[1]._expression
+
+    assert isinstance(literal, ast.IntegerLiteral)
+    assert literal._value == 6
+    assert literal._offset == 7
+
+
+def test_folding_leaves_the_program_folded_alone():
+    program = parse("let y = 2 * 3; let f = fn(x) { x + y }; y")
+    kept = program._statements[1]
+    folded = fold_constants(program)
+
+    assert str(program) == "let y = (2 * 3);let f = fn(x) { (x + y) };y"
+    assert str(folded) == "let y = 6;let f = fn(x) { (x + y) };y"
+    # what folding did not change is shared
+    assert folded._statements[1] is kept
+
+
+@pytest.mark.parametrize("engine", ["eval", "stack", "closures", "vm"])
+def test_functions_print_as_written_whatever_the_engine(engine):
+    from compiler import compile as compile_bytecode
+    from monkey import Interpreter
+
+    program = parse("let y = 2 * 3; y")
+    compile_bytecode(program)
+    assert str(program) == "let y = (2 * 3);y"
+    assert str(Interpreter(engine).exec("fn(x) { x + 2 * 3 }")) == "fn(x) { (x + (2 * 3)) }"
+
+
+@pytest.mark.parametrize("input_data", ["1 / 0", "5 + true", "-true"])
+def test_errors_are_not_folded(input_data):
+    program = fold_constants(parse(input_data))
+
+    assert str(program) == str(parse(input_data))
+    assert isinstance(eval(program), Error)
+
+
+@pytest.mark.parametrize("input_data", PEVAL_CASES)
+def test_folding_does_not_change_results(input_data):
+    assert_same_result(eval(fold_constants(parse(input_data))), eval(parse(input_data)))
+
+
+def test_small_integers_are_shared():
+    assert make_integer(7) is make_integer(7)
+    assert make_integer(100000) is not make_integer(100000)
+    assert make_integer(100000) == make_integer(100000)
+
+
+def test_configure_small_integers():
+    try:
+        configure_small_integers(0, 1000)
+        assert make_integer(1000) is make_integer(1000)
+        assert make_integer(-1) is not make_integer(-1)
+    finally:
+        configure_small_integers()
@@ -0,0 +1,63 @@
+import io
+
+from evaluator import eval, stack_eval
+from evaluator.inline_cache import sites, reset, report
+from test.test_closures import parse
+
+
+def counts(program):
+    return [(site.location, site.kind, site.hits, site.misses) for site in sites(program)]
+
+
+def test_monomorphic_sites_hit_after_the_first_time():
+    program = parse("let f = fn(n) { if (n < 1) { 0 } else { f(n - 1) } }; f(3);")
+    assert eval(program).value == 0
+
+    assert counts(program) == [("test.mk:1:23", "<", 3, 1), ("test.mk:1:42", "call", 2, 1),
+                               ("test.mk:1:45", "-", 2, 1), ("test.mk:1:56", "call", 0, 1)]
+
+
+def test_polymorphic_sites_miss():
+    program = parse("let eq = fn(a, b) { a == b }; eq(1, 1); eq(true, true); eq(2, 3); eq(2, 2);")
+    eval(program)
+
+    (site,) = [site for site in sites(program) if site.kind == "=="]
+    assert (site.hits, site.misses) == (1, 3)
+    assert site.hit_rate == 0.25
+
+
+def test_a_miss_still_gives_the_right_result():
+    program = parse("let eq = fn(a, b) { a == b }; eq(1, 1) == eq(true, false);")
+    assert str(eval(program)) == "False"
+
+
+def test_call_site_with_a_different_function_each_time():
+    program = parse("let apply = fn(f) { f() }; apply(fn() { 1 }) + apply(fn() { 2 });")
+    assert eval(program).value == 3
+
+    (site,) = [site for site in sites(program) if site.location == "test.mk:1:22"]
+    assert (site.hits, site.misses) == (0, 2)
+
+
+def test_cached_call_site_still_reports_errors():
+    program = parse("let f = fn(x) { x }; let g = fn(h) { h(1) }; g(f); g(5);")
+    assert str(eval(program)) == "test.mk:1:39: ERROR: not a function: Integer"
+
+
+def test_stack_evaluator_uses_the_caches():
+    program = parse("let f = fn(n) { n * 2 }; f(1) + f(2);")
+    assert stack_eval.eval(program).value == 6
+
+    assert counts(program) == [("test.mk:1:19", "*", 1, 1), ("test.mk:1:31", "+", 0, 1),
+                               ("test.mk:1:27", "call", 0, 1), ("test.mk:1:34", "call", 0, 1)]
+
+
+def test_reset_and_report():
+    program = parse("1 + x;")
+    eval(parse("let x = 1;"))
+    reset(program)
+    assert counts(program) == []
+
+    stream = io.StringIO()
+    report(parse("1;"), stream)
+    assert stream.getvalue().split() == ["location", "site", "hits", "misses", "hit", "rate"]
@@ -0,0 +1,227 @@
+import asyncio
+import threading
+
+import pytest
+
+from evaluator.object import Error, ResourceExhausted
+from monkey import Interpreter, Limits, ParseError
+
+ENGINES = ["eval", "stack", "closures", "vm"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_session_keeps_globals_between_exec(engine):
+    session = Interpreter(engine).session()
+
+    assert str(session.exec("let double = fn(x) { x * 2 };")) == "null"
+    assert session.exec("let y = double(21);") is not None
+    assert session.exec("y + 1").value == 43
+    assert session["y"].value == 42
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_prepared_program_runs_with_different_inputs(engine):
+    session = Interpreter(engine).session()
+    session.exec("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };")
+    prepared = session.prepare("fib(n) + offset")
+
+    assert [session.run(prepared, n=n, offset=1).value for n in range(8)] == [1, 2, 2, 3, 4, 6, 9, 14]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_prepared_program_on_its_own_globals(engine):
+    area = Interpreter(engine).prepare("let area = width * height; area")
+
+    assert area(width=3, height=4).value == 12
+    assert area(width=5, height=True).message == "type mismatch: Integer * Boolean"
+    assert str(area()) == "<input>:1:12: ERROR: identifier not found: width"
+    with pytest.raises(TypeError):
+        area(depth=1)
+
+
+def test_set_and_get_python_values():
+    session = Interpreter().session()
+    session["flag"] = True
+    session.set("count", 3)
+
+    assert str(session.exec("if (flag) { count * 2 }")) == "6"
+    assert session.get("missing") is None
+    with pytest.raises(KeyError):
+        session["missing"]
+    with pytest.raises(TypeError):
+        session.set("name", "text")
+
+
+def test_parse_errors_raise_and_leave_the_session_usable():
+    interpreter = Interpreter()
+    session = interpreter.session()
+    session.exec("let x = 1;")
+
+    with pytest.raises(ParseError) as raised:
+        session.exec("let y = ;")
+    assert raised.value.errors[0].startswith("<input>:1:9: ")
+    assert session.exec("x").value == 1
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("source", ["add(1, 2", "let f = fn(x { x }; f(1)"])
+def test_unclosed_lists_raise_parse_error(engine, source):
+    with pytest.raises(ParseError):
+        Interpreter(engine).exec(source)
+
+
+def test_program_prepared_for_another_session_is_refused():
+    interpreter = Interpreter()
+    prepared = interpreter.session().prepare("1")
+    with pytest.raises(ValueError):
+        interpreter.session().run(prepared)
+
+
+def test_session_prepares_a_source_once():
+    session = Interpreter().session(max_prepared=2)
+    first = session.prepare("let n = 1;")
+    assert session.prepare("let n = 1;") is first
+    # a global used before it is defined keeps its slot, the prepared program stays right
+    use = session.prepare("later + 1")
+    session.exec("let later = 41;")
+    assert session.run(session.prepare("later + 1")).value == 42
+    assert session.prepare("later + 1") is use
+
+    session.prepare("3")
+    session.prepare("4")
+    assert session.prepare("let n = 1;") is not first
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_session_loads_a_script(engine, tmp_path):
+    from monkey.cache import ProgramCache
+
+    library = tmp_path / "library.mk"
+    library.write_text("let square = fn(x) { x * x };\nlet answer = square(6) + 6;\nanswer")
+    cache = ProgramCache(str(tmp_path / "cache"))
+
+    for _ in range(2):
+        session = Interpreter(engine).session()
+        assert session.load(str(library), cache).value == 42
+        assert session.exec("square(answer)").value == 42 * 42
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    session = Interpreter(engine).session()
+    session.load(str(library))
+    assert session["answer"].value == 42
+
+
+def test_session_load_of_a_script_which_does_not_parse(tmp_path):
+    from monkey.cache import ProgramCache
+
+    script = tmp_path / "broken.mk"
+    script.write_text("let x = ;")
+    for cache in [None, ProgramCache(str(tmp_path / "cache"))]:
+        with pytest.raises(ParseError) as raised:
+            Interpreter().session().load(str(script), cache)
+        assert raised.value.errors[0].startswith(f"{script}:1:9: ")
+
+
+def test_default_engine_keeps_deep_recursion_off_the_python_stack():
+    deep = "let g = fn(n) { if (n == 0) { 0 } else { 1 + g(n - 1) } }; g(5000)"
+    assert Interpreter().engine == "stack"
+    assert Interpreter().exec(deep).value == 5000
+    assert Interpreter().session().exec(deep).value == 5000
+
+
+def test_an_exception_out_of_the_engine_is_an_error(monkeypatch):
+    from monkey.interpreter import preparers
+
+    def broken(program):
+        def run(env):
+            raise TypeError("broken engine")
+        return run
+    monkeypatch.setitem(preparers, "eval", broken)
+    session = Interpreter("eval").session()
+
+    assert str(session.exec("1")) == "ERROR: internal error: TypeError: broken engine"
+    assert str(session.exec("2")) == "ERROR: internal error: TypeError: broken engine"
+
+
+def test_running_out_of_stack_is_an_error():
+    result = Interpreter("eval").exec("let f = fn(n) { 1 + f(n + 1) }; f(0);")
+
+    assert isinstance(result, Error)
+    assert result.message == "maximum recursion depth exceeded"
+
+
+def test_interpreter_parses_in_several_threads():
+    interpreter = Interpreter("vm")
+    results = {}
+
+    def work(index):
+        results[index] = [interpreter.exec(f"{index} * {value}").value for value in range(50)]
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {index: [index * value for value in range(50)] for index in range(4)}
+
+
+LOOP = "let loop = fn(n) { loop(n + 1) }; loop(0);"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_evaluates_without_blocking(engine):
+    interpreter = Interpreter(engine)
+    prepared = interpreter.prepare("let f = fn(n) { if (n < 1) { 0 } else { n + f(n - 1) } }; f(x);")
+
+    result = asyncio.run(interpreter.run(prepared, steps_per_yield=10, x=100))
+
+    assert result.value == 5050
+
+
+def test_run_stops_at_the_step_budget():
+    result = asyncio.run(Interpreter().run(LOOP, step_budget=5000, steps_per_yield=1000))
+
+    assert isinstance(result, ResourceExhausted)
+    assert result.message == "step budget of 5000 exceeded"
+
+
+def test_run_stops_at_the_timeout_and_lets_other_tasks_run():
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def main():
+        task = asyncio.create_task(ticker())
+        result = await Interpreter().run(LOOP, timeout=0.05, steps_per_yield=100)
+        task.cancel()
+        return result
+
+    result = asyncio.run(main())
+
+    assert isinstance(result, Error)
+    assert result.message == "timed out after 0.05 seconds"
+    assert len(ticks) > 1
+
+
+def test_run_can_be_cancelled():
+    async def main():
+        task = asyncio.create_task(Interpreter().run(LOOP))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+
+def test_run_in_a_sandbox():
+    source = "let f = fn(n) { n * f(n + 1) }; f(1);"
+
+    result = asyncio.run(Interpreter().run(source, limits=Limits(depth=20, memory=10 ** 6)))
+
+    assert isinstance(result, ResourceExhausted)
+    assert result.resource == "depth"
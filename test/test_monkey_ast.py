@@ -17,3 +17,34 @@ def test_program_repr(program):
     print()
     data = f"{program}"
     assert data == "let myname =5;\nreturn myname;\n"
+
+
+def test_function_literal_str():
+    from test.test_closures import parse
+
+    assert str(parse("fn(x, y) { x + y };")) == "fn(x, y) { (x + y) }"
+    assert str(parse("let f = fn() { 1 }; f();")) == "let f = fn() { 1 };f()"
+
+
+def test_deep_nesting_prints_without_recursing():
+    import sys
+    from lexer.monkey_lexer import TokenTypes
+
+    depth = sys.getrecursionlimit() * 10
+    node = IntegerLiteral(Token(TokenTypes.INT, "1"), 1)
+    for _ in range(depth):
+        node = PrefixExpression(Token(TokenTypes.MINUS, "-"), "-", node)
+
+    assert str(node) == "(-" * depth + "1" + ")" * depth
+
+
+def test_write_streams_what_str_returns():
+    import io
+    from abstract.printer import write
+    from test.test_closures import parse
+
+    program = parse("let a = if (x < 1) { -x } else { f(x, 2) }; return a;")
+    stream = io.StringIO()
+    write(program, stream)
+
+    assert stream.getvalue() == str(program) == "let a = if (x < 1) { (-x) } else { f(x, 2) };return a;"
@@ -1,10 +1,17 @@
 from lexer.monkey_lexer import Lexer
 from lexer.monkey_lexer import TokenTypes
 from lexer.monkey_lexer import Token
+from lexer.scanner import ScannerLexer
+import pytest
 
 
-def test_lexer_returns_none_on_empty():
-    lexer = Lexer("")
+@pytest.fixture(params=[Lexer, ScannerLexer], ids=["classic", "scanner"])
+def lexer_class(request):
+    return request.param
+
+
+def test_lexer_returns_none_on_empty(lexer_class):
+    lexer = lexer_class("")
     assert lexer.next_token() == Token(TokenTypes.EOF, "")
 
 
@@ -16,9 +23,9 @@ def test_is_letter():
     assert lexer.is_letter(' ') is False
 
 
-def test_lexer_returns_correct_tokens():
+def test_lexer_returns_correct_tokens(lexer_class):
     data = "=+(){},;"
-    lexer = Lexer(data)
+    lexer = lexer_class(data)
 
     assert lexer.next_token() == Token(TokenTypes.ASSIGN, "=")
     assert lexer.next_token() == Token(TokenTypes.PLUS, "+")
@@ -31,9 +38,9 @@ def test_lexer_returns_correct_tokens():
     assert lexer.next_token() == Token(TokenTypes.EOF, "")
 
 
-def test_lexer_parses_bare_monkey_syntax():
+def test_lexer_parses_bare_monkey_syntax(lexer_class):
     data = "let five = 5;"
-    lexer = Lexer(data)
+    lexer = lexer_class(data)
 
     assert lexer.next_token() == Token(TokenTypes.LET, "let")
     assert lexer.next_token() == Token(TokenTypes.IDENT, "five")
@@ -43,7 +50,7 @@ def test_lexer_parses_bare_monkey_syntax():
     assert lexer.next_token() == Token(TokenTypes.EOF, "")
 
 
-def test_lexer_parses_minimum_monkey_syntax():
+def test_lexer_parses_minimum_monkey_syntax(lexer_class):
     data = """let five = 5;
 let ten = 10;
    let add = fn(x, y) {
@@ -64,7 +71,7 @@ let ten = 10;
    10 != 9;
    """
 
-    lexer = Lexer(data)
+    lexer = lexer_class(data)
 
     assert lexer.next_token() == Token(TokenTypes.LET, "let")
     assert lexer.next_token() == Token(TokenTypes.IDENT, "five")
@@ -148,7 +155,16 @@ let ten = 10;
     assert lexer.next_token() == Token(TokenTypes.SEMICOLON, ";")
 
     assert lexer.next_token() == Token(TokenTypes.INT, "10")
-    assert lexer.next_token() == Token(TokenTypes.NOT_EQ, "==")
+    assert lexer.next_token() == Token(TokenTypes.NOT_EQ, "!=")
     assert lexer.next_token() == Token(TokenTypes.INT, "9")
     assert lexer.next_token() == Token(TokenTypes.SEMICOLON, ";")
     assert lexer.next_token() == Token(TokenTypes.EOF, "")
+
+
+def test_lexer_moves_past_illegal_characters(lexer_class):
+    lexer = lexer_class("5 @ 5")
+
+    assert lexer.next_token() == Token(TokenTypes.INT, "5")
+    assert lexer.next_token() == Token(TokenTypes.ILLEGAL, "@")
+    assert lexer.next_token() == Token(TokenTypes.INT, "5")
+    assert lexer.next_token() == Token(TokenTypes.EOF, "")
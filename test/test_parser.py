@@ -1,5 +1,7 @@
-from parser import Parser
-from lexer.monkey_lexer import Lexer
+import io
+
+from parser import Parser, TracingParser
+from lexer.monkey_lexer import Lexer, TokenTypes
 from abstract.monkey_ast import Statement, LetStatement, ReturnStatement, \
     ExpressionStatement, Identifier, IntegerLiteral, PrefixExpression, InfixExpression, IfExpression, \
     FunctionLiteral, CallExpression
@@ -325,3 +327,166 @@ def test_call_expression():
 
     assert str(statement._expression._args[0]) == '1'
     assert str(statement._expression._args[1]) == '(2 * 3)'
+
+
+def test_statement_after_let_is_parsed():
+    program = Parser.new(Lexer("let x = 5; x; let y = x;")).parse()
+
+    assert [str(statement) for statement in program._statements] == ["let x = 5;", "x", "let y = x;"]
+
+
+def test_nodes_carry_source_offsets():
+    lexer = Lexer("foo(x) + 10;\nlet x = 5;")
+    program = Parser.new(lexer).parse()
+
+    statement, let = program._statements
+    assert statement._offset == 0
+    assert statement._expression._offset == 7
+    assert statement._expression._left._offset == 3
+    assert statement._expression._left._args[0]._offset == 4
+    assert statement._expression._right._offset == 9
+    assert let._offset == 13
+    assert let._name._offset == 17
+    assert let._value._offset == 21
+
+
+def test_parse_errors_report_source_location():
+    lexer = Lexer("y;\nlet x = ;", filename="test.mk")
+    parser = Parser.new(lexer)
+    parser.parse()
+
+    assert len(parser.errors) == 1
+    assert parser.errors[0].startswith("test.mk:2:9: ")
+
+
+@pytest.mark.parametrize("input_data, error", [
+    ("add(1, 2", "test.mk:1:9: expected next token to be ), got EOF instead"),
+    ("let f = fn(x { x }; f(1)", "test.mk:1:14: expected next token to be ), got { instead"),
+])
+def test_unclosed_argument_and_parameter_lists_are_errors(input_data, error):
+    for parser in [Parser.new(Lexer(input_data, filename="test.mk")),
+                   Parser.from_buffer(Lexer(input_data, filename="test.mk").tokenize_all())]:
+        parser.parse()
+        assert parser.errors == [error]
+
+
+def test_parser_is_not_traced_by_default(monkeypatch):
+    monkeypatch.delenv("MONKEY_TRACE_PARSER", raising=False)
+
+    assert type(Parser.new(Lexer("1 + 2;"))) is Parser
+    assert Parser.parseExpression.__qualname__ == "Parser.parseExpression"
+
+
+def test_tracing_parser(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(TracingParser.trace, "stream", stream)
+    monkeypatch.setenv("MONKEY_TRACE_PARSER", "1")
+
+    parser = Parser.new(Lexer("1 + 2;"))
+    program = parser.parse()
+
+    assert isinstance(parser, TracingParser)
+    assert str(program) == "(1 + 2)"
+    assert "BEGIN parse_infix_expression(1)" in stream.getvalue()
+
+
+def test_reset_parses_another_program_with_the_same_parser():
+    parser = Parser.new(Lexer("let x = ;"))
+    parser.parse()
+    assert len(parser.errors) == 1
+
+    parser.reset(Lexer("1 + 2; -x;"))
+    program = parser.parse()
+    assert parser.errors == []
+    assert str(program) == "(1 + 2)(-x)"
+
+
+def test_parse_functions_are_registered_once_per_class(monkeypatch):
+    monkeypatch.delenv("MONKEY_TRACE_PARSER", raising=False)
+    first, second = Parser.new(Lexer("1;")), Parser.new(Lexer("2;"))
+
+    assert first.prefix_parsers is second.prefix_parsers is Parser.prefix_parsers
+    assert "prefix_parsers" not in vars(first)
+    assert Parser.infix_parsers[TokenTypes.PLUS] is Parser.parse_infix_expression
+    # a subclass's tables hold the functions it overrides
+    assert TracingParser.infix_parsers[TokenTypes.PLUS] is TracingParser.parse_infix_expression
+    assert TracingParser.infix_parsers[TokenTypes.PLUS] is not Parser.parse_infix_expression
+
+
+def node_offsets(program):
+    from abstract.monkey_ast import iter_children
+
+    offsets, stack = [], [program]
+    while stack:
+        node = stack.pop()
+        offsets.append((node.__class__.__name__, node._offset))
+        stack.extend(reversed(list(iter_children(node))))
+    return offsets
+
+
+def edit_and_compare(source, offset, removed, inserted):
+    """ Parser.reparse's program and errors for the edit, checked against parsing the edited source """
+    parser = Parser.new(Lexer(source))
+    program = parser.reparse(parser.parse(), offset, removed, inserted)
+
+    expected = Parser.new(Lexer(source[:offset] + inserted + source[offset + removed:]))
+    expected_program = expected.parse()
+    assert str(program) == str(expected_program)
+    assert node_offsets(program) == node_offsets(expected_program)
+    assert parser.errors == expected.errors
+    return program, parser.errors
+
+
+def test_reparse_reuses_statements_away_from_the_edit():
+    source = "let a = 1;\nlet b = 2;\nlet c = 3;\nlet d = a + b;\nlet e = c * d;\n"
+    parser = Parser.new(Lexer(source))
+    program = parser.parse()
+    old = list(program._statements)
+
+    edited = parser.reparse(program, source.index("3"), 1, "300")
+    assert str(edited) == "let a = 1;let b = 2;let c = 300;let d = (a + b);let e = (c * d);"
+    assert edited._statements[0] is old[0]
+    assert edited._statements[1] is not old[1]
+    assert edited._statements[3:] == old[3:]
+    # the statements after the edit moved along with the source
+    assert edited._statements[4]._value._right._offset == source.index("d;") + 2
+    assert edited._source_map.text == source.replace("3", "300")
+
+
+@pytest.mark.parametrize("source, offset, removed, inserted", [
+    ("let a = 1;\n-x;\n", 9, 1, ""),        # the next statement joins the let
+    ("x\n!y;\n", 1, 0, "a"),                  # a token grows at the start of the edit
+    ("a;\nb;\nc;\n", 0, 0, "  "),
+    ("a;\nb;\nc;\n", 9, 0, "d;"),
+    ("f(1);\ng(2);\n", 4, 3, ""),
+    ("let a = 1;\nlet b = 2;\n", 11, 3, "let"),
+])
+def test_reparse_is_what_parsing_the_edited_source_is(source, offset, removed, inserted):
+    edit_and_compare(source, offset, removed, inserted)
+
+
+def test_reparse_of_random_edits():
+    import random
+
+    pieces = ["let a = 1;", "let b = a + 2\n", "f(a, b);", "-y\n", "if (a < b) { a } else { b };", "!c",
+              "let f = fn(x, y) { x * y };", "return a;", " ", "\n"]
+    rng = random.Random(1)
+    for _ in range(300):
+        source = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 10)))
+        offset = rng.randint(0, len(source))
+        removed = rng.randint(0, min(3, len(source) - offset))
+        inserted = "".join(rng.choice("ab1 \n;+-(") for _ in range(rng.randint(0, 3)))
+        edit_and_compare(source, offset, removed, inserted)
+
+
+def test_reparse_of_a_program_with_errors_parses_it_all():
+    parser = Parser.new(Lexer("let = 1;\nlet b = 2;\n"))
+    program = parser.parse()
+    assert program._errors
+
+    edited, errors = edit_and_compare("let = 1;\nlet b = 2;\n", 4, 0, "a ")
+    assert errors == []
+    assert str(edited) == "let a = 1;let b = 2;"
+
+    with pytest.raises(ValueError):
+        parser.reparse(program, 5, 100, "")
@@ -4,24 +4,133 @@ from lexer.monkey_lexer import Lexer
 from parser import Parser
 from test.test_parser import check_parse_errors
 from evaluator import eval
+from evaluator.object import Error
 
 
-@pytest.mark.parametrize("input_data, expected_val", [("5;", 5),
-                                                      ("10;", 10),
-                                                      ("-5;", -5),
-                                                      ("-10;", -10),
-                                                      ("5 + 5 + 5 + 5 - 10;", 10),
-                                                      ("2 * 2 * 2 * 2 * 2;", 32),
-                                                      ("-50 + 100 + -50;", 0),
-                                                      ("5 * 2 + 10;", 20),
-                                                      ("5 + 2 * 10;", 25),
-                                                      ("20 + 2 * -10;", 0),
-                                                      ("50 / 2 * 2 + 10;", 60),
-                                                      ("2 * (5 + 10);", 30),
-                                                      ("3 * 3 * 3 + 10;", 37),
-                                                      ("3 * (3 * 3) + 10;", 37),
-                                                      ("(5 + 10 * 2 + 15 / 3) * 2 + -10;", 50),
-                                                      ])
+INTEGER_CASES = [
+    ("5;", 5),
+    ("10;", 10),
+    ("-5;", -5),
+    ("-10;", -10),
+    ("5 + 5 + 5 + 5 - 10;", 10),
+    ("2 * 2 * 2 * 2 * 2;", 32),
+    ("-50 + 100 + -50;", 0),
+    ("5 * 2 + 10;", 20),
+    ("5 + 2 * 10;", 25),
+    ("20 + 2 * -10;", 0),
+    ("50 / 2 * 2 + 10;", 60),
+    ("2 * (5 + 10);", 30),
+    ("3 * 3 * 3 + 10;", 37),
+    ("3 * (3 * 3) + 10;", 37),
+    ("(5 + 10 * 2 + 15 / 3) * 2 + -10;", 50),
+]
+
+BOOLEAN_CASES = [
+    ("true;", True),
+    ("false;", False),
+    ("true == true;", True),
+    ("false == false;", True),
+    ("true == false;", False),
+    ("true != false;", True),
+    ("false != true;", True),
+    ("1 < 2;", True),
+    ("1 > 2;", False),
+    ("1 < 1;", False),
+    ("1 > 1;", False),
+    ("1 == 1;", True),
+    ("1 != 1;", False),
+    ("1 == 2;", False),
+    ("1 != 2;", True),
+]
+
+BANG_CASES = [
+    ("!true;", False),
+    ("!false;", True),
+    ("!!true;", True),
+    ("!!false;", False),
+    ("!5;", False),
+]
+
+IF_ELSE_CASES = [
+    ("if (true) { 10 }", 10),
+    ("if (false) { 10 }", "null"),
+    ("if (1) { 10 }", 10),
+    ("if (1 < 2) { 10 }", 10),
+    ("if (1 > 2) { 10 }", "null"),
+    ("if (1 > 2) { 10 } else { 20 }", 20),
+    ("if (1 < 2) { 10 } else { 20 }", 10),
+]
+
+LET_CASES = [
+    ("let a = 5; a;", 5),
+    ("let a = 5 * 5; a;", 25),
+    ("let a = 5; let b = a; b;", 5),
+    ("let a = 5; let b = a; let c = a + b + 5; c;", 15),
+    ("let a = 1; let a = a + 1; a", 2),
+    ("if (true) { let a = 10; }; a", 10),
+    ("let a = 5;", "null"),
+    ("let a = 5; if (a > 1) { let b = a * 2 }", "null"),
+]
+
+FUNCTION_CASES = [
+    ("let identity = fn(x) { x; }; identity(5);", 5),
+    ("let double = fn(x) { x * 2; }; double(5);", 10),
+    ("let add = fn(x, y) { x + y; }; add(5, 5);", 10),
+    ("let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));", 20),
+    ("fn(x) { x; }(5)", 5),
+    ("let five = fn() { 5 }; five()", 5),
+    ("let nothing = fn() { }; nothing()", "null"),
+    ("let f = fn(x) { let y = x * 2; y + 1 }; f(3)", 7),
+    ("let x = 10; let f = fn(x) { x }; f(1) + x", 11),
+    ("let adder = fn(x) { fn(y) { x + y } }; let addtwo = adder(2); addtwo(3);", 5),
+    ("let f = fn(a) { fn(b) { fn(c) { a + b + c } } }; f(1)(2)(3)", 6),
+    ("let f = fn(x) { let g = fn() { x }; let x = x * 10; g() }; f(4)", 40),
+    ("let counter = fn(x) { if (x > 20) { true } else { counter(x + 1) } }; counter(0)", True),
+    ("let f = fn() { let loop = fn(n) { if (n > 0) { loop(n - 1) } else { 42 } }; loop(10) }; f()", 42),
+    ("let f = fn() { g() }; let g = fn() { 3 }; f()", 3),
+    ("let f = fn() { let g = fn() { h() }; let h = fn() { 7 }; g() }; f()", 7),
+    ("let h = fn() { 1 }; let f = fn() { let g = fn() { h() }; let h = fn() { 7 }; g() }; f()", 7),
+    ("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(10)", 55),
+    ("fn(x) { x }", "fn(x) { x }"),
+]
+
+RETURN_CASES = [
+    ("return 10;", 10),
+    ("return 10; 9;", 10),
+    ("9; return 2 * 5; 9;", 10),
+    ("if (10 > 1) { return 10; } 1;", 10),
+    ("if (10 > 1) { if (10 > 1) { return 10; } return 1; }", 10),
+    ("let f = fn(x) { return x; x + 10; }; f(10);", 10),
+    ("let f = fn(x) { if (x > 1) { return 1 + 1; 9 } 3 }; f(2) + f(0);", 5),
+    ("let f = fn(x) { 1 + if (x) { return 10; } else { 2 } }; f(true) * 100 + f(false);", 1003),
+    ("let f = fn(n) { let g = fn() { return n; 0 }; g() + 1 }; f(4);", 5),
+    ("let f = fn() { return; }; f();", "null"),
+    ("let f = fn(n) { if (n == 0) { return 7; } return f(n - 1); }; f(20);", 7),
+]
+
+ERROR_CASES = [
+    ("5 + true;", "type mismatch: Integer + Boolean"),
+    ("5 + true; 5;", "type mismatch: Integer + Boolean"),
+    ("-true", "unknown operator: -Boolean"),
+    ("true + false;", "unknown operator: Boolean + Boolean"),
+    ("5; true + false; 5", "unknown operator: Boolean + Boolean"),
+    ("if (10 > 1) { true + false; }", "unknown operator: Boolean + Boolean"),
+    ("-(true + false) + 5", "unknown operator: Boolean + Boolean"),
+    ("10 / (5 - 5);", "division by zero"),
+    ("foobar", "identifier not found: foobar"),
+    ("a; let a = 1;", "identifier not found: a"),
+    ("if (false) { let a = 1; }; a", "identifier not found: a"),
+    ("let a = a;", "identifier not found: a"),
+    ("5(1)", "not a function: Integer"),
+    ("let f = fn(x) { x }; f()", "wrong number of arguments: want=1, got=0"),
+    ("let f = fn() { y; let y = 1; }; f()", "identifier not found: y"),
+    ("let f = fn(x) { x + true }; f(1)", "type mismatch: Integer + Boolean"),
+    ("let f = fn(x) { x }; f(1 / 0)", "division by zero"),
+    ("let f = fn(x) { return x + true; }; f(1);", "type mismatch: Integer + Boolean"),
+]
+
+
+@pytest.mark.parametrize("input_data, expected_val", INTEGER_CASES)
 def test_eval_integer_expression(input_data, expected_val):
     lexer = Lexer(input_data)
     parser = Parser.new(lexer)
@@ -32,23 +141,7 @@ def test_eval_integer_expression(input_data, expected_val):
     assert output.value == expected_val
 
 
-@pytest.mark.parametrize("input_data, expected_val", [
-                                                      ("true;", True),
-                                                      ("false;", False),
-                                                      ("true == true;", True),
-                                                      ("false == false;", True),
-                                                      ("true == false;", False),
-                                                      ("true != false;", True),
-                                                      ("false != true;", True),
-                                                      ("1 < 2;", True),
-                                                      ("1 > 2;", False),
-                                                      ("1 < 1;", False),
-                                                      ("1 > 1;", False),
-                                                      ("1 == 1;", True),
-                                                      ("1 != 1;", False),
-                                                      ("1 == 2;", False),
-                                                      ("1 != 2;", True),
-                                                      ])
+@pytest.mark.parametrize("input_data, expected_val", BOOLEAN_CASES)
 def test_eval_boolean_expression(input_data, expected_val):
     lexer = Lexer(input_data)
     parser = Parser.new(lexer)
@@ -62,13 +155,7 @@ def test_eval_boolean_expression(input_data, expected_val):
         assert output == expected_val
 
 
-@pytest.mark.parametrize("input_data, expected_val", [
-                                                      ("!true;", False),
-                                                      ("!false;", True),
-                                                      ("!!true;", True),
-                                                      ("!!false;", False),
-                                                      ("!5;", False)
-                                                      ])
+@pytest.mark.parametrize("input_data, expected_val", BANG_CASES)
 def test_bang_operator(input_data, expected_val):
     lexer = Lexer(input_data)
     parser = Parser.new(lexer)
@@ -79,15 +166,7 @@ def test_bang_operator(input_data, expected_val):
     assert output.value == expected_val
 
 
-@pytest.mark.parametrize("input_data, expected_output", [
-                                                ("if (true) { 10 }", 10),
-                                                ("if (false) { 10 }", "null"),
-                                                ("if (1) { 10 }", 10),
-                                                ("if (1 < 2) { 10 }", 10),
-                                                ("if (1 > 2) { 10 }", "null"),
-                                                ("if (1 > 2) { 10 } else { 20 }", 20),
-                                                ("if (1 < 2) { 10 } else { 20 }", 10),
-                                                       ])
+@pytest.mark.parametrize("input_data, expected_output", IF_ELSE_CASES)
 def test_if_else_expression(input_data, expected_output):
     lexer = Lexer(input_data)
     parser = Parser.new(lexer)
@@ -101,3 +180,70 @@ def test_if_else_expression(input_data, expected_output):
         assert str(output) == expected_output
 
 
+@pytest.mark.parametrize("input_data, expected_output", LET_CASES)
+def test_let_statements(input_data, expected_output):
+    lexer = Lexer(input_data)
+    parser = Parser.new(lexer)
+    program = parser.parse()
+    check_parse_errors(parser)
+
+    output = eval(program)
+    if hasattr(output, "value"):
+        assert output.value == expected_output
+    else:
+        assert str(output) == expected_output
+
+
+@pytest.mark.parametrize("input_data, expected_output", FUNCTION_CASES)
+def test_functions(input_data, expected_output):
+    lexer = Lexer(input_data)
+    parser = Parser.new(lexer)
+    program = parser.parse()
+    check_parse_errors(parser)
+
+    output = eval(program)
+    if hasattr(output, "value"):
+        assert output.value == expected_output
+    else:
+        assert str(output) == expected_output
+
+
+@pytest.mark.parametrize("input_data, expected_output", RETURN_CASES)
+def test_return_statements(input_data, expected_output):
+    lexer = Lexer(input_data)
+    parser = Parser.new(lexer)
+    program = parser.parse()
+    check_parse_errors(parser)
+
+    output = eval(program)
+    if hasattr(output, "value"):
+        assert output.value == expected_output
+    else:
+        assert str(output) == expected_output
+
+
+def test_error_inside_function_reports_its_location():
+    lexer = Lexer("let f = fn(x) {\n  x + true\n};\nf(1)", filename="test.mk")
+    program = Parser.new(lexer).parse()
+
+    assert str(eval(program)) == "test.mk:2:5: ERROR: type mismatch: Integer + Boolean"
+
+
+@pytest.mark.parametrize("input_data, expected_message", ERROR_CASES)
+def test_error_handling(input_data, expected_message):
+    lexer = Lexer(input_data)
+    parser = Parser.new(lexer)
+    program = parser.parse()
+    check_parse_errors(parser)
+
+    output = eval(program)
+    assert isinstance(output, Error)
+    assert output.message == expected_message
+
+
+def test_error_reports_source_location():
+    lexer = Lexer("1;\n\n  5 + true;", filename="test.mk")
+    program = Parser.new(lexer).parse()
+
+    output = eval(program)
+    assert str(output) == "test.mk:3:5: ERROR: type mismatch: Integer + Boolean"
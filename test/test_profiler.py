@@ -0,0 +1,89 @@
+import io
+
+from evaluator import eval, peval
+from evaluator.profiler import Profiler, profile
+from monkey.__main__ import main
+from test.test_closures import parse
+
+FIB = """let fib = fn(n) {
+  if (n < 2) { n } else { fib(n - 1) + fib(n - 2) }
+};
+fib(10);"""
+
+
+def test_profiling_leaves_the_evaluators_as_they_were():
+    before = dict(peval.evaluators)
+
+    with Profiler():
+        assert peval.evaluators != before
+    assert peval.evaluators == before
+
+
+def test_profiled_result_is_the_same():
+    result, _ = profile(parse(FIB))
+    assert str(result) == str(eval(parse(FIB))) == "55"
+
+
+def test_counts_by_class_operator_and_line():
+    _, profiler = profile(parse(FIB))
+
+    # fib(10) makes 177 calls, 88 of which add
+    assert profiler.by_class["CallExpression"].count == 177
+    assert profiler.by_operator["+"].count == 88
+    assert profiler.by_operator["<"].count == 177
+    assert profiler.by_line["test.mk:4"].count == 4
+    assert set(profiler.by_line) == {"test.mk:1", "test.mk:2", "test.mk:4"}
+
+
+def test_cumulative_time_counts_recursion_once():
+    _, profiler = profile(parse(FIB))
+    program = profiler.by_class["Program"]
+
+    for timing in profiler.by_class.values():
+        assert timing.own <= timing.cumulative <= program.cumulative
+    assert sum(timing.own for timing in profiler.by_class.values()) <= program.cumulative
+
+
+def test_collapsed_stacks_follow_calls():
+    program = parse("let twice = fn(f, x) { f(f(x)) }; twice(fn(x) { x * 2 }, 1);")
+    _, profiler = profile(program)
+
+    frames = {frames for frames, name in profiler.stacks}
+    assert frames == {"<program>", "<program>;twice", "<program>;twice;fn@test.mk:1"}
+
+    profiler.stacks = {key: 5000 for key in profiler.stacks}
+    stream = io.StringIO()
+    profiler.collapsed(stream)
+    assert "<program>;twice;fn@test.mk:1;InfixExpression 5\n" in stream.getvalue()
+
+
+def test_report():
+    _, profiler = profile(parse(FIB))
+    stream = io.StringIO()
+    profiler.report(stream)
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0].split() == ["node", "count", "cumul.", "ms", "self", "ms"]
+    assert any(line.startswith("test.mk:2 ") for line in lines)
+
+
+def test_profile_command(tmp_path, capsys):
+    script = tmp_path / "fib.mk"
+    script.write_text(FIB)
+    collapsed = tmp_path / "fib.folded"
+
+    assert main(["profile", str(script), "--collapsed", str(collapsed)]) == 0
+    output = capsys.readouterr().out
+    assert output.startswith("55\n")
+    assert "profiled with the eval engine" in output
+    assert "InfixExpression" in output
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.read_text().splitlines())
+
+
+def test_profile_command_survives_recursion_too_deep_for_eval(tmp_path, capsys):
+    script = tmp_path / "deep.mk"
+    script.write_text("let f = fn(n) { if (n < 1) { 0 } else { f(n - 1) } }; f(10000);")
+
+    assert main(["profile", str(script)]) == 1
+    assert capsys.readouterr().out == "ERROR: maximum recursion depth exceeded\n"
+    assert peval.instrumented_by is None
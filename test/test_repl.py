@@ -0,0 +1,37 @@
+import pytest
+
+from monkey import Interpreter
+from monkey.cache import ProgramCache
+from repl import evaluate
+
+
+@pytest.fixture()
+def session():
+    return Interpreter().session()
+
+
+def test_lines_share_the_session(session, tmp_path):
+    cache = ProgramCache(str(tmp_path / "cache"))
+    library = tmp_path / "library.mk"
+    library.write_text("let square = fn(x) { x * x };")
+
+    assert evaluate(session, f":load {library}", cache) == "null"
+    assert evaluate(session, "let y = square(4);", cache) == "null"
+    assert evaluate(session, "y + 1", cache) == "17"
+
+
+def test_errors_are_reported_and_the_session_carries_on(session, tmp_path, monkeypatch):
+    cache = ProgramCache(str(tmp_path / "cache"))
+    missing = tmp_path / "missing.mk"
+
+    assert evaluate(session, "let x = ;", cache).startswith("<stdin>:1:9: ")
+    assert evaluate(session, f":load {missing}", cache) == f"{missing}: No such file or directory"
+    assert evaluate(session, ":load", cache) == "usage: :load FILE"
+    assert evaluate(session, ":quit", cache) == "unknown command: :quit"
+
+    def broken(source, filename="<input>"):
+        raise TypeError("broken")
+    monkeypatch.setattr(session, "prepare", broken)
+    assert evaluate(session, "1", cache) == "ERROR: TypeError: broken"
+    monkeypatch.undo()
+    assert evaluate(session, "2 * 3", cache) == "6"
@@ -0,0 +1,142 @@
+import pytest
+
+from abstract.monkey_ast import FunctionLiteral, Identifier, iter_children
+from compiler import compile as compile_bytecode
+from evaluator import eval, compile
+from evaluator.environment import Cell, Environment, FramePool
+from evaluator.object import Integer
+from evaluator.resolver import LOCAL, GLOBAL, CELL, FREE, Scope, resolve
+from vm import VM
+from test.test_closures import parse
+
+
+def identifiers(node):
+    """ every Identifier below node, in source order """
+    if isinstance(node, Identifier):
+        yield node
+    for child in iter_children(node):
+        yield from identifiers(child)
+
+
+def resolved(input_data):
+    program = parse(input_data)
+    resolve(program)
+    return program
+
+
+def locations(program):
+    return [(identifier._value, identifier._kind, identifier._slot) for identifier in identifiers(program)]
+
+
+def function_literals(node):
+    if isinstance(node, FunctionLiteral):
+        yield node
+    for child in iter_children(node):
+        yield from function_literals(child)
+
+
+def test_globals_get_a_slot_each():
+    assert locations(resolved("let a = 1; let b = 2; a + b; let a = 3;")) == [
+        ("a", GLOBAL, 0), ("b", GLOBAL, 1), ("a", GLOBAL, 0), ("b", GLOBAL, 1), ("a", GLOBAL, 0)]
+
+
+def test_parameters_and_lets_are_locals():
+    program = resolved("let a = 1; fn(b, c) { let d = a; b + c + d }")
+
+    assert locations(program) == [
+        ("a", GLOBAL, 0), ("b", LOCAL, 0), ("c", LOCAL, 1), ("d", LOCAL, 2), ("a", GLOBAL, 0),
+        ("b", LOCAL, 0), ("c", LOCAL, 1), ("d", LOCAL, 2)]
+    literal, = function_literals(program)
+    assert (literal._scope_size, literal._cells, literal._free) == (3, (), ())
+
+
+def test_only_captured_variables_become_cells():
+    program = resolved("fn(a, b) { let c = a; fn(d) { b + d } }")
+
+    assert locations(program) == [
+        ("a", LOCAL, 0), ("b", CELL, 1), ("c", LOCAL, 2), ("a", LOCAL, 0), ("d", LOCAL, 0),
+        ("b", FREE, 0), ("d", LOCAL, 0)]
+    outer, inner = function_literals(program)
+    assert outer._cells == (1,)
+    assert inner._free == ((CELL, 1),)
+
+
+def test_free_variables_pass_through_intermediate_functions():
+    program = resolved("fn(a) { fn(b) { fn(c) { a } } }")
+
+    outer, middle, inner = function_literals(program)
+    assert outer._cells == (0,)
+    assert middle._free == ((CELL, 0),)
+    assert inner._free == ((FREE, 0),)
+
+
+def test_function_literal_can_refer_to_itself():
+    assert locations(resolved("fn(x) { let f = fn(y) { f } }")) == [
+        ("x", LOCAL, 0), ("f", CELL, 1), ("y", LOCAL, 0), ("f", FREE, 0)]
+
+
+def test_names_declared_later_are_globals():
+    assert locations(resolved("fn(x) { g }; let g = 1;")) == [("x", LOCAL, 0), ("g", GLOBAL, 0), ("g", GLOBAL, 0)]
+
+
+def test_lets_further_down_a_function_body_are_its_locals():
+    # h is the local declared after g, not a global, even with a global h about
+    assert locations(resolved("let h = 1; fn() { let g = fn() { h }; if (true) { let h = 2; } }")) == [
+        ("h", GLOBAL, 0), ("g", LOCAL, 0), ("h", FREE, 0), ("h", CELL, 1)]
+
+
+def test_frame_pool_recycles_frames():
+    pool = FramePool(3, cells=(1,))
+    globals = []
+
+    frame = pool.acquire([Integer(1), Integer(2)], (), globals)
+    assert frame.slots[0] == Integer(1)
+    assert isinstance(frame.slots[1], Cell) and frame.slots[1].value == Integer(2)
+    assert frame.slots[2] is None
+    assert frame.globals is globals
+
+    pool.release(frame)
+    assert frame.slots == [None, None, None]
+    assert pool.acquire([Integer(5), Integer(6)], (), globals) is frame
+
+
+def test_recursive_calls_reuse_frames():
+    program = parse("let f = fn(n) { if (n > 0) { f(n - 1) } else { 0 } }; f(10)")
+    eval(program)
+
+    literal, = function_literals(program)
+    assert len(literal._frames.frames) == 11
+
+
+@pytest.mark.parametrize("run", [
+    lambda program, env: eval(program, env),
+    lambda program, env: compile(program)(env),
+])
+def test_globals_carry_over_between_programs(run):
+    scope, env = Scope(), Environment()
+    first, second = parse("let a = 5; let b = 2;"), parse("a * b")
+    resolve(first, scope)
+    resolve(second, scope)
+
+    run(first, env)
+    assert run(second, env).value == 10
+
+
+def test_vm_globals_carry_over_between_programs():
+    scope, globals = Scope(), []
+    first, second = parse("let a = 5; let b = 2;"), parse("a * b")
+    resolve(first, scope)
+    resolve(second, scope)
+
+    VM(compile_bytecode(first), globals).run()
+    assert VM(compile_bytecode(second), globals).run().value == 10
+
+
+def test_vm_function_of_an_earlier_program_uses_its_own_constants():
+    scope, globals = Scope(), []
+    first, second = parse("let f = fn(x) { x + 100 };"), parse("7; f(1)")
+    resolve(first, scope)
+    resolve(second, scope)
+
+    VM(compile_bytecode(first), globals).run()
+    assert VM(compile_bytecode(second), globals).run().value == 101
@@ -0,0 +1,93 @@
+import subprocess
+import sys
+
+import pytest
+
+from monkey.cache import ProgramCache
+from monkey.runner import Result, Runner, engines, run_many
+
+PROGRAMS = ["1 + 2", "let f = fn(n) { n * 2 }; f(21);", "1 + true", "let x = ;", ""]
+EXPECTED = [Result(True, "3"), Result(True, "42"),
+            Result(False, "<input>:1:3: ERROR: type mismatch: Integer + Boolean"),
+            Result(False, "<input>:1:9: No Prefix Parser not found to for token type : Token(type=';', literal=';')"),
+            Result(True, "null")]
+
+
+@pytest.mark.parametrize("engine", ["eval", "stack", "closures", "vm"])
+def test_runner_runs_sources(engine):
+    runner = Runner(engine)
+    assert [runner.run_source(source) for source in PROGRAMS] == EXPECTED
+
+
+def test_runner_runs_files_through_the_cache(tmp_path):
+    script = tmp_path / "script.mk"
+    script.write_text("let f = fn(n) { n * 2 }; f(21);")
+    cache = ProgramCache(str(tmp_path / "cache"))
+    runner = Runner("eval", cache)
+
+    assert runner.run_file(str(script)) == Result(True, "42")
+    assert runner.run_file(str(script)) == Result(True, "42")
+    assert (cache.hits, cache.misses) == (1, 1)
+    missing = str(tmp_path / "missing.mk")
+    assert runner.run_file(missing) == Result(False, f"{missing}: No such file or directory")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_many_keeps_the_input_order(workers):
+    programs = [f"{value} * 2" for value in range(50)]
+    results = list(run_many(programs, files=False, workers=workers, chunksize=3))
+
+    assert [result.output for result in results] == [str(value * 2) for value in range(50)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_many_survives_a_program_too_deep_for_the_engine(workers):
+    deep = "let f = fn(n) { if (n == 0) { 0 } else { 1 + f(n - 1) } }; f(5000)"
+    results = list(run_many(["1 + 1", deep, "2 + 2"], files=False, engine="eval", workers=workers))
+
+    assert results == [Result(True, "2"), Result(False, "ERROR: maximum recursion depth exceeded"),
+                       Result(True, "4")]
+
+
+def test_run_many_survives_a_script_which_breaks(tmp_path, monkeypatch):
+    good, bad = tmp_path / "good.mk", tmp_path / "bad.mk"
+    good.write_text("1 + 1")
+    bad.write_bytes(b"let x = \xff;")
+    paths = [str(good), str(bad), str(good)]
+
+    results = list(run_many(paths, workers=2, chunksize=1))
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].output.startswith(f"{bad}: 'utf-8' codec can't decode")
+
+    # whatever goes wrong in a run is the Result of that script alone
+    def broken(program):
+        raise TypeError("broken engine")
+    monkeypatch.setitem(engines, "eval", broken)
+    assert list(run_many(["1", "2"], files=False, engine="eval", workers=1)) == [
+        Result(False, "<input>: TypeError: broken engine")] * 2
+
+
+def test_run_many_files(tmp_path):
+    paths = []
+    for index, source in enumerate(PROGRAMS):
+        path = tmp_path / f"{index}.mk"
+        path.write_text(source)
+        paths.append(str(path))
+
+    results = list(run_many(paths, workers=2, chunksize=2, cache_directory=str(tmp_path / "cache")))
+    assert [result.ok for result in results] == [result.ok for result in EXPECTED]
+    assert results[2].output == f"{paths[2]}:1:3: ERROR: type mismatch: Integer + Boolean"
+
+
+def test_command_line(tmp_path):
+    script = tmp_path / "script.mk"
+    script.write_text("let f = fn(n) { n * 2 }; f(21);")
+    command = [sys.executable, "-m", "monkey"]
+
+    run = subprocess.run(command + ["run", "--no-cache", str(script)], capture_output=True, text=True)
+    assert (run.returncode, run.stdout) == (0, "42\n")
+
+    many = subprocess.run(command + ["run-many", "--no-cache", "--workers", "2"], input="1 + 1\n2 * true\n3\n",
+                          capture_output=True, text=True)
+    assert many.returncode == 1
+    assert many.stdout.splitlines() == ["2", "<input>:1:3: ERROR: type mismatch: Integer * Boolean", "3"]
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from lexer import new_lexer
+from lexer.monkey_lexer import Lexer
+from lexer.scanner import ScannerLexer
+
+FRAGMENTS = ["let", "fn", "if", "else", "return", "true", "false", "letter", "_x", "Foo",
+             "0", "42", "007", "=", "==", "!", "!=", "+", "-", "*", "/", "<", ">",
+             "(", ")", "{", "}", ",", ";", " ", "\t", "\n", "\r", "@", "#", "\x0b", "é", "²", "٣"]
+
+
+def random_program(rng, size):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(size))
+
+
+def tokens(lexer):
+    return [(token.type, token.literal) for token in lexer]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_scanner_matches_classic_lexer(seed):
+    rng = random.Random(seed)
+    data = random_program(rng, rng.randint(0, 200))
+
+    assert tokens(ScannerLexer(data)) == tokens(Lexer(data))
+
+
+def test_scanner_keeps_returning_eof():
+    lexer = ScannerLexer("x")
+    lexer.next_token()
+
+    assert lexer.next_token().type == "EOF"
+    assert lexer.next_token().type == "EOF"
+
+
+def test_new_lexer_selects_engine():
+    assert isinstance(new_lexer("x"), Lexer)
+    assert isinstance(new_lexer("x", engine="scanner"), ScannerLexer)
@@ -0,0 +1,78 @@
+import pytest
+
+from abstract.monkey_ast import FunctionLiteral
+from abstract.serialize import MAGIC, SerializeError, dumps, loads, dumps_json, loads_json
+from evaluator import eval
+from lexer.source_map import SourceMap
+from test.test_closures import PEVAL_CASES, parse, assert_same_result
+
+
+def reloaded(input_data):
+    program = loads(dumps(parse(input_data)))
+    program._source_map = SourceMap(input_data, "test.mk")
+    return program
+
+
+@pytest.mark.parametrize("input_data", PEVAL_CASES)
+def test_loaded_program_evaluates_the_same(input_data):
+    assert_same_result(eval(reloaded(input_data)), eval(parse(input_data)))
+
+
+@pytest.mark.parametrize("input_data", PEVAL_CASES)
+def test_dumps_of_loaded_program_is_the_same(input_data):
+    data = dumps(parse(input_data))
+    assert dumps(loads(data)) == data
+
+
+def test_nodes_keep_tokens_and_offsets():
+    program = reloaded("let add = fn(a, b) { a + b };\nadd(1, 2);")
+
+    let, statement = program._statements
+    function = let._value
+    assert isinstance(function, FunctionLiteral)
+    assert [parameter._value for parameter in function._parameters] == ["a", "b"]
+    assert function._token.literal == "fn"
+    assert statement._expression._offset == 33
+    assert str(statement) == "add(1, 2)"
+
+
+def test_tokens_are_shared():
+    program = loads(dumps(parse("1 + 2 + 3;")))
+    infix = program._statements[0]._expression
+    assert infix._token is infix._left._token
+
+
+def test_deep_nesting_does_not_recurse():
+    data = dumps(parse("1" + " + 1" * 5000 + ";"))
+    program = loads(data)
+
+    depth, node = 0, program._statements[0]._expression
+    while node._left is not None and hasattr(node._left, "_left"):
+        depth, node = depth + 1, node._left
+    assert depth == 4999
+    assert dumps(program) == data
+
+
+def test_rejects_other_data():
+    with pytest.raises(SerializeError):
+        loads(b"not a program")
+    with pytest.raises(SerializeError):
+        loads(MAGIC + b"garbage")
+    with pytest.raises(SerializeError):
+        loads(dumps(parse("1 + 2;"))[:-3])
+
+
+@pytest.mark.parametrize("input_data", PEVAL_CASES)
+def test_json_round_trip(input_data):
+    program = parse(input_data)
+    text = dumps_json(program)
+
+    assert dumps_json(loads_json(text)) == text
+    assert str(loads_json(text)) == str(program)
+
+
+def test_json_rejects_other_data():
+    with pytest.raises(SerializeError):
+        loads_json("[]")
+    with pytest.raises(SerializeError):
+        loads_json('{"format": 0, "tokens": [], "records": []}')
@@ -0,0 +1,26 @@
+import pytest
+
+from lexer.scanner import ScannerLexer
+from lexer.source_map import SourceMap
+
+
+@pytest.mark.parametrize("offset, expected", [(0, (1, 1)), (3, (1, 4)), (4, (2, 1)),
+                                              (5, (3, 1)), (7, (3, 3)), (100, (3, 3))])
+def test_position(offset, expected):
+    source_map = SourceMap("let\n\nx;")
+
+    assert source_map.position(offset) == expected
+
+
+def test_location():
+    assert SourceMap("a\nbc", "main.mk").location(3) == "main.mk:2:2"
+
+
+def test_scanner_token_offsets():
+    lexer = ScannerLexer("let  x\n= 5")
+    offsets = []
+    while lexer.next_token().type != "EOF":
+        offsets.append(lexer.token_offset)
+
+    assert offsets == [0, 5, 7, 9]
+    assert lexer.token_offset == 10
@@ -0,0 +1,118 @@
+import pytest
+
+from evaluator import eval, stack_eval
+from evaluator.object import ResourceExhausted
+from evaluator.stack_eval import Evaluation, Limits
+from test.test_closures import PEVAL_CASES, parse
+
+
+@pytest.mark.parametrize("input_data", [case[0] for case in PEVAL_CASES])
+def test_same_result_as_eval(input_data):
+    assert str(stack_eval.eval(parse(input_data))) == str(eval(parse(input_data)))
+
+
+def test_deep_tail_recursion():
+    program = parse("let loop = fn(n) { if (n == 0) { 0 } else { loop(n - 1) } }; loop(100000);")
+    assert str(stack_eval.eval(program)) == "0"
+
+
+def test_tail_recursion_reuses_frames():
+    program = parse("let loop = fn(n) { if (n == 0) { 0 } else { loop(n - 1) } }; loop(1000);")
+    stack_eval.eval(program)
+
+    literal = program._statements[0]._value
+    # the callee's frame is taken before the caller's goes back, so two of them take turns
+    assert len(literal._frames.frames) == 2
+
+
+def test_deep_recursion_which_is_not_a_tail_call():
+    program = parse("let down = fn(n) { if (n == 0) { 0 } else { 1 + down(n - 1) } }; down(50000);")
+    assert str(stack_eval.eval(program)) == "50000"
+
+
+def test_return_of_a_call_is_a_tail_call():
+    program = parse("let f = fn(n) { if (n == 0) { return 7; } return f(n - 1); }; f(100000);")
+    assert str(stack_eval.eval(program)) == "7"
+
+
+@pytest.mark.parametrize("input_data, expected", [
+    ("let f = fn(x) { if (x > 1) { return 1 + 1; 9 } 3 }; f(2) + f(0);", "5"),
+    ("let f = fn() { return 1; 2 }; f() + 10;", "11"),
+    ("return 5; 9;", "5"),
+    ("if (true) { return 2; } 3;", "2"),
+])
+def test_return(input_data, expected):
+    assert str(stack_eval.eval(parse(input_data))) == expected
+
+
+def test_errors_are_located():
+    result = stack_eval.eval(parse("let f = fn(x) { x + true };\nf(1);"))
+    assert str(result) == "test.mk:1:19: ERROR: type mismatch: Integer + Boolean"
+
+
+def test_run_a_few_steps_at_a_time():
+    evaluation = Evaluation(parse("let add = fn(a, b) { a + b }; add(1, 2) * add(3, 4);"))
+
+    runs = 1
+    while not evaluation.run(steps=3):
+        runs += 1
+
+    assert str(evaluation.result) == "21"
+    assert runs > 1
+    assert evaluation.steps <= runs * 3
+    assert evaluation.run(steps=3)
+
+
+def test_steps_are_counted():
+    evaluation = Evaluation(parse("1 + 2;"))
+    evaluation.run()
+
+    assert evaluation.done
+    assert evaluation.steps == 3
+
+
+@pytest.mark.parametrize("input_data", [case[0] for case in PEVAL_CASES])
+def test_sandbox_with_room_to_spare_changes_nothing(input_data):
+    limits = Limits(steps=10 ** 6, memory=10 ** 6, depth=100)
+    assert str(stack_eval.eval(parse(input_data), limits=limits)) == str(eval(parse(input_data)))
+
+
+def test_sandbox_step_limit():
+    result = stack_eval.eval(parse("let loop = fn(n) { loop(n + 1) }; loop(0);"), limits=Limits(steps=10000))
+
+    assert isinstance(result, ResourceExhausted)
+    assert (result.resource, result.limit, result.used) == ("steps", 10000, 10000)
+    assert str(result) == "ERROR: step budget of 10000 exceeded"
+
+
+def test_sandbox_depth_limit():
+    program = parse("let f = fn(n) { 1 + f(n + 1) };\nf(0);")
+    result = stack_eval.eval(program, limits=Limits(depth=50))
+
+    assert isinstance(result, ResourceExhausted)
+    assert (result.resource, result.used) == ("depth", 51)
+    assert str(result) == "test.mk:1:22: ERROR: call depth limit of 50 exceeded"
+
+
+def test_sandbox_depth_limit_leaves_tail_calls_alone():
+    program = parse("let loop = fn(n) { if (n == 0) { 0 } else { loop(n - 1) } }; loop(1000);")
+    assert str(stack_eval.eval(program, limits=Limits(depth=2))) == "0"
+
+
+def test_sandbox_memory_limit_stops_growing_integers():
+    program = parse("let grow = fn(x) { grow(x * x) }; grow(2);")
+    result = stack_eval.eval(program, limits=Limits(memory=100000))
+
+    assert isinstance(result, ResourceExhausted)
+    assert result.resource == "memory"
+    assert result.used > 100000
+
+
+def test_sandbox_memory_counts_functions():
+    program = parse("let make = fn(n) { if (n == 0) { 0 } else { fn() { n }; make(n - 1) } }; make(100);")
+    evaluation = Evaluation(program, limits=Limits(memory=10 ** 6))
+    evaluation.run()
+
+    assert str(evaluation.result) == "0"
+    # the closures, each holding the cell of n, and make itself
+    assert evaluation.allocated == 100 * (stack_eval.FUNCTION_BYTES + 8) + stack_eval.FUNCTION_BYTES
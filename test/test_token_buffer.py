@@ -0,0 +1,59 @@
+import pytest
+
+from lexer.monkey_lexer import Lexer, TokenTypes
+from lexer.scanner import ScannerLexer
+from parser import Parser
+
+PROGRAM = """let five = 5;
+let add = fn(x, y) { x + y; };
+let result = add(five, 10);
+!-/*5; 5 < 10 > 5 @
+if (5 < 10) { return true; } else { return false; }
+10 == 10; 10 != 9;
+"""
+
+
+def lexed(lexer):
+    tokens = []
+    while True:
+        token = lexer.next_token()
+        tokens.append(token)
+        if token.type == TokenTypes.EOF:
+            return tokens
+
+
+@pytest.mark.parametrize("lexer_class", [Lexer, ScannerLexer])
+def test_buffer_holds_the_same_tokens_as_the_lexer(lexer_class):
+    buffer = lexer_class(PROGRAM).tokenize_all()
+
+    assert list(buffer) == lexed(Lexer(PROGRAM))
+
+
+def test_buffer_columns():
+    buffer = Lexer("let x = 10;").tokenize_all()
+
+    assert len(buffer) == 6
+    assert buffer.type(1) == TokenTypes.IDENT
+    assert buffer.literal(3) == "10"
+    assert (buffer.starts[3], buffer.ends[3]) == (8, 10)
+    assert buffer.type(5) == TokenTypes.EOF
+    assert buffer.starts[5] == buffer.ends[5] == 11
+
+
+def test_buffer_cursor_keeps_returning_eof():
+    cursor = Lexer(" x").tokenize_all().cursor()
+
+    assert cursor.next_token().literal == "x"
+    assert cursor.token_offset == 1
+    assert cursor.next_token().type == TokenTypes.EOF
+    assert cursor.next_token().type == TokenTypes.EOF
+    assert cursor.token_offset == 2
+
+
+@pytest.mark.parametrize("data", ["5 + 5 * 2;", "if (x < y) { x } else { y }",
+                                  "add(1, 2 * 3, 4 + 5);", "let y = -(5 + 5);"])
+def test_parser_from_buffer(data):
+    expected = Parser.new(Lexer(data)).parse()
+    program = Parser.from_buffer(Lexer(data).tokenize_all()).parse()
+
+    assert str(program) == str(expected)
@@ -0,0 +1,135 @@
+import io
+import json
+
+import pytest
+
+import vm.vm
+from evaluator import closures, eval, peval, stack_eval
+from evaluator.profiler import Profiler
+from lexer.monkey_lexer import Lexer
+from lexer.scanner import ScannerLexer
+from lexer.token_buffer import BufferCursor
+from monkey.interpreter import Interpreter
+from parser import Parser
+from tracing import Tracer
+
+SOURCE = "let double = fn(x) { x * 2 }; double(3) + 1;"
+
+
+def run(tracer):
+    with tracer:
+        return eval(Parser.new(Lexer(SOURCE)).parse())
+
+
+def test_tracing_puts_everything_back():
+    evaluators, compilers = dict(peval.evaluators), dict(closures.compilers)
+    methods = [Lexer.next_token, ScannerLexer.next_token, BufferCursor.next_token, Parser.parseExpression]
+
+    assert str(run(Tracer())) == "7"
+    assert (peval.evaluators, closures.compilers) == (evaluators, compilers)
+    assert [Lexer.next_token, ScannerLexer.next_token, BufferCursor.next_token, Parser.parseExpression] == methods
+    assert (stack_eval.observer, vm.vm.observer, peval.instrumented_by) == (None, None, None)
+
+
+def test_events_of_every_phase():
+    tracer = Tracer()
+    run(tracer)
+
+    phases = [event[1] for event in tracer.events]
+    assert phases.index("lex") < phases.index("parse") < phases.index("eval")
+    lexed = [event[4:] for event in tracer.events if event[1] == "lex"]
+    assert lexed[:4] == [("LET", 0), ("IDENT", 4), ("=", 11), ("FUNCTION", 13)]
+
+
+def test_events_hold_no_tokens_or_nodes():
+    tracer = Tracer()
+    run(tracer)
+
+    assert all(isinstance(kind, str) and isinstance(offset, int) for *_, kind, offset in tracer.events)
+
+
+def test_tokens_of_a_token_buffer_are_traced():
+    tracer = Tracer(phases=["lex"])
+    with tracer:
+        Parser.from_buffer(Lexer(SOURCE).tokenize_all()).parse()
+        Parser.new(ScannerLexer("x;")).parse()
+
+    names = [(event[2], event[3]) for event in tracer.events]
+    assert names[:2] == [("B", "tokenize"), ("E", "tokenize")]
+    lexed = [event[4:] for event in tracer.events if event[2] == "i"]
+    assert lexed[:2] == [("LET", 0), ("IDENT", 4)]
+    assert lexed[-4:-1] == [("IDENT", 0), (";", 1), ("EOF", 2)]
+
+
+@pytest.mark.parametrize("engine", ["eval", "stack", "closures", "vm"])
+def test_every_engine_is_traced(engine):
+    interpreter = Interpreter(engine=engine)
+    tracer = Tracer(phases=["eval"])
+    with tracer:
+        assert str(interpreter.exec(SOURCE)) == "7"
+
+    evaluated = [event[4:] for event in tracer.events if event[2] != "E"]
+    assert ("CallExpression", 36) in evaluated
+    assert sum(event[2] == "B" for event in tracer.events) == sum(event[2] == "E" for event in tracer.events)
+
+
+def test_only_one_tracer_or_profiler_at_a_time():
+    evaluators = dict(peval.evaluators)
+    profiler = Profiler()
+    tracer = Tracer()
+
+    with tracer:
+        with pytest.raises(RuntimeError):
+            profiler.start()
+        with pytest.raises(RuntimeError):
+            Tracer().start()
+    with profiler:
+        with pytest.raises(RuntimeError):
+            tracer.start()
+    assert peval.evaluators == evaluators
+    assert peval.instrumented_by is None
+
+
+def test_only_the_phases_asked_for_are_traced():
+    tracer = Tracer(phases=["eval"])
+    run(tracer)
+
+    assert {event[1] for event in tracer.events} == {"eval"}
+    with pytest.raises(ValueError):
+        Tracer(phases=["typecheck"])
+
+
+def test_ring_buffer_keeps_the_last_events():
+    tracer = Tracer(capacity=10)
+    run(tracer)
+
+    assert len(tracer.events) == 10
+    # the ends of what began before the buffer are dropped, the rest nests
+    depths = [depth for _, depth in tracer.select()]
+    assert min(depths) >= 0
+
+
+def test_dump_renders_nodes_and_tokens():
+    tracer = Tracer()
+    run(tracer)
+    stream = io.StringIO()
+    tracer.dump(stream, phases=["parse"])
+
+    lines = stream.getvalue().splitlines()
+    assert all(" parse " in line for line in lines)
+    assert "BEGIN statement: LET @0" in lines[0]
+    assert any(line.strip().endswith("END expression: InfixExpression") for line in lines)
+
+
+def test_chrome_trace_events():
+    tracer = Tracer(phases=["parse", "eval"])
+    run(tracer)
+    stream = io.StringIO()
+    tracer.chrome(stream)
+
+    events = json.loads(stream.getvalue())["traceEvents"]
+    assert {event["ph"] for event in events} == {"B", "E"}
+    assert sum(event["ph"] == "B" for event in events) == sum(event["ph"] == "E" for event in events)
+    call = next(event for event in events if event["name"] == "CallExpression")
+    assert (call["cat"], call["args"]) == ("eval", {"offset": 36})
+    assert all(earlier["ts"] <= later["ts"] for earlier, later in zip(events, events[1:]))
@@ -0,0 +1,24 @@
+import pytest
+
+from compiler import compile
+from evaluator import eval
+from vm import VM
+from test.test_closures import PEVAL_CASES, assert_same_result, parse
+
+
+def run(input_data):
+    return VM(compile(parse(input_data))).run()
+
+
+@pytest.mark.parametrize("input_data", PEVAL_CASES)
+def test_vm_agrees_with_eval(input_data):
+    assert_same_result(run(input_data), eval(parse(input_data)))
+
+
+@pytest.mark.parametrize("input_data", ["", "let x = 5;", "(;", "if (1 > 2) { }"])
+def test_vm_handles_unsupported_and_broken_programs(input_data):
+    assert_same_result(run(input_data), eval(parse(input_data)))
+
+
+def test_vm_error_location():
+    assert str(run("1;\n  true + 1")) == "test.mk:2:8: ERROR: type mismatch: Boolean + Integer"
@@ -0,0 +1,235 @@
+"""
+Structured tracing of the lexer, the parser and the evaluator.
+
+    tracer = Tracer(phases=["parse", "eval"])
+    with tracer:
+        eval(Parser.new(Lexer(source)).parse())
+    tracer.dump()                               # an indented text listing
+    tracer.chrome(open("trace.json", "w"))      # for chrome://tracing or Perfetto
+
+trace_helper.TraceCalls writes a line for every call, formatting its
+arguments (whole subtrees of the AST) as it goes. A Tracer keeps a compact
+event instead, a tuple of a timestamp, the phase, the Chrome event type
+and what the event is about, as a kind (a token type or a node class
+name) and a source offset, in a ring buffer holding the last capacity
+events. Events hold no tokens or nodes, so tracing does not keep the
+programs traced alive, and nothing is formatted until they are dumped.
+
+The phases are
+    lex     tokens read by a Lexer, a ScannerLexer or the BufferCursor of a
+            TokenBuffer (instant events), and the whole of tokenize_all
+    parse   statements and expressions parsed by a Parser
+    eval    nodes evaluated by whichever engine runs the program: peval and
+            the closures they were compiled into nest, stack_eval's work
+            items are instant events and the vm has the Monkey calls
+
+Like evaluator.profiler, a Tracer wraps the functions of the phases it
+traces, and sets the observers of stack_eval and the vm, while it is
+active, and puts the originals back once it is done, so tracing off costs
+nothing. Lexers and Parsers made, and closures compiled, while it is
+active are the ones traced. Only one Tracer or Profiler can be active at a
+time (see peval.instrumented_by).
+"""
+import json
+import sys
+import time
+from collections import deque
+from typing import Deque, Iterable, Iterator, Optional, TextIO, Tuple
+
+import vm.vm
+from evaluator import closures, peval, stack_eval
+from lexer import token_buffer
+from lexer.monkey_lexer import Lexer
+from lexer.scanner import ScannerLexer
+from lexer.token_buffer import BufferCursor
+from parser import Parser
+
+PHASES = ("lex", "parse", "eval")
+
+BEGIN = "B"
+END = "E"
+INSTANT = "i"
+
+# (nanoseconds, phase, BEGIN/END/INSTANT, name or None, token type or node class name, source offset or -1)
+Event = Tuple[int, str, str, Optional[str], str, int]
+
+
+class Tracer:
+    def __init__(self, capacity: int = 100000, phases: Iterable[str] = PHASES):
+        self.events: Deque[Event] = deque(maxlen=capacity)
+        self.phases = frozenset(phases)
+        unknown = self.phases - set(PHASES)
+        if unknown:
+            raise ValueError(f"no such phase: {', '.join(sorted(unknown))}")
+        # (object, attribute or key, original value) of everything replaced while active
+        self.originals = None
+
+    def start(self):
+        if self.originals is not None:
+            raise RuntimeError("the tracer is already running")
+        if peval.instrumented_by is not None:
+            raise RuntimeError(f"a {peval.instrumented_by.__class__.__name__} is already running")
+        peval.instrumented_by = self
+        self.originals = []
+        record = self.events.append
+        clock = time.perf_counter_ns
+
+        if "lex" in self.phases:
+            for lexer in [Lexer, ScannerLexer, BufferCursor]:
+                self.replace(lexer, "next_token", self.traced_next_token(lexer.next_token, record, clock))
+            self.replace(token_buffer, "tokenize_all", self.traced_tokenize(token_buffer.tokenize_all, record, clock))
+
+        if "parse" in self.phases:
+            for method, name in [("parse_statement", "statement"), ("parseExpression", "expression")]:
+                self.replace(Parser, method, self.traced_parse(getattr(Parser, method), name, record, clock))
+
+        if "eval" in self.phases:
+            for cls, evaluate in list(peval.evaluators.items()):
+                self.replace(peval.evaluators, cls, self.traced_eval(evaluate, record, clock))
+            for cls, compile in list(closures.compilers.items()):
+                self.replace(closures.compilers, cls, self.traced_compile(compile, record, clock))
+            self.replace(stack_eval, "observer",
+                         lambda node: record((clock(), "eval", INSTANT, None, node.__class__.__name__, node._offset)))
+            self.replace(vm.vm, "observer", self.call_observer(record, clock))
+
+    def replace(self, owner, name, value):
+        """ Set name, an attribute of owner or a key if owner is a dict, to value until the tracer stops """
+        if isinstance(owner, dict):
+            self.originals.append((owner, name, owner[name]))
+            owner[name] = value
+        else:
+            self.originals.append((owner, name, owner.__dict__[name]))
+            setattr(owner, name, value)
+
+    @staticmethod
+    def traced_next_token(next_token, record, clock):
+        def traced(lexer):
+            token = next_token(lexer)
+            record((clock(), "lex", INSTANT, None, token.type, lexer.token_offset))
+            return token
+        return traced
+
+    @staticmethod
+    def traced_tokenize(tokenize_all, record, clock):
+        def traced(source, *args):
+            record((clock(), "lex", BEGIN, "tokenize", "source", 0))
+            try:
+                return tokenize_all(source, *args)
+            finally:
+                record((clock(), "lex", END, "tokenize", "TokenBuffer", -1))
+        return traced
+
+    @staticmethod
+    def traced_parse(parse, name, record, clock):
+        def traced(parser, *args):
+            record((clock(), "parse", BEGIN, name, parser._cur_token.type, parser._cur_offset))
+            node = parse(parser, *args)
+            record((clock(), "parse", END, name, node.__class__.__name__, -1))
+            return node
+        return traced
+
+    @staticmethod
+    def traced_eval(evaluate, record, clock):
+        def traced(node, env):
+            kind = node.__class__.__name__
+            record((clock(), "eval", BEGIN, None, kind, node._offset))
+            try:
+                return evaluate(node, env)
+            finally:
+                record((clock(), "eval", END, None, kind, -1))
+        return traced
+
+    @staticmethod
+    def traced_compile(compile, record, clock):
+        def traced(node):
+            evaluate = compile(node)
+            kind, offset = node.__class__.__name__, node._offset
+
+            def traced_evaluate(*env):
+                record((clock(), "eval", BEGIN, None, kind, offset))
+                try:
+                    return evaluate(*env)
+                finally:
+                    record((clock(), "eval", END, None, kind, -1))
+            return traced_evaluate
+        return traced
+
+    @staticmethod
+    def call_observer(record, clock):
+        def observe(offset):
+            if offset >= 0:
+                record((clock(), "eval", BEGIN, None, "CallExpression", offset))
+            else:
+                record((clock(), "eval", END, None, "CallExpression", -1))
+        return observe
+
+    def stop(self):
+        if self.originals is None:
+            return
+        for owner, name, original in reversed(self.originals):
+            if isinstance(owner, dict):
+                owner[name] = original
+            else:
+                setattr(owner, name, original)
+        self.originals = None
+        peval.instrumented_by = None
+
+    def __enter__(self) -> "Tracer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def clear(self):
+        self.events.clear()
+
+    def select(self, phases: Iterable[str] = None) -> Iterator[Tuple[Event, int]]:
+        """
+        The events of phases (all of them by default), each with its depth.
+        The ends of what began before the oldest event still in the ring
+        buffer are left out, they would have nothing to end.
+        """
+        phases = self.phases if phases is None else frozenset(phases)
+        depths = dict.fromkeys(PHASES, 0)
+        for event in self.events:
+            phase, type = event[1], event[2]
+            if phase not in phases:
+                continue
+            depth = depths[phase]
+            if type == END:
+                if depth == 0:
+                    continue
+                depth = depths[phase] = depth - 1
+            elif type == BEGIN:
+                depths[phase] = depth + 1
+            yield event, depth
+
+    def dump(self, stream: TextIO = None, phases: Iterable[str] = None):
+        """ Write the events as text, one a line, indented by how deep they are """
+        stream = stream or sys.stdout
+        events = list(self.select(phases))
+        if not events:
+            return
+        start = events[0][0][0]
+        for (timestamp, phase, type, name, kind, offset), depth in events:
+            label = {BEGIN: "BEGIN", END: "END", INSTANT: "-"}[type]
+            text = f"{name}: {kind}" if name else kind
+            where = f" @{offset}" if offset >= 0 else ""
+            stream.write(f"{(timestamp - start) / 1000:>12.3f} us {phase:<5} {'  ' * depth}{label} {text}{where}\n")
+
+    def chrome(self, stream: TextIO = None, phases: Iterable[str] = None):
+        """ Write the events as Chrome trace event JSON """
+        stream = stream or sys.stdout
+        events = []
+        for (timestamp, phase, type, name, kind, offset), depth in self.select(phases):
+            event = {"name": name or kind, "cat": phase, "ph": type, "ts": timestamp / 1000, "pid": 1, "tid": 1}
+            if type == INSTANT:
+                event["s"] = "t"
+            if type != END:
+                if name:
+                    event["args"] = {"kind": kind}
+                if offset >= 0:
+                    event.setdefault("args", {})["offset"] = offset
+            events.append(event)
+        json.dump({"traceEvents": events, "displayTimeUnit": "ns"}, stream)
@@ -0,0 +1 @@
+from .vm import VM
@@ -0,0 +1,292 @@
+"""
+Stack machine for the bytecode produced by compiler.Compiler.
+
+run() is one loop over the instruction array. Opcodes are checked roughly in
+order of how often they show up, the operand stack is a plain Python list,
+and the integer cases of every operator are handled inline. Everything else
+(mixed types, errors) goes through the same helpers as peval, so both agree
+on results and error messages.
+
+Calls do not recurse in Python. CALL leaves the function and its arguments
+where they are on the stack, puts the rest of the function's locals on top
+of them and carries on with the function's own instructions. The arguments
+and locals are addressed from bp, the stack index of the first argument, and
+RETURN_VALUE drops the lot again, function included, in favour of the result.
+A RETURN_VALUE outside of any call is a return statement of the program
+itself, which ends it.
+
+While observer is set it is told about every call to a Monkey function,
+with the offset of the call, and about every return from one, with -1.
+That is how tracing.Tracer follows the VM. It is read once a run, and the
+two branches checking it do so with a local, so it costs next to nothing
+while it is None.
+"""
+from typing import Callable, List, Optional
+
+from compiler import Bytecode
+from compiler.code import Opcodes
+from evaluator.environment import Cell
+from evaluator.object import Object, Integer, Error, Function, make_integer
+from evaluator.peval import singleton_mapper, eval_prefix_expression, eval_infix_expression, check_call
+from evaluator.resolver import CELL
+from lexer.monkey_lexer import TokenTypes
+
+TRUE = singleton_mapper['TRUE']
+FALSE = singleton_mapper['FALSE']
+NULL = singleton_mapper['NULL']
+
+CONSTANT = Opcodes.CONSTANT
+POP = Opcodes.POP
+ADD = Opcodes.ADD
+SUB = Opcodes.SUB
+MUL = Opcodes.MUL
+DIV = Opcodes.DIV
+EQUAL = Opcodes.EQUAL
+NOT_EQUAL = Opcodes.NOT_EQUAL
+GREATER_THAN = Opcodes.GREATER_THAN
+LESS_THAN = Opcodes.LESS_THAN
+MINUS = Opcodes.MINUS
+BANG = Opcodes.BANG
+TRUE_OP = Opcodes.TRUE
+FALSE_OP = Opcodes.FALSE
+NULL_OP = Opcodes.NULL
+JUMP_NOT_TRUTHY = Opcodes.JUMP_NOT_TRUTHY
+JUMP = Opcodes.JUMP
+GET_GLOBAL = Opcodes.GET_GLOBAL
+SET_GLOBAL = Opcodes.SET_GLOBAL
+GET_LOCAL = Opcodes.GET_LOCAL
+SET_LOCAL = Opcodes.SET_LOCAL
+GET_CELL = Opcodes.GET_CELL
+SET_CELL = Opcodes.SET_CELL
+GET_FREE = Opcodes.GET_FREE
+CLOSURE = Opcodes.CLOSURE
+CALL = Opcodes.CALL
+RETURN_VALUE = Opcodes.RETURN_VALUE
+
+observer: Optional[Callable[[int], None]] = None
+
+operator_tokens = {
+    ADD: TokenTypes.PLUS,
+    SUB: TokenTypes.MINUS,
+    MUL: TokenTypes.ASTERISK,
+    DIV: TokenTypes.SLASH,
+    EQUAL: TokenTypes.EQ,
+    NOT_EQUAL: TokenTypes.NOT_EQ,
+    GREATER_THAN: TokenTypes.GT,
+    LESS_THAN: TokenTypes.LT,
+    MINUS: TokenTypes.MINUS,
+    BANG: TokenTypes.BANG,
+}
+
+
+class VM:
+    """
+    Runs bytecode. globals holds the values of the global variables by slot,
+    pass the same list to another VM to carry them over to the next program.
+    """
+
+    def __init__(self, bytecode: Bytecode, globals: List[Object] = None):
+        self.bytecode = bytecode
+        self.stack = []
+        self.last_popped: Object = NULL
+        self.globals = globals if globals is not None else []
+        missing = len(bytecode.global_names) - len(self.globals)
+        if missing > 0:
+            self.globals.extend([None] * missing)
+
+    def run(self) -> Object:
+        result = self.execute()
+        if isinstance(result, Error) and self.bytecode.source_map is not None and not result.location:
+            result.location = self.bytecode.source_map.location(result.offset)
+        return result
+
+    def execute(self) -> Object:
+        # the Bytecode, or the CompiledFunction being run
+        code = self.bytecode
+        # Indexing a list is a little quicker than indexing an array
+        instructions = code.instructions.tolist()
+        constants = self.bytecode.constants
+        globals = self.globals
+        stack = self.stack
+        push, pop = stack.append, stack.pop
+        # (code, instructions, constants, return address, bp, free) of every call in progress
+        frames = []
+        free = ()
+        bp = 0
+        end = len(instructions)
+        ip = 0
+        observe = observer
+
+        while ip < end:
+            op = instructions[ip]
+
+            if op == CONSTANT:
+                push(constants[instructions[ip + 1]])
+                ip += 2
+                continue
+
+            if op == POP:
+                self.last_popped = pop()
+
+            elif ADD <= op <= LESS_THAN:
+                right = pop()
+                left = pop()
+                if left.__class__ is Integer and right.__class__ is Integer:
+                    if op == ADD:
+                        push(make_integer(left.value + right.value))
+                    elif op == SUB:
+                        push(make_integer(left.value - right.value))
+                    elif op == MUL:
+                        push(make_integer(left.value * right.value))
+                    elif op == LESS_THAN:
+                        push(TRUE if left.value < right.value else FALSE)
+                    elif op == GREATER_THAN:
+                        push(TRUE if left.value > right.value else FALSE)
+                    elif op == EQUAL:
+                        push(TRUE if left.value == right.value else FALSE)
+                    elif op == NOT_EQUAL:
+                        push(TRUE if left.value != right.value else FALSE)
+                    elif right.value:
+                        push(make_integer(left.value // right.value))
+                    else:
+                        return self.binary_operation(op, code.positions[ip], left, right)
+                else:
+                    result = self.binary_operation(op, code.positions[ip], left, right)
+                    if isinstance(result, Error):
+                        return result
+                    push(result)
+
+            elif op == GET_LOCAL:
+                value = stack[bp + instructions[ip + 1]]
+                if value is None:
+                    return self.unbound(code, ip)
+                push(value)
+                ip += 2
+                continue
+
+            elif op == JUMP_NOT_TRUTHY:
+                condition = pop()
+                if condition is FALSE or condition is NULL:
+                    ip = instructions[ip + 1]
+                    continue
+                ip += 2
+                continue
+
+            elif op == JUMP:
+                ip = instructions[ip + 1]
+                continue
+
+            elif op == GET_GLOBAL:
+                value = globals[instructions[ip + 1]]
+                if value is None:
+                    return self.unbound(code, ip)
+                push(value)
+                ip += 2
+                continue
+
+            elif op == CALL:
+                count = instructions[ip + 1]
+                function = stack[-1 - count]
+                if function.__class__ is not Function or count != function.code.num_parameters:
+                    return check_call(function, stack[len(stack) - count:], code.positions[ip])
+                if observe is not None:
+                    observe(code.positions[ip])
+                frames.append((code, instructions, constants, ip + 2, bp, free))
+                code = function.code
+                instructions = code.ops
+                constants = code.constants
+                end = len(instructions)
+                free = function.free
+                bp = len(stack) - count
+                if code.num_locals > count:
+                    stack.extend([None] * (code.num_locals - count))
+                for slot in code.cells:
+                    stack[bp + slot] = Cell(stack[bp + slot])
+                ip = 0
+                continue
+
+            elif op == RETURN_VALUE:
+                result = pop()
+                if not frames:
+                    return result
+                if observe is not None:
+                    observe(-1)
+                del stack[bp - 1:]
+                push(result)
+                code, instructions, constants, ip, bp, free = frames.pop()
+                end = len(instructions)
+                continue
+
+            elif op == SET_LOCAL:
+                stack[bp + instructions[ip + 1]] = pop()
+                ip += 2
+                continue
+
+            elif op == SET_GLOBAL:
+                globals[instructions[ip + 1]] = pop()
+                ip += 2
+                continue
+
+            elif op == TRUE_OP:
+                push(TRUE)
+            elif op == FALSE_OP:
+                push(FALSE)
+            elif op == NULL_OP:
+                push(NULL)
+
+            elif op == GET_FREE:
+                value = free[instructions[ip + 1]].value
+                if value is None:
+                    return self.unbound(code, ip)
+                push(value)
+                ip += 2
+                continue
+
+            elif op == GET_CELL:
+                value = stack[bp + instructions[ip + 1]].value
+                if value is None:
+                    return self.unbound(code, ip)
+                push(value)
+                ip += 2
+                continue
+
+            elif op == SET_CELL:
+                stack[bp + instructions[ip + 1]].value = pop()
+                ip += 2
+                continue
+
+            elif op == CLOSURE:
+                function = constants[instructions[ip + 1]]
+                cells = ()
+                if function.free:
+                    cells = tuple(stack[bp + slot] if kind == CELL else free[slot] for kind, slot in function.free)
+                push(Function(function.literal, function, cells))
+                ip += 2
+                continue
+
+            elif op == MINUS:
+                right = pop()
+                if right.__class__ is Integer:
+                    push(make_integer(-right.value))
+                else:
+                    result = eval_prefix_expression(operator_tokens[op], right, code.positions[ip])
+                    if isinstance(result, Error):
+                        return result
+                    push(result)
+
+            elif op == BANG:
+                right = pop()
+                push(TRUE if right is FALSE or right is NULL else FALSE)
+
+            else:
+                raise ValueError(f"unknown opcode {op} at {ip}")
+
+            ip += 1
+
+        return self.last_popped
+
+    def unbound(self, code, ip: int) -> Error:
+        return Error(f"identifier not found: {code.names[ip]}", code.positions[ip])
+
+    def binary_operation(self, op: int, offset: int, left: Object, right: Object) -> Object:
+        return eval_infix_expression(operator_tokens[op], left, right, offset)